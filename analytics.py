@@ -0,0 +1,184 @@
+"""
+this module answers Task 1 - Task 3 of queries.sql without the full scans of the table 'links':
+  - Task 1, Task 2: the parsed pages with the most links to/from them are taken from the counters
+    in the table 'page_degrees' (kept by the triggers on 'links' and 'pages', see schema.py)
+    by a partial index, so the time does not grow with the graph
+  - Task 3: the average number of descendants of the second level of each parsed page is materialized
+    in the table 'page_descendants'. The refresh is incremental: the value of a page depends on its links,
+    the links of its children and the statuses of both, so only the pages logged in 'analytics_changes'
+    (the links or the status were changed), their parents and the parents of their parents are computed again
+  - Task 4: the routes of length N are sampled by the function get_routes_with_n_depth_limit_count()
+    (a recursive query, which stops as soon as the routes are found, see schema.py, version 5)
+use like this:
+  python analytics.py top-linked [--limit 5]
+  python analytics.py top-linking [--limit 5]
+  python analytics.py descendants --title Дружба
+  python analytics.py refresh
+  python analytics.py routes --depth 5 [--limit 5]
+"""
+import argparse
+import sys
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from db_context import DBSession, PageStatus, get_db
+
+# the key of the advisory lock of the refresh (two refreshes would compute the same pages)
+_REFRESH_LOCK_KEY = 7_101_043
+
+
+def _get_top_pages(column: str, limit: int) -> List[Tuple[int, int, str]]:
+    # the pages with the same number of links are ordered by title (as in queries.sql), so all pages
+    # with the number of links not less than the limit-th page are taken by the index and ordered
+    # (without this bound the planner can read the whole index)
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT d.{column}, p1.page_id, p1.page_title
+            FROM page_degrees d
+                INNER JOIN pages p1 ON p1.page_id = d.page_id
+            WHERE d.page_status = %(status)s AND d.{column} >= (
+                SELECT COALESCE(MIN(t.{column}), 1)
+                FROM (SELECT {column} FROM page_degrees
+                      WHERE page_status = %(status)s AND {column} > 0
+                      ORDER BY {column} DESC
+                      LIMIT %(limit)s) t)
+            ORDER BY d.{column} DESC, p1.page_title ASC
+            LIMIT %(limit)s;
+            """, {'status': PageStatus.PARSED_CAN_BE_USED.value, 'limit': limit})
+        rows = cursor.fetchall()
+    db.close()
+    return rows
+
+
+def get_top_linked_pages(limit: int = 5) -> List[Tuple[int, int, str]]:
+    """
+    Task 1: the parsed pages with the most links to themselves
+    :return: List of (count_linkes_on_me, page_id, page_title)
+    """
+    return _get_top_pages('in_degree', limit)
+
+
+def get_top_linking_pages(limit: int = 5) -> List[Tuple[int, int, str]]:
+    """
+    Task 2: the parsed pages with the most links to other pages
+    :return: List of (count_linkes_on_other, page_id, page_title)
+    """
+    return _get_top_pages('out_degree', limit)
+
+
+def refresh_page_descendants() -> Dict[str, int]:
+    """
+    computes again the average number of descendants of the second level of the pages,
+    which can be changed by the logged changes (the log is cleared)
+    :return: dict with the numbers of logged and computed pages
+    """
+    stats: Dict[str, int] = {}
+    db = get_db()
+    try:
+        with db.transaction():
+            with db.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s);", (_REFRESH_LOCK_KEY,))
+                cursor.execute("""
+                    CREATE TEMP TABLE dirty_pages (page_id bigint PRIMARY KEY) ON COMMIT DROP;
+                    WITH changes AS (DELETE FROM analytics_changes RETURNING page_id)
+                    INSERT INTO dirty_pages SELECT DISTINCT page_id FROM changes;
+                    """)
+                stats['changed'] = cursor.rowcount
+                # the parents (their children are changed) and the parents of the parents
+                for _ in range(2):
+                    cursor.execute("""
+                        INSERT INTO dirty_pages
+                        SELECT DISTINCT l1.parent_id
+                        FROM dirty_pages d
+                            INNER JOIN links l1 ON l1.child_id = d.page_id
+                        ON CONFLICT DO NOTHING;
+                        """)
+                cursor.execute("DELETE FROM page_descendants pd USING dirty_pages d WHERE pd.page_id = d.page_id;")
+                cursor.execute("""
+                    INSERT INTO page_descendants (page_id, avg_descendants_n2)
+                    SELECT p0.page_id, AVG(c.p2_count)
+                    FROM dirty_pages d
+                        INNER JOIN pages p0 ON p0.page_id = d.page_id AND p0.page_status = %(status)s
+                        INNER JOIN links l1 ON l1.parent_id = p0.page_id
+                        INNER JOIN pages p1 ON p1.page_id = l1.child_id AND p1.page_status = %(status)s
+                        CROSS JOIN LATERAL (
+                            SELECT COUNT(*) AS p2_count
+                            FROM links l2
+                                INNER JOIN pages p2 ON p2.page_id = l2.child_id AND p2.page_status = %(status)s
+                            WHERE l2.parent_id = p1.page_id) c
+                    WHERE c.p2_count > 0
+                    GROUP BY p0.page_id;
+                    """, {'status': PageStatus.PARSED_CAN_BE_USED.value})
+                stats['computed'] = cursor.rowcount
+    finally:
+        db.close()
+    return stats
+
+
+def get_avg_descendants_n2(page_title: str, refresh: bool = True) -> Optional[Decimal]:
+    """
+    Task 3: the average number of descendants of the second level of the page
+    :param page_title: str
+    :param refresh: bool, the logged changes are computed first (refresh_page_descendants())
+    :return: Decimal or None (the page is not parsed or has no descendants of the second level)
+    """
+    if refresh:
+        refresh_page_descendants()
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT pd.avg_descendants_n2
+            FROM pages p0
+                INNER JOIN page_descendants pd ON pd.page_id = p0.page_id
+            WHERE p0.page_title = %s;
+            """, (page_title,))
+        row = cursor.fetchone()
+    db.close()
+    return row[0] if row is not None else None
+
+
+def get_routes_with_n_depth(route_depth: int, limit: int = 5) -> List[Tuple[int, int, List[str], int]]:
+    """
+    Task 4: the routes of route_depth links (the pages are not repeated) from one random parsed page
+    (the start pages are sampled uniformly, then all parsed pages are tried)
+    :param route_depth: int, N
+    :param limit: int, the number of routes
+    :return: List of (start_page_id, end_page_id, route titles, route_depth) or [] (no parsed page has enough routes)
+    """
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("SELECT * FROM get_routes_with_n_depth_limit_count(%s, %s);", (route_depth, limit))
+        rows = cursor.fetchall()
+    db.close()
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Task 1 - Task 4 of queries.sql by the counters, the materialized '
+                                                 'aggregates and the sampler of routes')
+    parser.add_argument('command', choices=['top-linked', 'top-linking', 'descendants', 'refresh', 'routes'])
+    parser.add_argument('--limit', type=int, default=5, help='the number of pages in the top or of routes')
+    parser.add_argument('--title', help='the page of the command descendants')
+    parser.add_argument('--depth', type=int, help='N, the number of links in the routes of the command routes')
+    args = parser.parse_args()
+    with DBSession():
+        if args.command in ('top-linked', 'top-linking'):
+            if args.command == 'top-linked':
+                top = get_top_linked_pages(args.limit)
+            else:
+                top = get_top_linking_pages(args.limit)
+            for links_count, page_id, title in top:
+                print(f'{links_count}\t{page_id}\t{title}')
+        elif args.command == 'descendants':
+            if not args.title:
+                parser.error('the command descendants needs --title')
+            print(get_avg_descendants_n2(args.title))
+        elif args.command == 'routes':
+            if not args.depth or args.depth < 1:
+                parser.error('the command routes needs --depth (not less than 1)')
+            for _, _, route, _ in get_routes_with_n_depth(args.depth, args.limit):
+                print(' -> '.join(route))
+        else:
+            result = refresh_page_descendants()
+            print(', '.join(f'{name}: {value}' for name, value in result.items()), file=sys.stderr)
@@ -0,0 +1,134 @@
+import os
+import unittest
+
+import psycopg2
+
+from analytics import (get_avg_descendants_n2, get_routes_with_n_depth, get_top_linked_pages, get_top_linking_pages,
+                       refresh_page_descendants)
+from db_context import DBSession, PageStatus, WikiPage, get_db
+from graph_cache import clear_caches
+
+QUERIES_PATH = os.path.join(os.path.dirname(__file__), 'queries.sql')
+
+# the test graph, its pages are removed after each test
+LINKS = {
+    'analytics_test A': ['analytics_test B', 'analytics_test C', 'analytics_test D'],
+    'analytics_test B': ['analytics_test C', 'analytics_test D', 'analytics_test E'],
+    'analytics_test C': ['analytics_test D'],
+    'analytics_test D': ['analytics_test A', 'analytics_test B'],
+}
+
+
+def read_task_query(task: int) -> str:
+    """
+    the original query of the task from queries.sql (the first statement after the comment '-- <task>)')
+    """
+    with open(QUERIES_PATH, encoding='utf-8') as file:
+        text = file.read()
+    start = text.index('\n', text.index(f'-- {task})')) + 1
+    return text[start:text.index(';', start) + 1]
+
+
+def execute(sql: str, params=None) -> list:
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall() if cursor.description is not None else []
+    db.commit()
+    db.close()
+    return rows
+
+
+class AnalyticsTest(unittest.TestCase):
+    """
+    Task 1 - Task 3 of analytics.py give the same results as the original queries of queries.sql
+    (the test needs the database, as wikiracing_test.py)
+    """
+
+    def setUp(self):
+        try:
+            execute('SELECT 1;')
+        except psycopg2.OperationalError as exc:
+            self.skipTest(f'no database: {exc}')
+        self.pages = {}
+        with DBSession():
+            for title, children in LINKS.items():
+                self.save(title, children)
+
+    def tearDown(self):
+        if not getattr(self, 'pages', None):
+            return
+        page_ids = list(self.pages.values())
+        execute("DELETE FROM links WHERE parent_id = ANY(%s) OR child_id = ANY(%s);", (page_ids, page_ids))
+        execute("DELETE FROM pages WHERE page_id = ANY(%s);", (page_ids,))
+        execute("DELETE FROM analytics_changes WHERE page_id = ANY(%s);", (page_ids,))
+        clear_caches()
+
+    def save(self, title: str, children, replace_links: bool = False):
+        page = WikiPage(title)
+        page.add_to_db()
+        page.save_linked_pages(children, PageStatus.PARSED_CAN_BE_USED.value, replace_links=replace_links)
+        self.pages[title] = page.id
+        for child in children:
+            child_page = WikiPage(child)
+            child_page.get_from_db()
+            self.pages[child] = child_page.id
+
+    def assert_tasks_equal(self):
+        self.assertEqual(get_top_linked_pages(5), execute(read_task_query(1)))
+        self.assertEqual(get_top_linking_pages(5), execute(read_task_query(2)))
+        refresh_page_descendants()
+        task_3 = read_task_query(3).replace("'Дружба'", '%s')
+        for title in self.pages:
+            rows = execute(task_3, (title,))
+            with self.subTest(title=title):
+                self.assertEqual(get_avg_descendants_n2(title, refresh=False), rows[0][0] if rows else None)
+
+    def test_tasks_equal_queries_sql(self):
+        self.assert_tasks_equal()
+        # the links are replaced (recrawl), a page becomes parsed: the incremental refresh gives the same
+        with DBSession():
+            self.save('analytics_test B', ['analytics_test A', 'analytics_test E'], replace_links=True)
+            self.save('analytics_test E', ['analytics_test C', 'analytics_test D'])
+        self.assert_tasks_equal()
+
+    # a page, whose links are written several times before the refresh, is logged once
+    def test_changes_are_logged_once(self):
+        with DBSession():
+            for _ in range(3):
+                self.save('analytics_test C', ['analytics_test D', 'analytics_test E'], replace_links=True)
+        rows = execute("SELECT COUNT(*) FROM analytics_changes WHERE page_id = %s;", (self.pages['analytics_test C'],))
+        self.assertEqual(rows[0][0], 1)
+
+    def assert_routes(self, routes, route_depth: int, limit: int):
+        self.assertEqual(len(routes), limit)
+        for start_page_id, end_page_id, route, depth in routes:
+            with self.subTest(route=route):
+                self.assertEqual(depth, route_depth)
+                self.assertEqual(len(route), route_depth + 1)
+                self.assertEqual(len(set(route)), len(route))
+                rows = execute("""
+                    SELECT COUNT(*) FROM unnest(%s::varchar[], %s::varchar[]) AS r(parent, child)
+                    JOIN pages p ON p.page_title = r.parent
+                    JOIN pages c ON c.page_title = r.child
+                    JOIN links l ON l.parent_id = p.page_id AND l.child_id = c.page_id;""", (route[:-1], route[1:]))
+                self.assertEqual(rows[0][0], route_depth)
+                rows = execute("SELECT page_title FROM pages WHERE page_id = ANY(%s) ORDER BY page_id = %s DESC;",
+                               ([start_page_id, end_page_id], start_page_id))
+                self.assertEqual([title for title, in rows], [route[0], route[-1]])
+
+    # the sampled routes have N links and no repeated pages, the full scan finds them without the sampled pages
+    def test_routes_with_n_depth(self):
+        self.assert_routes(get_routes_with_n_depth(2, 3), 2, 3)
+        self.assert_routes(execute("SELECT * FROM get_routes_with_n_depth_limit_count(2, 3, 0);"), 2, 3)
+
+    # all children of the first two generations are taken (as the original Task 4): all 4 routes of 2 links from A
+    def test_routes_take_all_children(self):
+        routes = execute("SELECT * FROM get_routes_with_n_depth_by_start_page_limit_count(%s, 2, 4);",
+                         (self.pages['analytics_test A'],))
+        self.assert_routes(routes, 2, 4)
+        self.assertEqual(execute("SELECT * FROM get_routes_with_n_depth_by_start_page_limit_count(%s, 2, 4, 1);",
+                                 (self.pages['analytics_test A'],)), [])
+
+if __name__ == '__main__':
+    unittest.main()
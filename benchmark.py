@@ -0,0 +1,199 @@
+"""
+benchmark of find_path on the synthetic wiki (synthetic_wiki.py), served by a local HTTP server
+scenarios (the same pairs of pages in each scenario):
+  - empty_db - the tables are cleared, all pages are fetched from the server
+  - warm_db - the pages are in the DB, the in-process caches are cleared, the stored routes are not used
+  - warm_cache - the pages are in the DB and in the in-process caches (graph_cache.py)
+for each scenario the result has: latency percentiles of find_path, the number of found/failed routes,
+pages fetched (requests to the server), bytes transferred, SQL statements, peak RSS of the process
+and the sum of the metrics of the searches (metrics.py)
+the result is written as JSON, to compare it between commits
+WARNING: the scenario empty_db clears all tables of the DB from settings.py (the flag --clear-db is required)
+use like this:
+  python benchmark.py --clear-db --pages 2000 --pairs 20 --output bench.json
+"""
+import argparse
+import datetime
+import json
+import random
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import db_context
+import settings
+from db_context import clear_all_tables, get_statements_count
+from graph_cache import clear_caches, get_cache_stats
+from metrics import SearchStats
+from rate_limiter import RateLimiter
+from synthetic_wiki import SyntheticWikiServer, generate_graph
+from wikiracing import WikiRacer
+
+SCENARIOS = ['empty_db', 'warm_db', 'warm_cache']
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    """
+    percentile with linear interpolation between the closest ranks
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * percent / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def choose_pairs(graph: Dict[str, List[str]], pairs_count: int, seed: int) -> List[Tuple[str, str]]:
+    """
+    random pairs (start, finish) of different pages with links
+    """
+    rng = random.Random(seed)
+    titles = sorted(title for title, links in graph.items() if links)
+    pairs = []
+    while len(pairs) < pairs_count:
+        start, finish = rng.sample(titles, 2)
+        pairs.append((start, finish))
+    return pairs
+
+
+def get_peak_rss_kb() -> int:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def get_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def use_wiki_server(server: SyntheticWikiServer):
+    """
+    all requests of the process go to the local server
+    """
+    settings.source_link = server.source_link
+    settings.api_link = server.api_link
+    # WikiPage.get_url() takes source_link from db_context (from settings import *)
+    db_context.source_link = server.source_link
+
+
+def create_racer(args: argparse.Namespace, return_route_if_it_exists_in_db: bool) -> WikiRacer:
+    racer = WikiRacer()
+    racer.display_log = False
+    racer.collect_stats = True
+    racer.graph_snapshot = None
+    racer.page_store = None
+    racer.rate_limiter = RateLimiter(args.requests_per_minute, settings.requests_burst)
+    racer.max_links_in_route = args.max_links
+    racer.links_per_page = args.links_per_page
+    racer.fetch_concurrency = args.concurrency
+    racer.fetch_backend = args.fetch_backend
+    racer.search_mode = args.search_mode
+    racer.failed_route_ttl_seconds = 0
+    racer.return_route_if_it_exists_in_db = return_route_if_it_exists_in_db
+    return racer
+
+
+def run_scenario(name: str, racer: WikiRacer, server: SyntheticWikiServer,
+                 pairs: List[Tuple[str, str]]) -> dict:
+    server.reset_stats()
+    statements_before = get_statements_count()
+    latencies_ms = []
+    found_count = 0
+    failures: Dict[str, int] = {}
+    links_in_routes = []
+    search_stats = SearchStats()
+    started = time.perf_counter()
+    for start, finish in pairs:
+        search_started = time.perf_counter()
+        try:
+            path = racer.find_path(start, finish)
+            found_count += 1
+            links_in_routes.append(len(path) - 1)
+        except Exception as exc:
+            failures[type(exc).__name__] = failures.get(type(exc).__name__, 0) + 1
+        latencies_ms.append((time.perf_counter() - search_started) * 1000)
+        search_stats.merge(racer.last_search_stats)
+    server_stats = server.get_stats()
+    return {
+        'scenario': name,
+        'searches': len(pairs),
+        'found': found_count,
+        'failures': failures,
+        'links_in_routes': links_in_routes,
+        'duration_s': round(time.perf_counter() - started, 3),
+        'latency_ms': {'p50': percentile(latencies_ms, 50), 'p90': percentile(latencies_ms, 90),
+                       'p99': percentile(latencies_ms, 99), 'max': max(latencies_ms, default=None),
+                       'mean': sum(latencies_ms) / len(latencies_ms) if latencies_ms else None},
+        'pages_fetched': server_stats['requests'],
+        'api_requests': server_stats['api_requests'],
+        'bytes_transferred': server_stats['bytes_sent'],
+        'sql_statements': get_statements_count() - statements_before,
+        'peak_rss_kb': get_peak_rss_kb(),
+        'cache': get_cache_stats(),
+        'search_stats': search_stats.as_dict(),
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> dict:
+    graph = generate_graph(args.pages, mean_links=args.mean_links, seed=args.seed)
+    pairs = choose_pairs(graph, args.pairs, args.seed)
+    scenarios = []
+    with SyntheticWikiServer(graph, latency=args.latency_ms / 1000) as server:
+        use_wiki_server(server)
+        for name in args.scenarios:
+            if name == 'empty_db':
+                clear_all_tables()
+                racer = create_racer(args, return_route_if_it_exists_in_db=True)
+            elif name == 'warm_db':
+                clear_caches()
+                racer = create_racer(args, return_route_if_it_exists_in_db=False)
+            else:
+                racer = create_racer(args, return_route_if_it_exists_in_db=False)
+            scenarios.append(run_scenario(name, racer, server, pairs))
+    return {
+        'commit': get_commit(),
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'config': {name: value for name, value in vars(args).items() if name not in ('output', 'clear_db')},
+        'graph': {'pages': len(graph), 'links': sum(len(links) for links in graph.values())},
+        'scenarios': scenarios,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='benchmark of find_path on a synthetic local wiki')
+    parser.add_argument('--pages', type=int, default=2000)
+    parser.add_argument('--mean-links', type=float, default=40)
+    parser.add_argument('--pairs', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-links', type=int, default=settings.max_links_in_route)
+    parser.add_argument('--links-per-page', type=int, default=settings.links_per_page)
+    parser.add_argument('--concurrency', type=int, default=settings.fetch_concurrency)
+    parser.add_argument('--fetch-backend', choices=['html', 'api'], default=settings.fetch_backend)
+    parser.add_argument('--search-mode', choices=['forward', 'bidirectional', 'landmarks'],
+                        default=settings.search_mode)
+    parser.add_argument('--latency-ms', type=float, default=0, help='latency of each request of the server')
+    parser.add_argument('--requests-per-minute', type=float, default=60000)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--clear-db', action='store_true', help='allow to clear all tables (scenario empty_db)')
+    parser.add_argument('--output', default=None, help='JSON file (stdout by default)')
+    args = parser.parse_args()
+    if 'empty_db' in args.scenarios and not args.clear_db:
+        parser.error('the scenario empty_db clears all tables of the DB, add --clear-db to allow it')
+    result = run_benchmark(args)
+    result_json = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(result_json + '\n')
+    else:
+        print(result_json)
+    for scenario in result['scenarios']:
+        print(f"{scenario['scenario']}: found {scenario['found']}/{scenario['searches']}, "
+              f"p50 {scenario['latency_ms']['p50']:.1f} ms, fetched {scenario['pages_fetched']}, "
+              f"sql {scenario['sql_statements']}", file=sys.stderr)
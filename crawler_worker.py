@@ -0,0 +1,123 @@
+"""
+this module is a standalone crawler worker: it takes NOT_PARSED pages from the table 'pages'
+and parses them with the same logic as WikiRacer.find_path (WikiRacer._parse_generation/_page_parsing),
+so the graph is crawled in the background and the searches find the pages already parsed
+  - pages are taken in batches (settings.py/crawler_batch_size) with FOR UPDATE SKIP LOCKED
+    and leased to the worker for settings.py/crawler_lease_seconds (table 'page_leases'),
+    so several workers (also on several hosts) never parse the same page at once,
+    and the pages of a crashed worker are taken again when the lease is over
+  - the lease must be longer than the time of one batch
+    (crawler_batch_size * 60 / requests_per_minute seconds)
+  - all workers must use a shared rate limiter (settings.py/rate_limiter_backend = 'file' for one host,
+    'postgres' for several hosts), otherwise every worker has its own requests budget
+  - with --refresh the worker recrawls the parsed pages, which were not checked during
+    settings.py/refresh_after_seconds: the pages are requested with If-None-Match/If-Modified-Since
+    (the validators from the table 'page_validators'), a not modified page (304) is not parsed and not written,
+    the links of a changed page are replaced
+use like this:
+  python crawler_worker.py [--max-pages N] [--worker-id NAME] [--refresh]
+"""
+import argparse
+import os
+import socket
+import uuid
+from time import sleep
+from typing import List, Optional
+
+import settings
+from db_context import (PageStatus, DBSession, claim_not_parsed_pages, release_page_leases,
+                        claim_pages_for_refresh, get_page_validators)
+from wikiracing import Node, WikiRacer
+
+
+class CrawlerWorker:
+    """
+    use like this:
+    worker = CrawlerWorker()
+    worker.run(max_pages=1000)
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, refresh: bool = False):
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.refresh = refresh
+        self.refresh_after_seconds = settings.refresh_after_seconds
+        self.batch_size = settings.crawler_batch_size
+        self.lease_seconds = settings.crawler_lease_seconds
+        self.idle_sleep = settings.crawler_idle_sleep
+        self.racer = WikiRacer()
+        self.parsed_count = 0
+
+    def run_once(self) -> int:
+        """
+        takes one batch of pages, parses them and releases the leases
+        (the pages, which were not fetched because the retries are over, stay NOT_PARSED)
+        :return: int, the number of taken pages (0 - there are no NOT_PARSED pages without a lease)
+        """
+        if self.refresh:
+            pages = claim_pages_for_refresh(self.worker_id, self.batch_size, self.lease_seconds,
+                                            self.refresh_after_seconds)
+        else:
+            pages = claim_not_parsed_pages(self.worker_id, self.batch_size, self.lease_seconds)
+        if not pages:
+            return 0
+        nodes = []
+        for page in pages:
+            node = Node(page.title)
+            node.id = page.id
+            node.created = page.created
+            node.status = page.status
+            nodes.append(node)
+        if self.refresh:
+            return self._refresh_nodes(nodes)
+        try:
+            # concurrent fetching (if fetch_concurrency > 1 or fetch_backend = 'api'), the rest one by one
+            # (the pages, which were not fetched by _parse_generation because the retries are over, are not tried again)
+            self.racer._parse_generation(nodes)
+            for node in nodes:
+                if node.status == PageStatus.NOT_PARSED.value:
+                    self.racer._page_parsing(node)
+                if node.status != PageStatus.NOT_PARSED.value:
+                    self.parsed_count += 1
+        finally:
+            release_page_leases(self.worker_id, [node.id for node in nodes])
+        self.racer.print_log_msg(f'worker {self.worker_id}: parsed {self.parsed_count} pages')
+        return len(nodes)
+
+    def _refresh_nodes(self, nodes: List[Node]) -> int:
+        """
+        fetches the parsed pages again by conditional requests (if the validators of the page are known)
+        """
+        validators = get_page_validators([node.id for node in nodes])
+        for node in nodes:
+            node.validators = validators.get(node.id)
+        try:
+            self.racer._parse_generation(nodes, refresh=True)
+            self.parsed_count += len(nodes)
+        finally:
+            release_page_leases(self.worker_id, [node.id for node in nodes])
+        self.racer.print_log_msg(f'worker {self.worker_id}: refreshed {self.parsed_count} pages')
+        return len(nodes)
+
+    def run(self, max_pages: Optional[int] = None, stop_when_idle: bool = False):
+        """
+        parses batches until max_pages pages are parsed
+        :param max_pages: int or None - without limit
+        :param stop_when_idle: bool, stop if there are no pages to parse, otherwise wait for new pages
+        """
+        with DBSession():
+            while max_pages is None or self.parsed_count < max_pages:
+                if self.run_once() == 0:
+                    if stop_when_idle:
+                        break
+                    sleep(self.idle_sleep)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='crawler worker, parses NOT_PARSED pages from DB')
+    parser.add_argument('--max-pages', type=int, default=None)
+    parser.add_argument('--worker-id', default=None)
+    parser.add_argument('--stop-when-idle', action='store_true')
+    parser.add_argument('--refresh', action='store_true',
+                        help='recrawl the parsed pages by conditional requests (settings.py/refresh_after_seconds)')
+    args = parser.parse_args()
+    CrawlerWorker(args.worker_id, args.refresh).run(args.max_pages, args.stop_when_idle)
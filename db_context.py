@@ -3,47 +3,222 @@ this module is an intermediate layer
 between the main module (wikiracing.py)
 and the postgresql database
 """
-from typing import List
+from typing import List, Optional, Iterator, Tuple, Dict, Set
 from enum import Enum
 import datetime
+import threading
+from contextlib import contextmanager
 from settings import *
 import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+from graph_cache import (page_cache, adjacency_cache, page_entry_size, adjacency_entry_size,
+                         clear_caches)
+from schema import check_schema
+
+
+# ====CONNECTION_POOL=======
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+_statements_count = 0
+_statements_counting = 0  # the number of blocks count_statements() running now
+_statements_lock = threading.Lock()
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """
+    cursor of all pooled connections, counts the executed SQL statements (see get_statements_count()),
+    only while some count_statements() block is running, otherwise the statement is executed without the lock
+    """
+
+    def execute(self, query, vars=None):
+        global _statements_count
+        if _statements_counting:
+            with _statements_lock:
+                _statements_count += 1
+        return super().execute(query, vars)
+
+
+@contextmanager
+def count_statements():
+    """
+    use like this:
+    with count_statements():
+        ...
+    the SQL statements of the process are counted inside the block (the searches with the metrics)
+    """
+    global _statements_counting
+    with _statements_lock:
+        _statements_counting += 1
+    try:
+        yield
+    finally:
+        with _statements_lock:
+            _statements_counting -= 1
+
+
+def get_statements_count() -> int:
+    """
+    :return: int, the number of SQL statements executed by the process inside count_statements() blocks
+    """
+    return _statements_count
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """
+    returns the process-wide connection pool, the pool is created on first use
+    (size is limited by db_pool_min_connections/db_pool_max_connections in the settings)
+    if settings.py/check_schema_on_startup = True, the version of the schema is checked once,
+    when the pool is created (schema.py, raises SchemaNotMigratedException)
+    :return: ThreadedConnectionPool
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ThreadedConnectionPool(db_pool_min_connections,
+                                              db_pool_max_connections,
+                                              dbname=POSTGRES_DB,
+                                              user=POSTGRES_USER,
+                                              password=POSTGRES_PASSWORD,
+                                              host=POSTGRES_HOST,
+                                              port=POSTGRES_PORT,
+                                              cursor_factory=CountingCursor)
+                if check_schema_on_startup:
+                    conn = pool.getconn()
+                    try:
+                        check_schema(conn)
+                    except Exception:
+                        pool.putconn(conn)
+                        pool.closeall()
+                        raise
+                    pool.putconn(conn)
+                _pool = pool
+    return _pool
+
+
+def close_pool():
+    """
+    closes all connections of the pool (the next get_pool() call creates a new one)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
 
 
 class DB:
     """
     this class provides a connection, cursor snd commit for database queries,
-    and also closes the connection and cursor
+    and also closes the cursor and returns the connection to the pool
+    the connection parameters are optional overrides of the settings: if any of them is given,
+    the connection is opened outside the pool (as before the pool) and closed by close()
     """
 
     def __init__(self,
-                 dbname=POSTGRES_DB,
-                 user=POSTGRES_USER,
-                 password=POSTGRES_PASSWORD,
-                 host=POSTGRES_HOST,
-                 port=POSTGRES_PORT):
-        self.conn = psycopg2.connect(dbname=dbname,
-                                     user=user,
-                                     password=password,
-                                     host=host,
-                                     port=port)
+                 dbname: Optional[str] = None,
+                 user: Optional[str] = None,
+                 password: Optional[str] = None,
+                 host: Optional[str] = None,
+                 port: Optional[str] = None):
+        self.pooled = dbname is None and user is None and password is None and host is None and port is None
+        if self.pooled:
+            self.conn = get_pool().getconn()
+        else:
+            self.conn = psycopg2.connect(dbname=dbname or POSTGRES_DB,
+                                         user=user or POSTGRES_USER,
+                                         password=password or POSTGRES_PASSWORD,
+                                         host=host or POSTGRES_HOST,
+                                         port=port or POSTGRES_PORT,
+                                         cursor_factory=CountingCursor)
         self.cur = self.conn.cursor()
 
+    def cursor(self):
+        return self.conn.cursor()
+
     def query(self, query):
         self.cur.execute(query)
 
     def commit(self):
         self.conn.commit()
 
+    @contextmanager
+    def transaction(self):
+        """
+        use like this:
+        with db.transaction():
+            ...
+        all statements inside the block are committed together, or rolled back on exception
+        (also in a session, where every statement is committed on its own)
+        """
+        autocommit = self.conn.autocommit
+        if autocommit:
+            self.conn.autocommit = False
+        try:
+            with self.conn:
+                yield self
+        finally:
+            if autocommit:
+                self.conn.autocommit = True
+
     def cur_close(self):
         self.cur.close()
 
     def conn_close(self):
-        self.conn.close()
+        if self.pooled:
+            get_pool().putconn(self.conn)
+        else:
+            self.conn.close()
 
     def close(self):
         self.cur.close()
-        self.conn.close()
+        self.conn_close()
+
+
+class DBSession(DB):
+    """
+    unit of work: one pooled connection that is held for the whole search (WikiRacer.find_path)
+    while the session is active (with DBSession(): ...), all WikiPage/Route methods
+    in the current thread use its connection instead of taking a new one from the pool
+    use like this:
+    with DBSession():
+        page = WikiPage('Дружба')
+        page.get_from_db()
+    """
+
+    def __init__(self):
+        super().__init__()
+        # every statement is committed on its own, as with a separate connection per method
+        self.conn.autocommit = True
+        self._previous: Optional[DBSession] = None
+
+    def __enter__(self):
+        self._previous = getattr(_local, 'session', None)
+        _local.session = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.session = self._previous
+        self.cur.close()
+        self.conn.autocommit = False
+        self.conn_close()
+
+    def close(self):
+        # the connection stays open until the end of the session
+        pass
+
+
+def get_db() -> DB:
+    """
+    returns the active session of the current thread or a new pooled connection
+    :return: DB
+    """
+    session = getattr(_local, 'session', None)
+    if session is not None:
+        return session
+    return DB()
 
 
 # ====PAGE_STATUS=======
@@ -67,7 +242,9 @@ class WikiPage:
     this class allows you to create wiki page object (table 'pages' in DB)
     and perform basic database operations with objects
     also has methods for operations with related pages (table 'linkes' in DB)
+    the attributes are kept in __slots__ (no __dict__ per page), the search creates a page for every link
     """
+    __slots__ = ('title', 'id', 'created', 'status')
 
     title: str
     id: int
@@ -84,8 +261,10 @@ class WikiPage:
         return url
 
     def is_exists_in_db(self) -> bool:
-        db = DB()
-        with db.cur as cursor:
+        if page_cache.get(self.title) is not None:
+            return True
+        db = get_db()
+        with db.cursor() as cursor:
             cursor.execute("SELECT * FROM pages WHERE page_title = %s;", (self.title,))
             count = cursor.rowcount
             db.close()
@@ -95,8 +274,13 @@ class WikiPage:
                 return False
 
     def get_from_db(self):
-        db = DB()
-        with db.cur as cursor:
+        # parsed pages are taken from the cache
+        cached = page_cache.get(self.title)
+        if cached is not None:
+            self.id, self.created, self.status = cached
+            return
+        db = get_db()
+        with db.cursor() as cursor:
             cursor.execute("SELECT * FROM pages WHERE page_title = %s", (self.title,))
             # if page is exists in db -> get it
             if cursor.rowcount > 0:
@@ -104,37 +288,38 @@ class WikiPage:
                 self.id = row[0]
                 self.created = row[2]
                 self.status = row[3]
+                cache_page(self.title, self.id, self.created, self.status)
             else:
                 self.id = 0
         db.close()
 
     def add_to_db(self):
+        self.get_from_db()
         # if not exist in DB
-        if not self.is_exists_in_db():
-            # save current page
-            db = DB()
-            with db.cur as cursor:
-                sql_string = "INSERT INTO pages (page_title, page_status) VALUES (%s, %s) RETURNING page_id;"
+        if self.id == 0:
+            # save current page (if another process has saved it at the same time, its row is taken)
+            db = get_db()
+            with db.cursor() as cursor:
+                sql_string = """INSERT INTO pages (page_title, page_status) VALUES (%s, %s)
+                                ON CONFLICT (page_title) DO NOTHING;"""
                 cursor.execute(sql_string, (self.title, PageStatus.NOT_PARSED.value))
-                self.id = cursor.fetchone()[0]
             db.commit()
             db.close()
             self.get_from_db()
-        else:
-            self.get_from_db()
 
     def set_page_status(self, new_status: int):
         self.status = new_status
-        db = DB()
-        with db.cur as cursor:
+        db = get_db()
+        with db.cursor() as cursor:
             sql_string = "UPDATE pages SET page_status = %s WHERE page_id = %s;"
             cursor.execute(sql_string, (self.status, self.id))
         db.commit()
         db.close()
+        page_cache.invalidate(self.title)
 
     def has_linked_pages_in_db(self) -> bool:
-        db = DB()
-        with db.cur as cursor:
+        db = get_db()
+        with db.cursor() as cursor:
             sql_string = "SELECT * FROM links WHERE parent_id = %s;"
             cursor.execute(sql_string, (self.id,))
             count = cursor.rowcount
@@ -149,23 +334,75 @@ class WikiPage:
         child_page = WikiPage(linked_page_title)
         child_page.add_to_db()
         # create new link
-        if not self.is_exist_linked_page_by_title(linked_page_title):
-            db = DB()
-            with db.cur as cursor:
-                sql_string = "INSERT INTO links (parent_id, child_id) VALUES (%s, %s);"
-                cursor.execute(sql_string, (self.id, child_page.id))
-            db.commit()
-            db.close()
+        db = get_db()
+        with db.cursor() as cursor:
+            sql_string = "INSERT INTO links (parent_id, child_id) VALUES (%s, %s) ON CONFLICT DO NOTHING;"
+            cursor.execute(sql_string, (self.id, child_page.id))
+        db.commit()
+        db.close()
 
     def add_linked_pages(self, *childs_titles: []):
         for title in childs_titles[0]:
             print(title)
             self.add_linked_page(title)
 
+    def save_linked_pages(self, linked_page_titles: List[str], new_status: int, replace_links: bool = False,
+                          validators: Optional[Tuple[Optional[str], Optional[str]]] = None):
+        """
+        bulk ingest of the parsed page: adds all new child pages, all links 'parent-child'
+        and sets the page status in one transaction (set-based statements, not a query per link)
+        if something fails, nothing of this page is written
+        :param linked_page_titles: List[str], titles of the child pages (duplicates are ignored)
+        :param new_status: int, status of the parsed page
+        :param replace_links: bool, remove the links to the pages, which are not in linked_page_titles
+                              (the page is parsed again)
+        :param validators: (ETag, Last-Modified) of the response, are saved to the table 'page_validators'
+                           (None - nothing is saved)
+        """
+        titles = list(dict.fromkeys(linked_page_titles))
+        db = get_db()
+        with db.transaction():
+            with db.cursor() as cursor:
+                if replace_links:
+                    cursor.execute("""
+                        DELETE FROM links l
+                        WHERE l.parent_id = %s
+                            AND NOT EXISTS (SELECT 1 FROM pages p
+                                            WHERE p.page_id = l.child_id AND p.page_title = ANY(%s::varchar[]));
+                        """, (self.id, titles))
+                if titles:
+                    cursor.execute("""
+                        INSERT INTO pages (page_title, page_status)
+                        SELECT t.page_title, %s
+                        FROM unnest(%s::varchar[]) AS t(page_title)
+                        ON CONFLICT (page_title) DO NOTHING;
+                        """, (PageStatus.NOT_PARSED.value, titles))
+                    cursor.execute("""
+                        INSERT INTO links (parent_id, child_id)
+                        SELECT %s, p.page_id
+                        FROM pages p
+                        WHERE p.page_title = ANY(%s::varchar[])
+                        ON CONFLICT (parent_id, child_id) DO NOTHING;
+                        """, (self.id, titles))
+                # the new version of the links: the adjacency cache of all processes reads the page again
+                cursor.execute("""
+                    UPDATE pages SET page_status = %s, links_version = links_version + 1
+                    WHERE page_id = %s
+                    RETURNING links_version;
+                    """, (new_status, self.id))
+                links_version = cursor.fetchone()[0]
+                if validators is not None:
+                    _upsert_page_validators(cursor, self.id, validators)
+        db.close()
+        self.status = new_status
+        # the links and the status of the page are changed -> invalidate the cache
+        adjacency_cache.invalidate((self.id, links_version - 1))
+        page_cache.invalidate(self.title)
+
     def is_exist_linked_page_by_title(self, search_title: str) -> bool:
-        db = DB()
+        db = get_db()
         count: int
-        with db.cur as cursor:
+        with db.cursor() as cursor:
             sql_str = """
                         SELECT 
                             p2.page_id AS page_id, 
@@ -185,8 +422,8 @@ class WikiPage:
                 return False
 
     def get_linked_page_by_title(self, search_title: str):
-        db = DB()
-        with db.cur as cursor:
+        db = get_db()
+        with db.cursor() as cursor:
             sql_str = """
                         SELECT 
                             p2.page_id AS page_id, 
@@ -227,8 +464,8 @@ class Route:
         return f'{self.start_page_title} -> {self.finish_page_title}'
 
     def is_exists_in_db(self) -> bool:
-        db = DB()
-        with db.cur as cursor:
+        db = get_db()
+        with db.cursor() as cursor:
             sql_str = "SELECT * FROM routes WHERE start_page_title = %s AND finish_page_title = %s;"
             cursor.execute(sql_str, (self.start_page_title, self.finish_page_title))
             count = cursor.rowcount
@@ -239,8 +476,8 @@ class Route:
                 return False
 
     def get_from_db(self):
-        db = DB()
-        with db.cur as cursor:
+        db = get_db()
+        with db.cursor() as cursor:
             sql_str = "SELECT * FROM routes WHERE start_page_title = %s AND finish_page_title = %s;"
             cursor.execute(sql_str, (self.start_page_title, self.finish_page_title))
             # if page is exists in db -> get it
@@ -253,28 +490,23 @@ class Route:
         db.close()
 
     def add_to_db(self):
-        # if not exist in DB
-        if not self.is_exists_in_db():
-            # save current page
-            db = DB()
-            with db.cur as cursor:
-                sql_string = """INSERT INTO routes (start_page_title, finish_page_title) 
-                                VALUES (%s, %s) RETURNING route_id;"""
-                cursor.execute(sql_string, (self.start_page_title, self.finish_page_title))
-                self.id = cursor.fetchone()[0]
-            db.commit()
-            db.close()
-            self.get_from_db()
-        else:
-            self.get_from_db()
+        # save current route, if not exist in DB
+        db = get_db()
+        with db.cursor() as cursor:
+            sql_string = """INSERT INTO routes (start_page_title, finish_page_title) 
+                            VALUES (%s, %s) ON CONFLICT (start_page_title, finish_page_title) DO NOTHING;"""
+            cursor.execute(sql_string, (self.start_page_title, self.finish_page_title))
+        db.commit()
+        db.close()
+        self.get_from_db()
 
     def count_pages_in_chain(self) -> int:
         if self.id == 0:
             return 0
         else:
             count: int = 0
-            db = DB()
-            with db.cur as cursor:
+            db = get_db()
+            with db.cursor() as cursor:
                 sql_string = "SELECT chain_id FROM route_chains WHERE route_id = %s ORDER BY page_order;"
                 cursor.execute(sql_string, (self.id,))
                 count = cursor.rowcount
@@ -286,8 +518,8 @@ class Route:
             return 0
         else:
             count: int = 0
-            db = DB()
-            with db.cur as cursor:
+            db = get_db()
+            with db.cursor() as cursor:
                 sql_string = """SELECT chain_id 
                                 FROM route_chains 
                                 WHERE route_id = %s AND page_id = %s;"""
@@ -301,21 +533,61 @@ class Route:
 
     def add_page_to_chain(self, page: WikiPage):
         if not self.is_exists_pages_in_chain_in_route(page):
-            db = DB()
-            with db.cur as cursor:
+            db = get_db()
+            with db.cursor() as cursor:
                 sql_string = "INSERT INTO route_chains (route_id, page_id, page_order) VALUES (%s, %s, %s);"
                 next_order_number_in_chain = self.count_pages_in_chain() + 1
                 cursor.execute(sql_string, (self.id, page.id, next_order_number_in_chain))
             db.commit()
             db.close()
 
+    def add_pages_to_chain(self, page_titles: List[str]):
+        """
+        writes the whole chain of the route by one statement (in the order of page_titles),
+        so all sub-routes of the route become available at once (see get_route_from_chains())
+        the previous chain of the route (if the route was searched again) is replaced,
+        otherwise the two chains would be merged into one wrong route
+        :param page_titles: List[str], the titles of the pages (the pages must exist in DB)
+        """
+        db = get_db()
+        with db.transaction():
+            with db.cursor() as cursor:
+                cursor.execute("DELETE FROM route_chains WHERE route_id = %s;", (self.id,))
+                sql_string = """
+                                INSERT INTO route_chains (route_id, page_id, page_order)
+                                SELECT %s, p.page_id, t.page_order
+                                FROM unnest(%s::varchar[]) WITH ORDINALITY AS t(page_title, page_order)
+                                    INNER JOIN pages p ON p.page_title = t.page_title
+                                ORDER BY t.page_order;
+                """
+                cursor.execute(sql_string, (self.id, list(page_titles)))
+        db.close()
+
+    def add_page_ids_to_chain(self, page_ids: List[int]):
+        """
+        the same as add_pages_to_chain(), but the pages are given by their ids (the search keeps only the ids)
+        :param page_ids: List[int], the ids of the pages in the order of the route
+        """
+        db = get_db()
+        with db.transaction():
+            with db.cursor() as cursor:
+                cursor.execute("DELETE FROM route_chains WHERE route_id = %s;", (self.id,))
+                sql_string = """
+                                INSERT INTO route_chains (route_id, page_id, page_order)
+                                SELECT %s, t.page_id, t.page_order
+                                FROM unnest(%s::bigint[]) WITH ORDINALITY AS t(page_id, page_order)
+                                ORDER BY t.page_order;
+                """
+                cursor.execute(sql_string, (self.id, list(page_ids)))
+        db.close()
+
     def get_page_list_from_chain(self) -> List[WikiPage]:
         if self.id == 0:
             return []
         else:
             pages_list = []
-            db = DB()
-            with db.cur as cursor:
+            db = get_db()
+            with db.cursor() as cursor:
                 sql_string = """
                                 SELECT rc.page_id AS page_id, p.page_title AS page_title
                                 FROM route_chains rc
@@ -343,34 +615,463 @@ class Route:
 # ======STATIC METHODS========
 def get_links_by_parent_page(parent_page: WikiPage) -> List[WikiPage]:
     result_list = []
-    db = DB()
-    with db.cur as cursor:
+    for _, linked_page in get_links_by_parent_ids([parent_page.id]):
+        result_list.append(linked_page)
+    return result_list
+
+
+def get_links_by_parent_ids(parent_ids: List[int]) -> Iterator[Tuple[int, WikiPage]]:
+    """
+    all child pages of all parent pages as WikiPage objects (the titles are read by one query),
+    see get_child_ids_by_parent_ids()
+    :param parent_ids: List[int]
+    :return: Iterator of (parent_id, child_page)
+    """
+    links = list(get_child_ids_by_parent_ids(parent_ids))
+    pages = _select_pages_by_ids([child_id for _, child_id, _ in links])
+    for parent_id, child_id, child_status in links:
+        linked_page = WikiPage(pages[child_id][0])
+        linked_page.id = child_id
+        linked_page.created = pages[child_id][1]
+        linked_page.status = child_status
+        yield parent_id, linked_page
+
+
+def get_child_ids_by_parent_ids(parent_ids: List[int]) -> Iterator[Tuple[int, int, int]]:
+    """
+    batch expansion of the search frontier: the ids and the statuses of all child pages of all parent pages
+    (parents in the order of parent_ids, children of each parent ordered by title), the titles are not read
+    the children of parsed pages are taken from adjacency_cache (graph_cache.py) by the current links_version
+    of the parent pages (one query), the children of other pages are taken from the DB by one query,
+    the rows are streamed from a server-side cursor by db_fetch_size rows (settings.py)
+    the cached status of a child, which was not parsed, is read again (the child can be parsed since then)
+    :param parent_ids: List[int]
+    :return: Iterator of (parent_id, child_id, child_status)
+    """
+    adjacency: Dict[int, tuple] = {}
+    missing_parent_ids = []
+    for parent_id, (parent_status, links_version) in _select_links_versions(dict.fromkeys(parent_ids)).items():
+        children = None
+        if parent_status != PageStatus.NOT_PARSED.value:
+            children = adjacency_cache.get((parent_id, links_version))
+        if children is None:
+            missing_parent_ids.append(parent_id)
+        else:
+            adjacency[parent_id] = children
+
+    statuses: Dict[int, int] = {}
+    if missing_parent_ids:
+        children_by_parent: Dict[int, list] = {}
+        parent_versions: Dict[int, Tuple[int, int]] = {}
+        for parent_id, parent_version, child_id, child_status in _select_links_by_parent_ids(missing_parent_ids):
+            parent_versions[parent_id] = parent_version
+            children = children_by_parent.setdefault(parent_id, [])
+            if child_id is not None:
+                children.append((child_id, child_status))
+                statuses[child_id] = child_status
+        for parent_id in missing_parent_ids:
+            children = tuple(children_by_parent.get(parent_id, ()))
+            adjacency[parent_id] = children
+            # the links of a parsed page are kept by the version, which was read with them
+            parent_status, links_version = parent_versions.get(parent_id, (PageStatus.NOT_PARSED.value, 0))
+            if parent_status != PageStatus.NOT_PARSED.value:
+                adjacency_cache.put((parent_id, links_version), children, adjacency_entry_size(children))
+
+    # the children from the cache, which were not parsed, by one query
+    unknown_status_ids = [child_id for children in adjacency.values() for child_id, child_status in children
+                          if child_status == PageStatus.NOT_PARSED.value and child_id not in statuses]
+    if unknown_status_ids:
+        statuses.update(_select_page_statuses(unknown_status_ids))
+
+    for parent_id in parent_ids:
+        for child_id, child_status in adjacency.get(parent_id, ()):
+            yield parent_id, child_id, statuses.get(child_id, child_status)
+
+
+def get_page_titles(page_ids: List[int]) -> Dict[int, str]:
+    """
+    the titles of the pages by one query (the search keeps only the ids of the pages)
+    :param page_ids: List[int]
+    :return: page_id -> page_title
+    """
+    return {page_id: page[0] for page_id, page in _select_pages_by_ids(page_ids).items()}
+
+
+def get_backlinks_by_child_ids(child_ids: List[int]) -> Iterator[Tuple[int, WikiPage]]:
+    """
+    backward expansion of the search frontier: all known parent pages (pages with links to the child pages)
+    of all child pages are taken in one query (children in the order of child_ids, parents ordered by title)
+    only parsed pages have links, so only the links of the crawled pages are known
+    :param child_ids: List[int]
+    :return: Iterator of (child_id, parent_page)
+    """
+    if not child_ids:
+        return
+    db = get_db()
+    try:
+        with db.transaction():
+            with db.conn.cursor(name='backlinks_by_child_ids') as cursor:
+                cursor.itersize = db_fetch_size
+                sql_str = """
+                            SELECT
+                                f.child_id AS child_id,
+                                p1.page_id AS page_id,
+                                p1.page_title AS page_title,
+                                p1.created_on AS created_on,
+                                p1.page_status AS page_status
+                            FROM unnest(%s::bigint[]) WITH ORDINALITY AS f(child_id, child_order)
+                                INNER JOIN links l1 ON l1.child_id = f.child_id
+                                INNER JOIN pages p1 ON p1.page_id = l1.parent_id
+                            ORDER BY f.child_order, p1.page_title;
+                          """
+                cursor.execute(sql_str, (list(child_ids),))
+                for row in cursor:
+                    parent_page = WikiPage(row[2])
+                    parent_page.id = row[1]
+                    parent_page.created = row[3]
+                    parent_page.status = row[4]
+                    yield row[0], parent_page
+    finally:
+        db.close()
+
+
+def get_parent_ids_linking_to(child_id: int, parent_ids: List[int]) -> Set[int]:
+    """
+    the pages from parent_ids, which have a link to the child page (one probe of the primary key of 'links'
+    for each parent page)
+    :param child_id: int
+    :param parent_ids: List[int]
+    :return: Set[int]
+    """
+    if not parent_ids:
+        return set()
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("SELECT parent_id FROM links WHERE parent_id = ANY(%s) AND child_id = %s;",
+                       (list(parent_ids), child_id))
+        parent_ids_with_link = {row[0] for row in cursor}
+    db.close()
+    return parent_ids_with_link
+
+
+def _select_links_by_parent_ids(parent_ids: List[int]) -> Iterator[tuple]:
+    """
+    :return: Iterator of (parent_id, (parent_status, parent_links_version), child_id or None, child_status)
+    """
+    db = get_db()
+    try:
+        with db.transaction():
+            with db.conn.cursor(name='links_by_parent_ids') as cursor:
+                cursor.itersize = db_fetch_size
+                sql_str = """
+                            SELECT
+                                f.parent_id AS parent_id,
+                                p1.page_status AS parent_status,
+                                p1.links_version AS parent_links_version,
+                                p2.page_id AS page_id,
+                                p2.page_status AS page_status
+                            FROM unnest(%s::bigint[]) WITH ORDINALITY AS f(parent_id, parent_order)
+                                INNER JOIN pages p1 ON p1.page_id = f.parent_id
+                                LEFT JOIN links l1 ON l1.parent_id = f.parent_id
+                                LEFT JOIN pages p2 ON p2.page_id = l1.child_id
+                            ORDER BY f.parent_order, p2.page_title;
+                          """
+                cursor.execute(sql_str, (list(parent_ids),))
+                for row in cursor:
+                    yield row[0], (row[1], row[2]), row[3], row[4]
+    finally:
+        db.close()
+
+
+def _select_links_versions(page_ids) -> Dict[int, Tuple[int, int]]:
+    """
+    :return: page_id -> (page_status, links_version) in the order of page_ids
+    """
+    page_ids = list(page_ids)
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("SELECT page_id, page_status, links_version FROM pages WHERE page_id = ANY(%s);", (page_ids,))
+        rows = {row[0]: (row[1], row[2]) for row in cursor}
+    db.close()
+    return {page_id: rows[page_id] for page_id in page_ids if page_id in rows}
+
+
+def _select_page_statuses(page_ids: List[int]) -> Dict[int, int]:
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("SELECT page_id, page_status FROM pages WHERE page_id = ANY(%s);", (list(page_ids),))
+        statuses = {row[0]: row[1] for row in cursor}
+    db.close()
+    return statuses
+
+
+def _select_pages_by_ids(page_ids: List[int]) -> Dict[int, Tuple[str, datetime.datetime]]:
+    pages = {}
+    if not page_ids:
+        return pages
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("SELECT page_id, page_title, created_on FROM pages WHERE page_id = ANY(%s);",
+                       (list(set(page_ids)),))
+        for row in cursor:
+            pages[row[0]] = (row[1], row[2])
+    db.close()
+    return pages
+
+
+def cache_page(title: str, page_id: int, created: datetime.datetime, status: int):
+    """
+    puts the page into page_cache, if it is parsed (the status of a parsed page does not change)
+    """
+    if status != PageStatus.NOT_PARSED.value:
+        page_cache.put(title, (page_id, created, status), page_entry_size(title))
+
+
+def get_route_from_chains(start: str, finish: str, max_links_in_route: int) -> Optional[List[str]]:
+    """
+    sub-route cache: every stored route A -> B -> C -> D also contains the shortest routes
+    B -> D, A -> C, etc., so the route is searched in all stored chains, where the start page
+    is before the finish page (the shortest one, not longer than max_links_in_route links)
+    :param start: str
+    :param finish: str
+    :param max_links_in_route: int
+    :return: List[str] - titles from start to finish, or None if no chain contains the route
+    """
+    db = get_db()
+    with db.cursor() as cursor:
         sql_str = """
-                    SELECT 
-                        p2.page_id as page_id, 
-                        p2.page_title as page_title,
-                        p2.created_on as created_on
-                    FROM pages p1
-                        LEFT JOIN links l1 ON l1.parent_id = p1.page_id
-                        LEFT JOIN pages p2 ON p2.page_id = l1.child_id
-                    WHERE p1.page_id = %s
-                    ORDER BY p2.page_title;
+                    WITH best AS (
+                        SELECT rc1.route_id, rc1.page_order AS start_order, rc2.page_order AS finish_order
+                        FROM pages p1
+                            INNER JOIN route_chains rc1 ON rc1.page_id = p1.page_id
+                            INNER JOIN route_chains rc2 ON rc2.route_id = rc1.route_id
+                                AND rc2.page_order > rc1.page_order
+                            INNER JOIN pages p2 ON p2.page_id = rc2.page_id
+                        WHERE p1.page_title = %s AND p2.page_title = %s
+                            AND rc2.page_order - rc1.page_order <= %s
+                        ORDER BY rc2.page_order - rc1.page_order, rc1.route_id
+                        LIMIT 1
+                    )
+                    SELECT p.page_title
+                    FROM best
+                        INNER JOIN route_chains rc ON rc.route_id = best.route_id
+                            AND rc.page_order BETWEEN best.start_order AND best.finish_order
+                        INNER JOIN pages p ON p.page_id = rc.page_id
+                    ORDER BY rc.page_order;
                   """
-        cursor.execute(sql_str, (parent_page.id,))
-        if cursor.rowcount > 0:
+        cursor.execute(sql_str, (start, finish, max_links_in_route))
+        titles = [row[0] for row in cursor]
+    db.close()
+    return titles or None
+
+
+# ====FAILED_ROUTES=======
+# the table 'failed_routes' is the negative cache of find_path: the routes, which were not found
+# with the given max_links_in_route, links_per_page and search mode, and the reason
+# ('start', 'finish' - the page has no article, 'max_links' - no route within max_links_in_route links)
+def get_failed_route(start: str, finish: str, max_links_in_route: int, links_per_page: int, search_mode: str,
+                     ttl_seconds: int) -> Optional[str]:
+    """
+    :return: str - the reason of the failure, if the route failed not earlier than ttl_seconds ago, else None
+    """
+    db = get_db()
+    with db.cursor() as cursor:
+        sql_str = """
+                    SELECT failure
+                    FROM failed_routes
+                    WHERE start_page_title = %s AND finish_page_title = %s
+                        AND max_links_in_route = %s AND links_per_page = %s AND search_mode = %s
+                        AND created_on > now() - make_interval(secs => %s);
+                  """
+        cursor.execute(sql_str, (start, finish, max_links_in_route, links_per_page, search_mode, ttl_seconds))
+        row = cursor.fetchone()
+    db.close()
+    return row[0] if row is not None else None
+
+
+def save_failed_route(start: str, finish: str, max_links_in_route: int, links_per_page: int, search_mode: str,
+                      failure: str):
+    db = get_db()
+    with db.cursor() as cursor:
+        sql_str = """
+                    INSERT INTO failed_routes
+                        (start_page_title, finish_page_title, max_links_in_route, links_per_page, search_mode, failure)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (start_page_title, finish_page_title, max_links_in_route, links_per_page, search_mode)
+                        DO UPDATE SET failure = EXCLUDED.failure, created_on = now();
+                  """
+        cursor.execute(sql_str, (start, finish, max_links_in_route, links_per_page, search_mode, failure))
+    db.commit()
+    db.close()
+
+
+def clear_failed_routes():
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("DELETE FROM failed_routes;")
+    db.commit()
+    db.close()
+
+
+# ====PAGE_LEASES=======
+# the table 'page_leases' keeps the pages, which are taken by crawler workers (crawler_worker.py)
+# a lease is active until leased_until, the pages of a crashed worker are taken again after that
+def claim_not_parsed_pages(worker_id: str, limit: int, lease_seconds: int) -> List[WikiPage]:
+    """
+    takes up to limit NOT_PARSED pages without an active lease (in the order of page_id) and leases them
+    to the worker: the pages are locked with FOR UPDATE SKIP LOCKED, so concurrent workers never take
+    the same page, and a page with an active lease of another worker is never taken
+    :param worker_id: str
+    :param limit: int
+    :param lease_seconds: int
+    :return: List[WikiPage]
+    """
+    page_list = []
+    db = get_db()
+    with db.transaction():
+        with db.cursor() as cursor:
+            sql_str = """
+                        WITH candidates AS (
+                            SELECT p1.page_id
+                            FROM pages p1
+                            WHERE p1.page_status = %s
+                                AND NOT EXISTS (SELECT 1 FROM page_leases pl
+                                                WHERE pl.page_id = p1.page_id AND pl.leased_until > now())
+                            ORDER BY p1.page_id
+                            LIMIT %s
+                            FOR UPDATE OF p1 SKIP LOCKED
+                        ), claimed AS (
+                            INSERT INTO page_leases (page_id, worker_id, leased_until)
+                            SELECT page_id, %s, now() + make_interval(secs => %s)
+                            FROM candidates
+                            ON CONFLICT (page_id) DO UPDATE
+                                SET worker_id = EXCLUDED.worker_id, leased_until = EXCLUDED.leased_until
+                                WHERE page_leases.leased_until <= now()
+                            RETURNING page_id
+                        )
+                        SELECT p1.page_id, p1.page_title, p1.created_on, p1.page_status
+                        FROM claimed
+                            INNER JOIN pages p1 ON p1.page_id = claimed.page_id
+                        ORDER BY p1.page_id;
+                      """
+            cursor.execute(sql_str, (PageStatus.NOT_PARSED.value, limit, worker_id, lease_seconds))
             for row in cursor:
-                linked_page = WikiPage(row[1])
-                linked_page.id = row[0]
-                linked_page.created = row[2]
-                result_list.append(linked_page)
+                page = WikiPage(row[1])
+                page.id = row[0]
+                page.created = row[2]
+                page.status = row[3]
+                page_list.append(page)
     db.close()
-    return result_list
+    return page_list
+
+
+def release_page_leases(worker_id: str, page_ids: List[int]):
+    """
+    removes the leases of the worker (the pages, which are still NOT_PARSED, can be taken again)
+    """
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("DELETE FROM page_leases WHERE worker_id = %s AND page_id = ANY(%s);",
+                       (worker_id, list(page_ids)))
+    db.commit()
+    db.close()
+
+
+# ====PAGE_VALIDATORS=======
+# the table 'page_validators' keeps the validators (ETag, Last-Modified) of the last response of each page
+# and the time of the last check, they are used by the conditional requests, when the page is parsed again
+def _upsert_page_validators(cursor, page_id: int, validators: Tuple[Optional[str], Optional[str]]):
+    cursor.execute("""
+        INSERT INTO page_validators (page_id, etag, last_modified, checked_on)
+        VALUES (%s, %s, %s, now())
+        ON CONFLICT (page_id) DO UPDATE
+            SET etag = EXCLUDED.etag, last_modified = EXCLUDED.last_modified, checked_on = EXCLUDED.checked_on;
+        """, (page_id, validators[0], validators[1]))
+
+
+def get_page_validators(page_ids: List[int]) -> Dict[int, Tuple[Optional[str], Optional[str]]]:
+    """
+    :param page_ids: List[int]
+    :return: page_id -> (ETag, Last-Modified), only for the pages with validators
+    """
+    validators = {}
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT page_id, etag, last_modified FROM page_validators
+            WHERE page_id = ANY(%s) AND (etag IS NOT NULL OR last_modified IS NOT NULL);
+            """, (list(page_ids),))
+        for row in cursor:
+            validators[row[0]] = (row[1], row[2])
+    db.close()
+    return validators
+
+
+def touch_page_validators(page_id: int):
+    """
+    the page is not modified (304): only the time of the last check is changed
+    """
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("UPDATE page_validators SET checked_on = now() WHERE page_id = %s;", (page_id,))
+    db.commit()
+    db.close()
+
+
+def claim_pages_for_refresh(worker_id: str, limit: int, lease_seconds: int,
+                            refresh_after_seconds: int) -> List[WikiPage]:
+    """
+    takes up to limit parsed pages, which were not checked during refresh_after_seconds
+    (or have no row in the table 'page_validators'), and leases them to the worker
+    (the same leases as in claim_not_parsed_pages())
+    :return: List[WikiPage]
+    """
+    page_list = []
+    db = get_db()
+    with db.transaction():
+        with db.cursor() as cursor:
+            sql_str = """
+                        WITH candidates AS (
+                            SELECT p1.page_id
+                            FROM pages p1
+                                LEFT JOIN page_validators pv ON pv.page_id = p1.page_id
+                            WHERE p1.page_status = %s
+                                AND (pv.checked_on IS NULL OR pv.checked_on < now() - make_interval(secs => %s))
+                                AND NOT EXISTS (SELECT 1 FROM page_leases pl
+                                                WHERE pl.page_id = p1.page_id AND pl.leased_until > now())
+                            ORDER BY pv.checked_on NULLS FIRST, p1.page_id
+                            LIMIT %s
+                            FOR UPDATE OF p1 SKIP LOCKED
+                        ), claimed AS (
+                            INSERT INTO page_leases (page_id, worker_id, leased_until)
+                            SELECT page_id, %s, now() + make_interval(secs => %s)
+                            FROM candidates
+                            ON CONFLICT (page_id) DO UPDATE
+                                SET worker_id = EXCLUDED.worker_id, leased_until = EXCLUDED.leased_until
+                                WHERE page_leases.leased_until <= now()
+                            RETURNING page_id
+                        )
+                        SELECT p1.page_id, p1.page_title, p1.created_on, p1.page_status
+                        FROM claimed
+                            INNER JOIN pages p1 ON p1.page_id = claimed.page_id
+                        ORDER BY p1.page_id;
+                      """
+            cursor.execute(sql_str, (PageStatus.PARSED_CAN_BE_USED.value, refresh_after_seconds, limit,
+                                     worker_id, lease_seconds))
+            for row in cursor:
+                page = WikiPage(row[1])
+                page.id = row[0]
+                page.created = row[2]
+                page.status = row[3]
+                page_list.append(page)
+    db.close()
+    return page_list
 
 
 def get_pages_all() -> List[WikiPage]:
     page_list = []
-    db = DB()
-    with db.cur as cursor:
+    db = get_db()
+    with db.cursor() as cursor:
         sql_str = "SELECT * FROM pages;"
         cursor.execute(sql_str)
         if cursor.rowcount > 0:
@@ -384,8 +1085,8 @@ def get_pages_all() -> List[WikiPage]:
 
 
 def clear_all_chains():
-    db = DB()
-    with db.cur as cursor:
+    db = get_db()
+    with db.cursor() as cursor:
         sql_str = "DELETE FROM route_chains;"
         cursor.execute(sql_str)
     db.commit()
@@ -393,8 +1094,8 @@ def clear_all_chains():
 
 
 def clear_all_routes():
-    db = DB()
-    with db.cur as cursor:
+    db = get_db()
+    with db.cursor() as cursor:
         sql_str = "DELETE FROM routes;"
         cursor.execute(sql_str)
     db.commit()
@@ -402,17 +1103,26 @@ def clear_all_routes():
 
 
 def clear_all_links():
-    db = DB()
-    with db.cur as cursor:
+    db = get_db()
+    with db.cursor() as cursor:
         sql_str = "DELETE FROM links;"
         cursor.execute(sql_str)
     db.commit()
     db.close()
 
 
+def clear_analytics_changes():
+    db = get_db()
+    with db.cursor() as cursor:
+        sql_str = "DELETE FROM analytics_changes;"
+        cursor.execute(sql_str)
+    db.commit()
+    db.close()
+
+
 def clear_all_pages():
-    db = DB()
-    with db.cur as cursor:
+    db = get_db()
+    with db.cursor() as cursor:
         sql_str = "DELETE FROM pages;"
         cursor.execute(sql_str)
     db.commit()
@@ -422,8 +1132,11 @@ def clear_all_pages():
 def clear_all_tables():
     clear_all_chains()
     clear_all_routes()
+    clear_failed_routes()
     clear_all_links()
     clear_all_pages()
+    clear_analytics_changes()
+    clear_caches()
 
 
 # clear_all_tables()
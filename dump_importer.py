@@ -0,0 +1,257 @@
+"""
+this module imports the graph of the wiki from the official dumps (https://dumps.wikimedia.org/ukwiki/)
+instead of crawling the pages one by one:
+  - page.sql.gz - all pages (only the main namespace is taken)
+  - pagelinks.sql.gz - all links 'page -> title' (old format) or 'page -> link target id' (new format)
+  - linktarget.sql.gz - link target id -> title (only for the new format of pagelinks)
+the dumps are read line by line (one INSERT statement with many rows per line), so the memory is bounded,
+the rows are loaded with COPY into temporary tables and then moved to 'pages'/'links' by a few set-based
+statements in one transaction:
+  - titles from ignore_list_patterns (ignore_list_patterns.py/check_pattern_in_title()) are skipped
+  - the imported pages get the status PARSED_CAN_BE_USED with the first links_per_page links
+    (settings.py/links_per_page, in the order of the dump; red links are skipped), as the crawled pages
+  - redirect pages stay NOT_PARSED, they are parsed online if the search reaches them
+  - the pages, which are already parsed in DB, keep their links
+use like this:
+  python dump_importer.py --page ukwiki-latest-page.sql.gz --pagelinks ukwiki-latest-pagelinks.sql.gz \
+      [--linktarget ukwiki-latest-linktarget.sql.gz] [--links-per-page 200]
+"""
+import argparse
+import gzip
+import re
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import settings
+from db_context import PageStatus, get_db
+from graph_cache import clear_caches
+from ignore_list_patterns import check_pattern_in_title
+
+MAIN_NAMESPACE = 0
+
+_CREATE_TABLE_RE = re.compile(r"CREATE TABLE `(\w+)`")
+_COLUMN_RE = re.compile(r"\s+`(\w+)`")
+_INSERT_RE = re.compile(r"INSERT INTO `(\w+)` VALUES ")
+_ROW_RE = re.compile(r"\(((?:'(?:[^'\\]|\\.)*'|[^'()])*)\)")
+_FIELD_RE = re.compile(r"'((?:[^'\\]|\\.)*)'|([^,]+)")
+_ESCAPE_RE = re.compile(r"\\(.)")
+_ESCAPES = {'0': '\0', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _unescape(value: str) -> str:
+    return _ESCAPE_RE.sub(lambda match: _ESCAPES.get(match.group(1), match.group(1)), value)
+
+
+def iter_dump_rows(lines: Iterable[str]) -> Iterator[Dict[str, Optional[str]]]:
+    """
+    parses the mysqldump file: the column names are taken from 'CREATE TABLE',
+    the rows from 'INSERT INTO ... VALUES (...),(...);'
+    :param lines: the lines of the dump
+    :return: column name -> value (str, or None for NULL), numbers are not converted
+    """
+    columns: List[str] = []
+    in_create_table = False
+    for line in lines:
+        if in_create_table:
+            match = _COLUMN_RE.match(line)
+            if match:
+                columns.append(match.group(1))
+            elif line.startswith(')'):
+                in_create_table = False
+            continue
+        if _CREATE_TABLE_RE.match(line):
+            columns = []
+            in_create_table = True
+            continue
+        match = _INSERT_RE.match(line)
+        if match is None:
+            continue
+        for row in _ROW_RE.finditer(line, match.end()):
+            values = []
+            for field in _FIELD_RE.finditer(row.group(1)):
+                if field.group(1) is not None:
+                    values.append(_unescape(field.group(1)))
+                else:
+                    value = field.group(2).strip()
+                    values.append(None if value == 'NULL' else value)
+            yield dict(zip(columns, values))
+
+
+def open_dump(path: str) -> TextIO:
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'rt', encoding='utf-8', errors='replace')
+
+
+def to_page_title(dump_title: str) -> str:
+    # the dumps keep the titles with '_' instead of spaces (as in the url)
+    return dump_title.replace('_', ' ')
+
+
+def iter_pages(rows: Iterable[dict]) -> Iterator[Tuple[int, str, int]]:
+    """
+    :return: (wiki page_id, page_title, is_redirect) of the pages of the main namespace
+    """
+    for row in rows:
+        if int(row['page_namespace']) != MAIN_NAMESPACE:
+            continue
+        title = to_page_title(row['page_title'])
+        if not check_pattern_in_title(title):
+            yield int(row['page_id']), title, int(row['page_is_redirect'])
+
+
+def iter_pagelinks(rows: Iterable[dict]) -> Iterator[Tuple[int, Optional[str], Optional[int]]]:
+    """
+    :return: (wiki page_id of the parent, title of the child, link target id)
+             the old format of pagelinks has the title, the new one has the link target id
+    """
+    for row in rows:
+        if int(row.get('pl_from_namespace', MAIN_NAMESPACE)) != MAIN_NAMESPACE:
+            continue
+        if 'pl_target_id' in row:
+            yield int(row['pl_from']), None, int(row['pl_target_id'])
+        elif int(row['pl_namespace']) == MAIN_NAMESPACE:
+            title = to_page_title(row['pl_title'])
+            if not check_pattern_in_title(title):
+                yield int(row['pl_from']), title, None
+
+
+def iter_linktargets(rows: Iterable[dict]) -> Iterator[Tuple[int, str]]:
+    """
+    :return: (link target id, title) of the main namespace
+    """
+    for row in rows:
+        if int(row['lt_namespace']) != MAIN_NAMESPACE:
+            continue
+        title = to_page_title(row['lt_title'])
+        if not check_pattern_in_title(title):
+            yield int(row['lt_id']), title
+
+
+class CopyRowsFile:
+    """
+    file-like object for cursor.copy_expert(): gives the rows in the COPY text format,
+    the rows are taken from the iterator only when COPY reads the next part
+    """
+
+    def __init__(self, rows: Iterable[tuple]):
+        self._rows = iter(rows)
+        self._buffer = b''
+        self.rows_count = 0
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self.rows_count += 1
+            self._buffer += ('\t'.join('\\N' if value is None else str(value).translate(_COPY_ESCAPES)
+                                       for value in row) + '\n').encode('utf-8')
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    readline = read
+
+
+def import_dumps(page_path: str, pagelinks_path: str, linktarget_path: Optional[str] = None,
+                 links_per_page: int = settings.links_per_page) -> Dict[str, int]:
+    """
+    imports the dumps into the tables 'pages' and 'links' (everything or nothing, in one transaction)
+    :param links_per_page: int, not more than links_per_page links of a page are taken (in the order of the dump)
+    :return: counts of the loaded rows and of the new pages/links
+    """
+    stats: Dict[str, int] = {}
+    db = get_db()
+    try:
+        with db.transaction():
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    CREATE TEMP TABLE import_page (
+                        wiki_page_id bigint, page_title varchar, page_is_redirect integer) ON COMMIT DROP;
+                    CREATE TEMP TABLE import_pagelinks (
+                        pl_from bigint, pl_title varchar, pl_target_id bigint, pl_order bigserial) ON COMMIT DROP;
+                    CREATE TEMP TABLE import_linktarget (
+                        lt_id bigint, lt_title varchar) ON COMMIT DROP;
+                    """)
+                with open_dump(page_path) as dump:
+                    rows = CopyRowsFile(iter_pages(iter_dump_rows(dump)))
+                    cursor.copy_expert("COPY import_page FROM STDIN", rows)
+                    stats['dump_pages'] = rows.rows_count
+                with open_dump(pagelinks_path) as dump:
+                    rows = CopyRowsFile(iter_pagelinks(iter_dump_rows(dump)))
+                    cursor.copy_expert("COPY import_pagelinks (pl_from, pl_title, pl_target_id) FROM STDIN", rows)
+                    stats['dump_links'] = rows.rows_count
+                if linktarget_path:
+                    with open_dump(linktarget_path) as dump:
+                        rows = CopyRowsFile(iter_linktargets(iter_dump_rows(dump)))
+                        cursor.copy_expert("COPY import_linktarget FROM STDIN", rows)
+                        stats['dump_linktargets'] = rows.rows_count
+                    cursor.execute("""
+                        UPDATE import_pagelinks pl SET pl_title = lt.lt_title
+                        FROM import_linktarget lt
+                        WHERE lt.lt_id = pl.pl_target_id;
+                        """)
+                cursor.execute("ANALYZE import_page; ANALYZE import_pagelinks;")
+
+                # new pages
+                cursor.execute("""
+                    INSERT INTO pages (page_title, page_status)
+                    SELECT DISTINCT ip.page_title, %s
+                    FROM import_page ip
+                    ON CONFLICT (page_title) DO NOTHING;
+                    """, (PageStatus.NOT_PARSED.value,))
+                stats['new_pages'] = cursor.rowcount
+
+                # the links are added only to the pages, which are not parsed yet (they have no links in DB)
+                cursor.execute("""
+                    CREATE TEMP TABLE import_parent ON COMMIT DROP AS
+                    SELECT DISTINCT ON (ip.wiki_page_id) ip.wiki_page_id, p.page_id
+                    FROM import_page ip
+                        INNER JOIN pages p ON p.page_title = ip.page_title
+                    WHERE ip.page_is_redirect = 0 AND p.page_status = %s;
+                    """, (PageStatus.NOT_PARSED.value,))
+                # the first links_per_page links of a page, as the crawler takes them
+                cursor.execute("""
+                    INSERT INTO links (parent_id, child_id)
+                    SELECT parent_id, child_id
+                    FROM (
+                        SELECT pr.page_id AS parent_id, p.page_id AS child_id,
+                               ROW_NUMBER() OVER (PARTITION BY pr.page_id ORDER BY MIN(pl.pl_order)) AS link_number
+                        FROM import_pagelinks pl
+                            INNER JOIN import_parent pr ON pr.wiki_page_id = pl.pl_from
+                            INNER JOIN import_page ic ON ic.page_title = pl.pl_title
+                            INNER JOIN pages p ON p.page_title = ic.page_title
+                        GROUP BY pr.page_id, p.page_id
+                    ) page_links
+                    WHERE link_number <= %s
+                    ON CONFLICT (parent_id, child_id) DO NOTHING;
+                    """, (links_per_page,))
+                stats['new_links'] = cursor.rowcount
+                cursor.execute("""
+                    UPDATE pages p SET page_status = %s, links_version = p.links_version + 1
+                    FROM import_parent pr
+                    WHERE p.page_id = pr.page_id;
+                    """, (PageStatus.PARSED_CAN_BE_USED.value,))
+                stats['parsed_pages'] = cursor.rowcount
+    finally:
+        db.close()
+    # the statuses and the links of the pages are changed
+    clear_caches()
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='import of the wiki dumps into DB')
+    parser.add_argument('--page', required=True, help='page.sql(.gz)')
+    parser.add_argument('--pagelinks', required=True, help='pagelinks.sql(.gz)')
+    parser.add_argument('--linktarget', help='linktarget.sql(.gz), for the new format of pagelinks')
+    parser.add_argument('--links-per-page', type=int, default=settings.links_per_page,
+                        help='the number of the links of a page (settings.py/links_per_page)')
+    args = parser.parse_args()
+    result = import_dumps(args.page, args.pagelinks, args.linktarget, args.links_per_page)
+    print(', '.join(f'{name}: {count}' for name, count in result.items()), file=sys.stderr)
+    print(f'the graph snapshot ({settings.graph_snapshot_path}) can be exported again: '
+          f'python graph_snapshot.py export', file=sys.stderr)
@@ -0,0 +1,184 @@
+import os
+import tempfile
+import unittest
+
+import psycopg2
+
+from db_context import PageStatus, get_db
+from dump_importer import CopyRowsFile, import_dumps, iter_dump_rows, iter_linktargets, iter_pagelinks, iter_pages
+from graph_cache import clear_caches
+
+PAGE_DUMP = """-- MySQL dump
+DROP TABLE IF EXISTS `page`;
+CREATE TABLE `page` (
+  `page_id` int(8) unsigned NOT NULL AUTO_INCREMENT,
+  `page_namespace` int(11) NOT NULL DEFAULT 0,
+  `page_title` varbinary(255) NOT NULL DEFAULT '',
+  `page_is_redirect` tinyint(1) unsigned NOT NULL DEFAULT 0,
+  `page_len` int(8) unsigned NOT NULL DEFAULT 0,
+  PRIMARY KEY (`page_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+INSERT INTO `page` VALUES (1,0,'Дружба',0,100),(2,0,'Марка_(грошова_одиниця)',0,NULL),\
+(3,14,'Історія',0,5),(4,0,'Вічне_місто',1,10),(5,0,'Д\\'Артаньян,_або_(1)',0,7);
+INSERT INTO `page` VALUES (6,0,'Рим',0,100);
+"""
+
+OLD_PAGELINKS_DUMP = """CREATE TABLE `pagelinks` (
+  `pl_from` int(8) unsigned NOT NULL DEFAULT 0,
+  `pl_namespace` int(11) NOT NULL DEFAULT 0,
+  `pl_title` varbinary(255) NOT NULL DEFAULT '',
+  `pl_from_namespace` int(11) NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+INSERT INTO `pagelinks` VALUES (1,0,'Рим',0),(1,14,'Історія',0),(3,0,'Рим',14),(1,0,'en:Rome',0);
+"""
+
+NEW_PAGELINKS_DUMP = """CREATE TABLE `pagelinks` (
+  `pl_from` int(8) unsigned NOT NULL DEFAULT 0,
+  `pl_from_namespace` int(11) NOT NULL DEFAULT 0,
+  `pl_target_id` bigint(20) unsigned NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+INSERT INTO `pagelinks` VALUES (1,0,10),(3,14,10);
+CREATE TABLE `linktarget` (
+  `lt_id` bigint(20) unsigned NOT NULL AUTO_INCREMENT,
+  `lt_namespace` int(11) NOT NULL,
+  `lt_title` varbinary(255) NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+INSERT INTO `linktarget` VALUES (10,0,'Рим'),(11,10,'Шаблон');
+"""
+
+
+class DumpImporterTest(unittest.TestCase):
+
+    def test_iter_dump_rows(self):
+        rows = list(iter_dump_rows(PAGE_DUMP.splitlines(keepends=True)))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1], {'page_id': '2', 'page_namespace': '0', 'page_title': 'Марка_(грошова_одиниця)',
+                                   'page_is_redirect': '0', 'page_len': None})
+        # quotes, commas and brackets inside the strings
+        self.assertEqual(rows[4]['page_title'], "Д'Артаньян,_або_(1)")
+
+    # only the main namespace, the titles with spaces
+    def test_iter_pages(self):
+        pages = list(iter_pages(iter_dump_rows(PAGE_DUMP.splitlines())))
+        self.assertEqual(pages, [(1, 'Дружба', 0), (2, 'Марка (грошова одиниця)', 0), (4, 'Вічне місто', 1),
+                                 (5, "Д'Артаньян, або (1)", 0), (6, 'Рим', 0)])
+
+    def test_iter_pagelinks_old_format(self):
+        links = list(iter_pagelinks(iter_dump_rows(OLD_PAGELINKS_DUMP.splitlines())))
+        self.assertEqual(links, [(1, 'Рим', None)])
+
+    def test_iter_pagelinks_new_format(self):
+        rows = list(iter_dump_rows(NEW_PAGELINKS_DUMP.splitlines()))
+        self.assertEqual(list(iter_pagelinks(rows[:2])), [(1, None, 10)])
+        self.assertEqual(list(iter_linktargets(rows[2:])), [(10, 'Рим')])
+
+    def test_copy_rows_file(self):
+        rows = CopyRowsFile([(1, 'a\tb', None), (2, 'c\\d', 0)])
+        data = b''
+        while True:
+            part = rows.read(5)
+            if not part:
+                break
+            data += part
+        self.assertEqual(data.decode('utf-8'), '1\ta\\tb\t\\N\n2\tc\\\\d\t0\n')
+        self.assertEqual(rows.rows_count, 2)
+
+
+# the dumps of import_dumps(), their pages are removed after each test
+IMPORT_PAGE_DUMP = """CREATE TABLE `page` (
+  `page_id` int(8) unsigned NOT NULL AUTO_INCREMENT,
+  `page_namespace` int(11) NOT NULL DEFAULT 0,
+  `page_title` varbinary(255) NOT NULL DEFAULT '',
+  `page_is_redirect` tinyint(1) unsigned NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+INSERT INTO `page` VALUES (1,0,'dump_importer_test_A',0),(2,0,'dump_importer_test_B',0),\
+(3,0,'dump_importer_test_C',0),(4,0,'dump_importer_test_D',1),(5,0,'dump_importer_test_E',0);
+"""
+
+IMPORT_PAGELINKS_DUMP = """CREATE TABLE `pagelinks` (
+  `pl_from` int(8) unsigned NOT NULL DEFAULT 0,
+  `pl_namespace` int(11) NOT NULL DEFAULT 0,
+  `pl_title` varbinary(255) NOT NULL DEFAULT '',
+  `pl_from_namespace` int(11) NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+INSERT INTO `pagelinks` VALUES (1,0,'dump_importer_test_Missing',0),(1,0,'dump_importer_test_D',0),\
+(1,0,'dump_importer_test_D',0),(1,0,'dump_importer_test_B',0),(1,0,'dump_importer_test_E',0);
+INSERT INTO `pagelinks` VALUES (2,0,'dump_importer_test_A',0),(4,0,'dump_importer_test_A',0);
+"""
+
+
+def execute(sql: str, params=None) -> list:
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall() if cursor.description is not None else []
+    db.commit()
+    db.close()
+    return rows
+
+
+class ImportDumpsTest(unittest.TestCase):
+    """
+    import_dumps() with COPY and one transaction (the test needs the database, as wikiracing_test.py)
+    """
+
+    def setUp(self):
+        try:
+            execute('SELECT 1;')
+        except psycopg2.OperationalError as exc:
+            self.skipTest(f'no database: {exc}')
+        self.dir = tempfile.TemporaryDirectory()
+        self.page_path = self.write('page.sql', IMPORT_PAGE_DUMP)
+        self.pagelinks_path = self.write('pagelinks.sql', IMPORT_PAGELINKS_DUMP)
+
+    def tearDown(self):
+        if not hasattr(self, 'dir'):
+            return
+        self.dir.cleanup()
+        page_ids = [page_id for page_id, in execute(
+            "SELECT page_id FROM pages WHERE page_title LIKE 'dump importer test %%';")]
+        execute("DELETE FROM links WHERE parent_id = ANY(%s) OR child_id = ANY(%s);", (page_ids, page_ids))
+        execute("DELETE FROM pages WHERE page_id = ANY(%s);", (page_ids,))
+        execute("DELETE FROM analytics_changes WHERE page_id = ANY(%s);", (page_ids,))
+        clear_caches()
+
+    def write(self, name: str, text: str) -> str:
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+    def pages(self) -> dict:
+        return dict(execute("SELECT page_title, page_status FROM pages WHERE page_title LIKE 'dump importer test %%';"))
+
+    def links(self) -> list:
+        return execute("""
+            SELECT pp.page_title, pc.page_title
+            FROM links l
+                INNER JOIN pages pp ON pp.page_id = l.parent_id
+                INNER JOIN pages pc ON pc.page_id = l.child_id
+            WHERE pp.page_title LIKE 'dump importer test %%'
+            ORDER BY 1, 2;""")
+
+    # a page gets the first links_per_page links of the dump (without red links and repeats),
+    # a redirect page stays NOT_PARSED
+    def test_import_links_per_page(self):
+        stats = import_dumps(self.page_path, self.pagelinks_path, links_per_page=2)
+        self.assertEqual(stats['dump_pages'], 5)
+        self.assertEqual(self.links(), [('dump importer test A', 'dump importer test B'),
+                                        ('dump importer test A', 'dump importer test D'),
+                                        ('dump importer test B', 'dump importer test A')])
+        parsed, not_parsed = PageStatus.PARSED_CAN_BE_USED.value, PageStatus.NOT_PARSED.value
+        self.assertEqual(self.pages(), {'dump importer test A': parsed, 'dump importer test B': parsed,
+                                        'dump importer test C': parsed, 'dump importer test D': not_parsed,
+                                        'dump importer test E': parsed})
+
+    # everything or nothing: the pages are not imported, if the pagelinks cannot be read
+    def test_import_in_one_transaction(self):
+        with self.assertRaises(FileNotFoundError):
+            import_dumps(self.page_path, os.path.join(self.dir.name, 'missing.sql'))
+        self.assertEqual(self.pages(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
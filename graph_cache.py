@@ -0,0 +1,107 @@
+"""
+this module keeps the in-process cache of the crawled graph in front of the database:
+  - page_cache: page title -> (page_id, created_on, page_status)
+  - adjacency_cache: (page_id, links_version) -> child pages ((page_id, page_status), ...), without titles
+only parsed pages are cached. The links of a parsed page are replaced by the recrawl (also by another process),
+each write of the links increments pages.links_version, so the children are read by the current version
+of the page (one query for all parents of the frontier) and the entries of the old versions are never hit again.
+The status of a parsed page is changed only by the recrawl (to another parsed status), page_cache can keep
+the old status of a page recrawled by another process until the entry is evicted.
+The entries of a page are invalidated when its links are written by this process (WikiPage.save_linked_pages)
+the caches are LRU and limited by the approximate size of the entries in bytes
+(settings.py/page_cache_max_bytes, adjacency_cache_max_bytes, 0 - cache is disabled)
+"""
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import settings
+
+# approximate size of the python objects of one entry without strings (tuple, int, datetime, dict item)
+ENTRY_OVERHEAD_BYTES = 200
+# one child (page_id, page_status): a tuple of two ints and the item of the outer tuple
+CHILD_OVERHEAD_BYTES = 100
+
+
+class LRUCache:
+    """
+    LRU cache limited by the size of entries in bytes, thread-safe
+    use like this:
+    cache = LRUCache(max_bytes=1024 * 1024)
+    cache.put(key, value, size)
+    value = cache.get(key)  # None if there is no such key
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int):
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'size_bytes': self.size_bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= entry[1]
+
+
+def page_entry_size(title: str) -> int:
+    return sys.getsizeof(title) + ENTRY_OVERHEAD_BYTES
+
+
+def adjacency_entry_size(children: tuple) -> int:
+    return ENTRY_OVERHEAD_BYTES + len(children) * CHILD_OVERHEAD_BYTES
+
+
+page_cache = LRUCache(settings.page_cache_max_bytes)
+adjacency_cache = LRUCache(settings.adjacency_cache_max_bytes)
+
+
+def get_cache_stats() -> Dict[str, Dict[str, int]]:
+    return {'page_cache': page_cache.get_stats(), 'adjacency_cache': adjacency_cache.get_stats()}
+
+
+def clear_caches():
+    page_cache.clear()
+    adjacency_cache.clear()
@@ -0,0 +1,55 @@
+import unittest
+
+from graph_cache import LRUCache, adjacency_entry_size
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def test_hits_and_misses(self):
+        cache = LRUCache(max_bytes=1000)
+        cache.put(1, 'a', 10)
+        self.assertEqual(cache.get(1), 'a')
+        self.assertIsNone(cache.get(2))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    # the least recently used entries are evicted when the size limit is exceeded
+    def test_eviction_by_size(self):
+        cache = LRUCache(max_bytes=100)
+        cache.put(1, 'a', 40)
+        cache.put(2, 'b', 40)
+        cache.get(1)
+        cache.put(3, 'c', 40)
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(1), 'a')
+        self.assertEqual(cache.get(3), 'c')
+        self.assertEqual(cache.size_bytes, 80)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_entry_bigger_than_cache_is_not_stored(self):
+        cache = LRUCache(max_bytes=100)
+        cache.put(1, 'a', 101)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size_bytes, 0)
+
+    def test_put_existing_key_and_invalidate(self):
+        cache = LRUCache(max_bytes=100)
+        cache.put(1, 'a', 40)
+        cache.put(1, 'b', 30)
+        self.assertEqual(cache.size_bytes, 30)
+        cache.invalidate(1)
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.size_bytes, 0)
+
+    def test_disabled_cache(self):
+        cache = LRUCache(max_bytes=0)
+        cache.put(1, 'a', 1)
+        self.assertIsNone(cache.get(1))
+
+    def test_adjacency_entry_size_grows_with_children(self):
+        small = adjacency_entry_size(((1, 2),))
+        big = adjacency_entry_size(((1, 2), (2, 1)))
+        self.assertGreater(big, small)
+
+
+if __name__ == '__main__':
+    unittest.main()
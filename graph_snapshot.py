@@ -0,0 +1,235 @@
+"""
+this module keeps a compact snapshot of the crawled graph (tables 'pages' and 'links') in a memory-mapped file
+and searches routes in it without the database
+the file format (little-endian, all arrays are aligned to 8 bytes):
+  - header: magic, pages_count (n), links_count (m), titles_bytes
+  - offsets: int32[n + 1] - CSR offsets, the children of page i are targets[offsets[i]:offsets[i + 1]]
+  - targets: int32[m] - indexes of the child pages (in the order of the titles in DB, as in find_path)
+  - page_ids: int64[n] - page_id in DB
+  - statuses: uint8[n] - page_status
+  - title_offsets: int32[n + 1] - the title of page i is titles[title_offsets[i]:title_offsets[i + 1]]
+  - titles: utf-8
+pages are ordered by title (utf-8 bytes), so the index of a title is found by binary search
+use like this:
+  python graph_snapshot.py export graph_snapshot.bin
+  snapshot = GraphSnapshot.load('graph_snapshot.bin')
+  path = snapshot.find_path('Дружба', 'Рим', max_links_in_route=4)
+"""
+import argparse
+import mmap
+import struct
+import sys
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+import settings
+from db_context import PageStatus, get_db
+
+MAGIC = b'WRCSR001'
+_HEADER = struct.Struct('<8sIIQ')
+
+
+def _align(position: int) -> int:
+    return (position + 7) & ~7
+
+
+def build_snapshot(path: str,
+                   pages: Iterable[Tuple[int, str, int]],
+                   links: Iterable[Tuple[int, int]]):
+    """
+    writes the snapshot file
+    :param path: str
+    :param pages: (page_id, page_title, page_status)
+    :param links: (parent_id, child_id), the children of each parent in the order of the search
+    """
+    pages = sorted(pages, key=lambda page: page[1])
+    index_by_id = {page[0]: index for index, page in enumerate(pages)}
+    pages_count = len(pages)
+
+    # links -> CSR (stable counting sort by parent index)
+    parents = array('i')
+    children = array('i')
+    for parent_id, child_id in links:
+        parent_index = index_by_id.get(parent_id)
+        child_index = index_by_id.get(child_id)
+        if parent_index is not None and child_index is not None:
+            parents.append(parent_index)
+            children.append(child_index)
+    offsets = array('i', [0]) * (pages_count + 1)
+    for parent_index in parents:
+        offsets[parent_index + 1] += 1
+    for index in range(pages_count):
+        offsets[index + 1] += offsets[index]
+    targets = array('i', [0]) * len(children)
+    next_position = array('i', offsets[:-1])
+    for parent_index, child_index in zip(parents, children):
+        targets[next_position[parent_index]] = child_index
+        next_position[parent_index] += 1
+
+    page_ids = array('q', (page[0] for page in pages))
+    statuses = array('B', (page[2] for page in pages))
+    encoded_titles = [page[1].encode('utf-8') for page in pages]
+    title_offsets = array('i', [0]) * (pages_count + 1)
+    for index, encoded_title in enumerate(encoded_titles):
+        title_offsets[index + 1] = title_offsets[index] + len(encoded_title)
+    titles = b''.join(encoded_titles)
+
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, pages_count, len(targets), len(titles)))
+        for data in (offsets, targets, page_ids, statuses, title_offsets):
+            file.write(b'\0' * (_align(file.tell()) - file.tell()))
+            file.write(data.tobytes())
+        file.write(titles)
+
+
+def export_snapshot(path: str):
+    """
+    exports the tables 'pages' and 'links' from the DB into the snapshot file
+    """
+    db = get_db()
+    try:
+        with db.transaction():
+            with db.conn.cursor(name='snapshot_pages') as cursor:
+                cursor.itersize = settings.db_fetch_size
+                cursor.execute("SELECT page_id, page_title, page_status FROM pages;")
+                pages = [(row[0], row[1], row[2]) for row in cursor]
+            with db.conn.cursor(name='snapshot_links') as cursor:
+                cursor.itersize = settings.db_fetch_size
+                cursor.execute("""
+                    SELECT l1.parent_id, l1.child_id
+                    FROM links l1
+                        INNER JOIN pages p2 ON p2.page_id = l1.child_id
+                    ORDER BY l1.parent_id, p2.page_title;
+                    """)
+                build_snapshot(path, pages, ((row[0], row[1]) for row in cursor))
+    finally:
+        db.close()
+
+
+class GraphSnapshot:
+    """
+    read-only graph over the memory-mapped snapshot file
+    """
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magic, self.pages_count, self.links_count, titles_bytes = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('Wrong format of the graph snapshot file!')
+        view = memoryview(buffer)
+        position = _HEADER.size
+
+        def take(type_code: str, count: int, item_size: int):
+            nonlocal position
+            position = _align(position)
+            part = view[position:position + count * item_size].cast(type_code)
+            position += count * item_size
+            return part
+
+        self.offsets = take('i', self.pages_count + 1, 4)
+        self.targets = take('i', self.links_count, 4)
+        self.page_ids = take('q', self.pages_count, 8)
+        self.statuses = take('B', self.pages_count, 1)
+        self.title_offsets = take('i', self.pages_count + 1, 4)
+        self.titles = view[position:position + titles_bytes]
+
+    @classmethod
+    def load(cls, path: str) -> 'GraphSnapshot':
+        with open(path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer)
+
+    def get_title(self, index: int) -> str:
+        return bytes(self.titles[self.title_offsets[index]:self.title_offsets[index + 1]]).decode('utf-8')
+
+    def _title_bytes(self, index: int) -> bytes:
+        return bytes(self.titles[self.title_offsets[index]:self.title_offsets[index + 1]])
+
+    def index_of(self, title: str) -> Optional[int]:
+        """
+        binary search of the page index by title
+        :return: int or None, if there is no such page in the snapshot
+        """
+        key = title.encode('utf-8')
+        low, high = 0, self.pages_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._title_bytes(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.pages_count and self._title_bytes(low) == key:
+            return low
+        return None
+
+    def get_children(self, index: int):
+        return self.targets[self.offsets[index]:self.offsets[index + 1]]
+
+    def find_path(self, start: str, finish: str, max_links_in_route: int) -> Optional[List[str]]:
+        """
+        BFS in the snapshot with the same order of expansion as WikiRacer.find_path,
+        so the result is the same route that the online search would find
+        the route is returned only if the snapshot has enough data to be sure:
+        all expanded pages must be parsed (if a page of the frontier is NOT_PARSED, the online search
+        would parse it first and could find another route)
+        :return: List[str] - the route, or None if the snapshot cannot answer
+        """
+        start_index = self.index_of(start)
+        finish_index = self.index_of(finish)
+        if start_index is None or finish_index is None:
+            return None
+        can_be_used = PageStatus.PARSED_CAN_BE_USED.value
+        if self.statuses[start_index] != can_be_used or self.statuses[finish_index] != can_be_used:
+            return None
+
+        parents = {start_index: -1}
+        generation = [start_index]
+        for _ in range(max_links_in_route):
+            next_generation = []
+            for parent_index in generation:
+                for child_index in self.get_children(parent_index):
+                    if child_index in parents:
+                        continue
+                    parents[child_index] = parent_index
+                    if child_index == finish_index:
+                        return self._get_path(parents, finish_index)
+                    next_generation.append(child_index)
+            # the next generation is expanded only if all its pages are parsed
+            generation = []
+            for index in next_generation:
+                status = self.statuses[index]
+                if status == PageStatus.NOT_PARSED.value:
+                    return None
+                if status == can_be_used:
+                    generation.append(index)
+            if not generation:
+                return None
+        return None
+
+    def _get_path(self, parents: dict, index: int) -> List[str]:
+        path = []
+        while index != -1:
+            path.append(self.get_title(index))
+            index = parents[index]
+        path.reverse()
+        return path
+
+
+def load_snapshot_if_exists() -> Optional[GraphSnapshot]:
+    """
+    loads the snapshot from settings.py/graph_snapshot_path, if the file exists
+    """
+    try:
+        return GraphSnapshot.load(settings.graph_snapshot_path)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='graph snapshot of the crawled pages')
+    parser.add_argument('command', choices=['export'])
+    parser.add_argument('path', nargs='?', default=settings.graph_snapshot_path)
+    args = parser.parse_args()
+    export_snapshot(args.path)
+    snapshot = GraphSnapshot.load(args.path)
+    print(f'pages: {snapshot.pages_count}, links: {snapshot.links_count}', file=sys.stderr)
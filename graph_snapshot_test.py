@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+from db_context import PageStatus
+from graph_snapshot import GraphSnapshot, build_snapshot
+
+OK = PageStatus.PARSED_CAN_BE_USED.value
+NOT_PARSED = PageStatus.NOT_PARSED.value
+NO_ARTICLE = PageStatus.PARSED_NO_SUCH_ARTICLE.value
+
+PAGES = [(1, 'Дружба', OK), (2, 'Якопо Понтормо', OK), (3, 'Рим', OK), (4, 'Бароко', OK),
+         (5, 'Пілястра', OK), (6, 'Невідома', NOT_PARSED), (7, 'Немає', NO_ARTICLE), (8, 'Ізольована', OK)]
+LINKS = [(1, 4), (1, 7), (1, 2), (2, 3), (2, 1), (4, 5), (4, 3), (3, 1)]
+
+
+class GraphSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'graph_snapshot.bin')
+        build_snapshot(self.path, PAGES, LINKS)
+        self.snapshot = GraphSnapshot.load(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_titles_and_children(self):
+        self.assertEqual((self.snapshot.pages_count, self.snapshot.links_count), (8, 8))
+        index = self.snapshot.index_of('Дружба')
+        self.assertEqual(self.snapshot.get_title(index), 'Дружба')
+        self.assertEqual(self.snapshot.page_ids[index], 1)
+        children = [self.snapshot.get_title(child) for child in self.snapshot.get_children(index)]
+        # the order of the children is kept as in the links
+        self.assertEqual(children, ['Бароко', 'Немає', 'Якопо Понтормо'])
+        self.assertIsNone(self.snapshot.index_of('Римм'))
+
+    # the first found route in the order of expansion (as in WikiRacer.find_path)
+    def test_find_path(self):
+        self.assertEqual(self.snapshot.find_path('Дружба', 'Рим', 4), ['Дружба', 'Бароко', 'Рим'])
+        self.assertEqual(self.snapshot.find_path('Дружба', 'Пілястра', 4), ['Дружба', 'Бароко', 'Пілястра'])
+        self.assertEqual(self.snapshot.find_path('Якопо Понтормо', 'Бароко', 4),
+                         ['Якопо Понтормо', 'Дружба', 'Бароко'])
+
+    def test_find_path_max_links(self):
+        self.assertIsNone(self.snapshot.find_path('Якопо Понтормо', 'Пілястра', 2))
+        self.assertEqual(self.snapshot.find_path('Якопо Понтормо', 'Пілястра', 3),
+                         ['Якопо Понтормо', 'Дружба', 'Бароко', 'Пілястра'])
+
+    # the snapshot does not answer if the route could go through a page that is not parsed
+    def test_find_path_not_parsed_page(self):
+        build_snapshot(self.path, PAGES, LINKS + [(1, 6), (6, 5)])
+        snapshot = GraphSnapshot.load(self.path)
+        self.assertEqual(snapshot.find_path('Дружба', 'Бароко', 4), ['Дружба', 'Бароко'])
+        self.assertIsNone(snapshot.find_path('Дружба', 'Пілястра', 4))
+
+    def test_find_path_unknown_pages(self):
+        self.assertIsNone(self.snapshot.find_path('Дружба', 'Ізольована', 4))
+        self.assertIsNone(self.snapshot.find_path('Дружба', 'Немає', 4))
+        self.assertIsNone(self.snapshot.find_path('Немає такої', 'Рим', 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
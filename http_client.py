@@ -0,0 +1,74 @@
+"""
+this module makes the HTTP client of the crawler:
+  - one requests.Session with a pool of keep-alive connections (the TCP/TLS connections are reused
+    by all requests of WikiRacer, also by the fetching threads), without the retries of urllib3
+    (the retries are in WikiRacer._request())
+  - the header User-Agent (settings.py/user_agent), as the Wikimedia User-Agent policy requires
+  - compressed responses: gzip and deflate, and brotli if the package brotli (or brotlicffi) is installed
+  - conditional requests: the validators of the page (ETag, Last-Modified) from the previous response
+    are sent as If-None-Match/If-Modified-Since, the answer 304 Not Modified has no body
+  - a streamed body, which is not read to the end (the links are collected), is drained, if the rest
+    is small (settings.py/stream_drain_max_bytes), so the keep-alive connection goes back to the pool,
+    a longer rest is not read, the connection is closed (a new connection costs less than the rest of the body)
+use like this:
+  session = create_session(pool_size=8)
+  response = session.get(url, headers=get_conditional_headers(etag, last_modified))
+"""
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+import settings
+
+
+def create_session(pool_size: int = 1) -> requests.Session:
+    """
+    :param pool_size: int, the maximum number of kept connections to one host
+                      (not less than the number of threads, which use the session at once)
+    :return: requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, pool_size), max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'User-Agent': settings.user_agent, 'Accept-Encoding': ACCEPT_ENCODING})
+    return session
+
+
+def get_conditional_headers(etag: Optional[str], last_modified: Optional[str]) -> Dict[str, str]:
+    """
+    the headers of a conditional request by the validators of the previous response
+    """
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
+
+
+def get_validators(response: requests.Response) -> Tuple[Optional[str], Optional[str]]:
+    """
+    :return: (ETag, Last-Modified) of the response (None - the header is absent)
+    """
+    return response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+
+def drain_response(response: requests.Response, max_bytes: int) -> bool:
+    """
+    reads the rest of a streamed body (not more than max_bytes), so the connection is released
+    to the pool of the session, otherwise response.close() closes the connection
+    :param response: requests.Response (stream=True)
+    :param max_bytes: int, the maximum rest of the body, which is read (0 - only the end of the body is checked)
+    :return: bool, the body is read to the end (the connection can be reused)
+    """
+    remaining = max_bytes
+    while remaining > 0:
+        data = response.raw.read(min(remaining, 65536))
+        if not data:
+            return True
+        remaining -= len(data)
+    # the budget is used up: the body may end exactly here
+    return not response.raw.read(1)
@@ -0,0 +1,28 @@
+import io
+import unittest
+
+import requests
+
+from http_client import drain_response
+
+
+def streamed_response(body: bytes) -> requests.Response:
+    response = requests.Response()
+    response.raw = io.BytesIO(body)
+    return response
+
+
+class DrainResponseTest(unittest.TestCase):
+
+    # the body is read to the end, if its rest is not longer than max_bytes (also exactly max_bytes)
+    def test_drain_response(self):
+        for size, max_bytes, drained in [(0, 0, True), (10, 100, True), (100, 100, True), (65536, 65536, True),
+                                         (131072, 131072, True), (101, 100, False), (1, 0, False)]:
+            with self.subTest(size=size, max_bytes=max_bytes):
+                response = streamed_response(b'x' * size)
+                self.assertEqual(drain_response(response, max_bytes), drained)
+                self.assertLessEqual(response.raw.tell(), max_bytes + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
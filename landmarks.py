@@ -0,0 +1,212 @@
+"""
+this module keeps the landmark distance index for the goal-directed search (ALT, search_mode = 'landmarks'):
+  - K landmarks are the pages with the most links to themselves (as Task 1 in queries.sql, by the counters
+    of the table 'page_degrees')
+  - for each landmark L and each page v the table 'landmark_distances' keeps
+    forward_distance = d(L, v) and backward_distance = d(v, L) over the crawled graph (the table 'links'),
+    not longer than settings.py/landmark_max_distance links (NULL - unknown)
+  - by the triangle inequality d(v, t) >= d(L, t) - d(L, v) and d(v, t) >= d(v, L) - d(t, L),
+    so the maximum over all landmarks is a lower bound of the number of links from v to the finish page t
+the distances are computed in the DB by set-based relaxation, generation by generation:
+the distances of the changed pages are pushed along their links, while some distance becomes smaller.
+The refresh is incremental: only the links added after the previous build/refresh (link_id > last_link_id)
+are taken as the start of the relaxation (a new link can only make the distances smaller).
+A deletion of links (the recrawl replaces the links of a changed page) can make the distances longer,
+it is flagged by a trigger on the table 'links' (landmarks.links_deleted), and the refresh builds the index again.
+While a page is not parsed, its links are unknown, so on a partially crawled graph the stored distances
+can be longer than the real ones, and the bounds are only estimates: the search orders the pages by them,
+but skips the pages only if the index is exact (is_landmark_index_exact(): there were no NOT_PARSED pages
+at the build/refresh, no links were deleted after the build and no links were added after the build/refresh,
+the best case is the graph after dump_importer.py)
+use like this:
+  python landmarks.py build [--count K]
+  python landmarks.py refresh
+"""
+import argparse
+import sys
+from typing import Dict, List
+
+import settings
+from analytics import get_top_linked_pages
+from db_context import PageStatus, get_db
+
+
+def _relax(cursor, direction: str, max_distance: int) -> int:
+    """
+    pushes the distances of the pages from the temporary table 'landmark_frontier' along the links
+    (forward: parent -> child, backward: child -> parent), generation by generation,
+    while some distance becomes smaller
+    :return: int, the number of changed distances
+    """
+    if direction == 'forward':
+        column, from_column, to_column = 'forward_distance', 'parent_id', 'child_id'
+    else:
+        column, from_column, to_column = 'backward_distance', 'child_id', 'parent_id'
+    changed_count = 0
+    while True:
+        cursor.execute(f"""
+            WITH changed AS (
+                INSERT INTO landmark_distances (landmark_id, page_id, {column})
+                SELECT f.landmark_id, l1.{to_column}, MIN(f.distance) + 1
+                FROM landmark_frontier f
+                    INNER JOIN links l1 ON l1.{from_column} = f.page_id
+                WHERE f.distance < %s
+                GROUP BY f.landmark_id, l1.{to_column}
+                ON CONFLICT (landmark_id, page_id) DO UPDATE SET {column} = EXCLUDED.{column}
+                    WHERE landmark_distances.{column} IS NULL OR landmark_distances.{column} > EXCLUDED.{column}
+                RETURNING landmark_id, page_id, {column}
+            )
+            INSERT INTO landmark_next_frontier SELECT * FROM changed;
+            """, (max_distance,))
+        if cursor.rowcount <= 0:
+            break
+        changed_count += cursor.rowcount
+        cursor.execute("""
+            TRUNCATE landmark_frontier;
+            INSERT INTO landmark_frontier SELECT * FROM landmark_next_frontier;
+            TRUNCATE landmark_next_frontier;
+            """)
+    cursor.execute("TRUNCATE landmark_frontier; TRUNCATE landmark_next_frontier;")
+    return changed_count
+
+
+def _create_frontier_tables(cursor):
+    cursor.execute("""
+        CREATE TEMP TABLE landmark_frontier (landmark_id bigint, page_id bigint, distance integer) ON COMMIT DROP;
+        CREATE TEMP TABLE landmark_next_frontier (LIKE landmark_frontier) ON COMMIT DROP;
+        """)
+
+
+def build_landmark_index(count: int = None) -> Dict[str, int]:
+    """
+    selects the landmarks and computes all distances from/to them (the old index is removed)
+    :param count: int, the number of landmarks (settings.py/landmark_count by default)
+    """
+    count = settings.landmark_count if count is None else count
+    landmark_ids = [page_id for _, page_id, _ in get_top_linked_pages(count)]
+    stats: Dict[str, int] = {}
+    db = get_db()
+    try:
+        with db.transaction():
+            with db.cursor() as cursor:
+                cursor.execute("DELETE FROM landmarks;")
+                cursor.execute("""
+                    INSERT INTO landmarks (landmark_id, last_link_id, all_parsed)
+                    SELECT page_id, (SELECT COALESCE(MAX(link_id), 0) FROM links),
+                           NOT EXISTS (SELECT 1 FROM pages WHERE page_status = %s)
+                    FROM unnest(%s::bigint[]) AS t(page_id);
+                    """, (PageStatus.NOT_PARSED.value, landmark_ids))
+                stats['landmarks'] = cursor.rowcount
+                cursor.execute("""
+                    INSERT INTO landmark_distances (landmark_id, page_id, forward_distance, backward_distance)
+                    SELECT landmark_id, landmark_id, 0, 0 FROM landmarks;
+                    """)
+                _create_frontier_tables(cursor)
+                for direction in ('forward', 'backward'):
+                    cursor.execute("INSERT INTO landmark_frontier SELECT landmark_id, landmark_id, 0 FROM landmarks;")
+                    stats[direction] = _relax(cursor, direction, settings.landmark_max_distance)
+    finally:
+        db.close()
+    return stats
+
+
+def refresh_landmark_index() -> Dict[str, int]:
+    """
+    incremental refresh: the links added after the previous build/refresh are relaxed,
+    and the changed distances are pushed further
+    if some links were deleted after the build, the index is built again (with the same number of landmarks)
+    """
+    stats: Dict[str, int] = {}
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*), COALESCE(bool_or(links_deleted), false) FROM landmarks;")
+        landmark_count, links_deleted = cursor.fetchone()
+    db.close()
+    if links_deleted:
+        return build_landmark_index(landmark_count)
+    db = get_db()
+    try:
+        with db.transaction():
+            with db.cursor() as cursor:
+                cursor.execute("SELECT (SELECT COALESCE(MIN(last_link_id), 0) FROM landmarks), "
+                               "(SELECT COALESCE(MAX(link_id), 0) FROM links);")
+                last_link_id, max_link_id = cursor.fetchone()
+                _create_frontier_tables(cursor)
+                # a new link parent -> child can shorten d(L, child) and d(parent, L),
+                # so the relaxation starts from the parents (forward) and from the children (backward)
+                for direction, from_column in (('forward', 'parent_id'), ('backward', 'child_id')):
+                    column = f'{direction}_distance'
+                    cursor.execute(f"""
+                        INSERT INTO landmark_frontier
+                        SELECT DISTINCT ld.landmark_id, ld.page_id, ld.{column}
+                        FROM links l1
+                            INNER JOIN landmark_distances ld ON ld.page_id = l1.{from_column}
+                        WHERE l1.link_id > %s AND ld.{column} IS NOT NULL;
+                        """, (last_link_id,))
+                    stats[direction] = _relax(cursor, direction, settings.landmark_max_distance)
+                cursor.execute("""
+                    UPDATE landmarks SET last_link_id = %s,
+                        all_parsed = NOT EXISTS (SELECT 1 FROM pages WHERE page_status = %s);
+                    """, (max_link_id, PageStatus.NOT_PARSED.value))
+    finally:
+        db.close()
+    return stats
+
+
+def is_landmark_index_exact() -> bool:
+    """
+    the bounds are true lower bounds (a page can be skipped by its bound), only if the index is exact:
+    there were no NOT_PARSED pages at the last build/refresh, no links were deleted after the build
+    and no links were added after the build/refresh
+    :return: bool
+    """
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT COUNT(*) > 0 AND bool_and(all_parsed AND NOT links_deleted)
+                   AND MIN(last_link_id) >= (SELECT COALESCE(MAX(link_id), 0) FROM links)
+            FROM landmarks;
+            """)
+        exact = bool(cursor.fetchone()[0])
+    db.close()
+    return exact
+
+
+def get_lower_bounds(page_ids: List[int], finish_id: int) -> Dict[int, int]:
+    """
+    lower bounds of the number of links from each page to the finish page (by all landmarks)
+    :param page_ids: List[int]
+    :param finish_id: int
+    :return: page_id -> lower bound (only for the pages, for which some bound is known)
+    """
+    bounds: Dict[int, int] = {}
+    if not page_ids:
+        return bounds
+    db = get_db()
+    with db.cursor() as cursor:
+        cursor.execute("""
+            SELECT v.page_id,
+                   MAX(GREATEST(t.forward_distance - v.forward_distance,
+                                v.backward_distance - t.backward_distance))
+            FROM landmark_distances v
+                INNER JOIN landmark_distances t ON t.landmark_id = v.landmark_id AND t.page_id = %s
+            WHERE v.page_id = ANY(%s)
+            GROUP BY v.page_id;
+            """, (finish_id, list(page_ids)))
+        for row in cursor:
+            if row[1] is not None:
+                bounds[row[0]] = row[1]
+    db.close()
+    return bounds
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='landmark distance index for search_mode = landmarks')
+    parser.add_argument('command', choices=['build', 'refresh'])
+    parser.add_argument('--count', type=int, default=settings.landmark_count)
+    args = parser.parse_args()
+    if args.command == 'build':
+        result = build_landmark_index(args.count)
+    else:
+        result = refresh_landmark_index()
+    print(', '.join(f'{name}: {value}' for name, value in result.items()), file=sys.stderr)
@@ -0,0 +1,222 @@
+"""
+this module extracts the titles of the linked pages from the html of a wiki page
+(attribute 'title' of all <a href=...> tags inside <div id="mw-content-text">)
+extractors:
+  - BeautifulSoupExtractor - builds the full BeautifulSoup tree (html.parser), slow, used as a reference
+  - StreamingExtractor - a tokenizer which reads the html by chunks, looks only at <div>/<a> tags,
+    skips everything before the content div and stops at its end
+    (or earlier, if the caller stops the iteration - e.g. when links_per_page titles are collected)
+both extractors return the same titles in the same order
+(link_extractor_test.py checks it also on the pages of the corpus in the folder test_pages (gzip html of
+Дружба, Рим, Якопо Понтормо in the full page markup of uk.wikipedia), a page is added or replaced by:
+  python link_extractor.py save-test-pages --titles Дружба Рим)
+"""
+import argparse
+import gzip
+import os
+import re
+from html import unescape
+from typing import Iterable, Iterator, Dict, List, Optional
+from urllib.parse import quote
+
+from bs4 import BeautifulSoup
+
+import settings
+from ignore_list_patterns import check_pattern_in_title
+
+CONTENT_DIV_ID = 'mw-content-text'
+# the pages of the wiki (gzip html), the corpus of link_extractor_test.py
+TEST_PAGES_PATH = os.path.join(os.path.dirname(__file__), 'test_pages')
+
+# the beginning of a comment or of a tag that the extractor needs
+_TOKEN_RE = re.compile(r'<!--|<(/?)(a|div|script|style)(?=[\s/>])', re.IGNORECASE)
+# the rest of the tag after its name (quoted attribute values may contain '>')
+_TAG_REST_RE = re.compile(r'((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>')
+# attributes, the same rules as in html.parser
+_ATTR_RE = re.compile(r'((?<=[\'"\s/])[^\s/>][^\s/=>]*)(\s*=+\s*(\'[^\']*\'|"[^"]*"|(?![\'"])[^>\s]*))?(?:\s|/(?!>))*')
+# the end of <script>/<style> content
+_RAW_TEXT_END_RE = {'script': re.compile(r'</script\s*>', re.IGNORECASE),
+                    'style': re.compile(r'</style\s*>', re.IGNORECASE)}
+# if an unfinished tag is longer than this, it is treated as broken and skipped
+_MAX_TAG_LENGTH = 65536
+
+
+def _parse_attrs(attrs_str: str) -> Dict[str, str]:
+    attrs = {}
+    for match in _ATTR_RE.finditer(' ' + attrs_str):
+        name, rest, value = match.group(1, 2, 3)
+        if not rest:
+            value = ''
+        elif value[:1] == value[-1:] and value[:1] in ('"', "'") and len(value) > 1:
+            value = value[1:-1]
+        attrs[name.lower()] = unescape(value)
+    return attrs
+
+
+class LinkExtractor:
+    """
+    base class of extractors
+    iter_titles() takes the html of the page (text chunks) and yields the titles one by one
+    """
+
+    def iter_titles(self, chunks: Iterable[str]) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class BeautifulSoupExtractor(LinkExtractor):
+    """
+    reference extractor, builds the full BeautifulSoup tree of the page
+    """
+
+    def iter_titles(self, chunks: Iterable[str]) -> Iterator[str]:
+        page_html = BeautifulSoup(''.join(chunks), 'html.parser')
+        mw_content_text_element = page_html.find('div', {'id': CONTENT_DIV_ID})
+        if mw_content_text_element is None:
+            return
+        for href in mw_content_text_element.findAll('a', href=True):
+            title = href.get('title')
+            if title is not None:
+                yield title
+
+
+class StreamingExtractor(LinkExtractor):
+    """
+    fast extractor, reads the html chunk by chunk and yields titles as soon as they are found
+    """
+
+    def iter_titles(self, chunks: Iterable[str]) -> Iterator[str]:
+        buffer = ''
+        pos = 0
+        div_depth = 0  # 0 - outside of the content div
+        raw_text_end: Optional[re.Pattern] = None  # inside <script>/<style>
+
+        for chunk in _with_end_marker(chunks):
+            final = chunk is None
+            if not final:
+                buffer = buffer[pos:] + chunk
+                pos = 0
+
+            while True:
+                if raw_text_end is not None:
+                    match = raw_text_end.search(buffer, pos)
+                    if match is None:
+                        # keep only the tail, where the end tag can begin
+                        pos = max(pos, len(buffer) - len('</script'))
+                        break
+                    raw_text_end = None
+                    pos = match.end()
+                    continue
+
+                match = _TOKEN_RE.search(buffer, pos)
+                if match is None:
+                    # keep a possible beginning of a token at the end of the buffer (like '<di' or '<!-')
+                    last_lt = -1 if final else buffer.rfind('<', max(pos, len(buffer) - len('</script')))
+                    pos = last_lt if last_lt != -1 else len(buffer)
+                    break
+
+                if match.group(2) is None:
+                    # comment
+                    comment_end = buffer.find('-->', match.end())
+                    if comment_end == -1:
+                        pos = len(buffer) if final else match.start()
+                        break
+                    pos = comment_end + 3
+                    continue
+
+                rest = _TAG_REST_RE.match(buffer, match.end())
+                if rest is None:
+                    if not final and len(buffer) - match.start() < _MAX_TAG_LENGTH:
+                        # the tag is not finished in this chunk
+                        pos = match.start()
+                        break
+                    pos = match.end()
+                    continue
+                pos = rest.end()
+
+                is_end_tag = match.group(1) == '/'
+                tag_name = match.group(2).lower()
+                attrs_str = rest.group(1)
+                is_self_closing = attrs_str.endswith('/')
+
+                if tag_name in _RAW_TEXT_END_RE:
+                    if not is_end_tag:
+                        raw_text_end = _RAW_TEXT_END_RE[tag_name]
+                elif tag_name == 'div':
+                    if div_depth == 0:
+                        if not is_end_tag and _parse_attrs(attrs_str).get('id') == CONTENT_DIV_ID:
+                            if is_self_closing:
+                                return
+                            div_depth = 1
+                    elif is_end_tag:
+                        div_depth -= 1
+                        if div_depth == 0:
+                            return
+                    elif not is_self_closing:
+                        div_depth += 1
+                elif div_depth > 0 and not is_end_tag:
+                    attrs = _parse_attrs(attrs_str)
+                    if 'href' in attrs and 'title' in attrs:
+                        yield attrs['title']
+
+            if final:
+                return
+
+
+def _with_end_marker(chunks: Iterable[str]) -> Iterator[Optional[str]]:
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+    yield None
+
+
+def create_link_extractor() -> LinkExtractor:
+    """
+    creates the extractor from the settings (settings.py/link_extractor: 'streaming' or 'beautifulsoup')
+    """
+    if settings.link_extractor == 'beautifulsoup':
+        return BeautifulSoupExtractor()
+    return StreamingExtractor()
+
+
+def extract_linked_titles(extractor: LinkExtractor, chunks: Iterable[str], links_per_page: int) -> List[str]:
+    """
+    the titles of the linked pages without titles from ignore_list_patterns, not more than links_per_page
+    (the reading of the chunks stops, when links_per_page titles are collected)
+    """
+    linked_titles: List[str] = []
+    if links_per_page > 0:
+        for title in extractor.iter_titles(chunks):
+            if not check_pattern_in_title(title):
+                linked_titles.append(title)
+                if len(linked_titles) >= links_per_page:
+                    break
+    return linked_titles
+
+
+def save_test_pages(titles: List[str], path: str = TEST_PAGES_PATH) -> List[str]:
+    """
+    saves the html of the pages from the wiki (settings.py/source_link) to the corpus of the tests
+    :return: List of the paths of the saved files
+    """
+    from http_client import create_session
+
+    os.makedirs(path, exist_ok=True)
+    session = create_session()
+    saved = []
+    for title in titles:
+        response = session.get(settings.source_link + quote(title.replace(' ', '_')), timeout=60)
+        response.raise_for_status()
+        file_path = os.path.join(path, title.replace(' ', '_').replace('/', '_') + '.html.gz')
+        with gzip.open(file_path, 'wb') as file:
+            file.write(response.content)
+        saved.append(file_path)
+    return saved
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='the corpus of the saved real pages of link_extractor_test.py')
+    parser.add_argument('command', choices=['save-test-pages'])
+    parser.add_argument('--titles', nargs='+', required=True, help='the pages to save')
+    args = parser.parse_args()
+    for saved_path in save_test_pages(args.titles):
+        print(saved_path)
@@ -0,0 +1,101 @@
+import glob
+import gzip
+import os
+import unittest
+
+from link_extractor import TEST_PAGES_PATH, BeautifulSoupExtractor, StreamingExtractor, extract_linked_titles
+
+# pages in the form of MediaWiki html with the cases that the extractors must handle in the same way
+PAGES = {
+    'simple': """<!DOCTYPE html><html><head><title>Дружба</title></head><body>
+        <div id="mw-navigation"><a href="/wiki/Main" title="Головна сторінка">Main</a></div>
+        <div id="bodyContent"><div id="mw-content-text" class="mw-body-content" lang="uk" dir="ltr">
+        <div class="mw-parser-output"><p><b>Дружба</b> — <a href="/wiki/%D0%A0%D0%B8%D0%BC" title="Рим">Рим</a>,
+        <a href="/wiki/Якопо_Понтормо" title="Якопо Понтормо">Понтормо</a></p>
+        <a href="#cite_note-1">[1]</a> <a title="Без href">no href</a>
+        <a href="/wiki/Категорія:Дружба" title="Категорія:Дружба">cat</a></div></div>
+        <div id="catlinks"><a href="/wiki/Категорія:Ще" title="Категорія:Ще">cat</a></div></div>
+        </body></html>""",
+    'entities_and_quotes': """<div id='mw-content-text'>
+        <a href="/wiki/A" title="Том &amp; Джеррі">x</a>
+        <a href='/wiki/B' title='Сторінка &quot;B&quot;'>x</a>
+        <a href=/wiki/C title=C&#39;s>x</a>
+        <A HREF="/wiki/D" TITLE="Великі літери">x</A>
+        <a href="/wiki/E" title="a > b">x</a>
+        <a href title="Порожній href">x</a>
+        <a href="/wiki/F" title="">x</a>
+        <a href="/wiki/G" title="Перший" title="Другий">x</a>
+        <a
+            href="/wiki/H"
+            title="Багато рядків">x</a>
+        </div><a href="/wiki/Z" title="Після контенту">z</a>""",
+    'nested_divs_and_comments': """<div id="top"><a href="/wiki/Z" title="До контенту">z</a></div>
+        <div id="mw-content-text"><div><div class="thumb"><a href="/wiki/A" title="A">a</a></div>
+        <!-- <a href="/wiki/Comment" title="Коментар">c</a> </div></div> -->
+        <div/><a href="/wiki/B" title="B">b</a></div>
+        <script>var s = '<a href="/wiki/S" title="Скрипт">s</a></div>';</script>
+        <style>div > a { color: red; }</style>
+        <a href="/wiki/C" title="C">c</a><abbr title="Абревіатура">ab</abbr><area href="/x" title="Area">
+        </div>
+        <div id="catlinks"><a href="/wiki/Z" title="Після контенту">z</a></div>""",
+    'no_content_div': """<html><body><div id="other"><a href="/wiki/A" title="A">a</a></div></body></html>""",
+    'unclosed_content_div': """<div id="mw-content-text"><p><a href="/wiki/A" title="A">a</a>
+        <a href="/wiki/B" title="B">b</a>""",
+}
+
+
+def split_by(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class LinkExtractorTest(unittest.TestCase):
+
+    # the streaming extractor gives the same titles as BeautifulSoup for any size of chunks
+    def test_streaming_matches_beautifulsoup(self):
+        for name, page in PAGES.items():
+            expected = list(BeautifulSoupExtractor().iter_titles([page]))
+            for size in [1, 2, 3, 7, 64, 1000, len(page)]:
+                with self.subTest(page=name, chunk_size=size):
+                    result = list(StreamingExtractor().iter_titles(split_by(page, size)))
+                    self.assertEqual(expected, result)
+
+    # the same on the pages of the corpus test_pages (the full page markup of uk.wikipedia: the skin, scripts,
+    # templates, references, navboxes, categories), more pages are saved by:
+    # python link_extractor.py save-test-pages --titles ...
+    def test_saved_pages_match_beautifulsoup(self):
+        paths = sorted(glob.glob(os.path.join(TEST_PAGES_PATH, '*.html.gz')))
+        self.assertTrue(paths, 'no pages in test_pages, run: python link_extractor.py save-test-pages --titles ...')
+        for path in paths:
+            with gzip.open(path, 'rb') as file:
+                page = file.read().decode('utf-8')
+            expected = list(BeautifulSoupExtractor().iter_titles([page]))
+            for size in [1000, 8192, 65536]:
+                with self.subTest(page=os.path.basename(path), chunk_size=size):
+                    self.assertGreater(len(expected), 0)
+                    self.assertEqual(expected, list(StreamingExtractor().iter_titles(split_by(page, size))))
+                    self.assertEqual(extract_linked_titles(BeautifulSoupExtractor(), [page], 200),
+                                     extract_linked_titles(StreamingExtractor(), split_by(page, size), 200))
+
+    def test_titles(self):
+        result = list(StreamingExtractor().iter_titles([PAGES['simple']]))
+        self.assertEqual(result, ['Рим', 'Якопо Понтормо', 'Категорія:Дружба'])
+
+    # the extractor does not read the rest of the page, if the caller stopped the iteration
+    def test_stop_reading_when_enough_links(self):
+        read_chunks = []
+
+        def chunks():
+            for chunk in split_by(PAGES['simple'], 16):
+                read_chunks.append(chunk)
+                yield chunk
+
+        for title in StreamingExtractor().iter_titles(chunks()):
+            if title == 'Рим':
+                break
+        read_text = ''.join(read_chunks)
+        self.assertIn('title="Рим"', read_text)
+        self.assertNotIn('catlinks', read_text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+this module takes the links of wiki pages from the MediaWiki API (api.php, action=query&prop=links)
+instead of downloading the rendered html of each page:
+  - many titles are requested at once (settings.py/api_titles_per_request, up to 50)
+  - only the links to the main namespace are requested (plnamespace=0), as the links of the html parser
+    are mostly articles (the other namespaces would be dropped by ignore_list_patterns anyway)
+  - the answer is continued by the 'continue' parameters until all links of all titles are received,
+    or until every page has links_per_page links
+  - normalized titles and redirects are mapped back to the requested titles
+  - the links are filtered by ignore_list_patterns and limited by links_per_page as in the html parser
+    (note: the API returns the links ordered by namespace and title, not in the order of the page text)
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+from db_context import PageStatus
+from ignore_list_patterns import check_pattern_in_title
+
+
+def build_links_query(titles: List[str]) -> dict:
+    return {
+        'action': 'query',
+        'format': 'json',
+        'formatversion': '2',
+        'prop': 'links',
+        'pllimit': 'max',
+        'plnamespace': '0',
+        'redirects': '1',
+        'titles': '|'.join(titles),
+    }
+
+
+def fetch_links_batch(titles: List[str],
+                      get_json: Callable[[dict], Optional[dict]],
+                      links_per_page: int) -> Dict[str, Optional[Tuple[int, List[str]]]]:
+    """
+    takes the links of all titles from the API (one request + continuations)
+    :param titles: List[str], the titles of the pages (not more than the API allows in one request)
+    :param get_json: function, makes a request with the given parameters and returns the json answer
+                     (or None, if the request failed and the retries are over, or the answer is not json)
+    :param links_per_page: int
+    :return: title -> (PARSED_CAN_BE_USED, linked_titles), (PARSED_NO_SUCH_ARTICLE, []) or None if not fetched
+    """
+    query_params = build_links_query(titles)
+    renamed: Dict[str, str] = {}  # requested or normalized title -> title of the page in the answer
+    missing = set()
+    links: Dict[str, List[str]] = {}
+    continue_params: dict = {}
+
+    while True:
+        data = get_json({**query_params, **continue_params})
+        if data is None:
+            return {title: None for title in titles}
+        query = data.get('query', {})
+        for item in query.get('normalized', []) + query.get('redirects', []):
+            renamed[item['from']] = item['to']
+        for item in query.get('interwiki', []):
+            missing.add(item['title'])
+        for page in query.get('pages', []):
+            title = page['title']
+            if page.get('missing') or page.get('invalid'):
+                missing.add(title)
+                continue
+            page_links = links.setdefault(title, [])
+            for link in page.get('links', []):
+                if len(page_links) >= links_per_page:
+                    break
+                if not check_pattern_in_title(link['title']):
+                    page_links.append(link['title'])
+        if 'continue' not in data:
+            break
+        # the next answers would give only the links over links_per_page
+        if links and all(len(page_links) >= links_per_page for page_links in links.values()):
+            break
+        continue_params = data['continue']
+
+    result: Dict[str, Optional[Tuple[int, List[str]]]] = {}
+    for title in titles:
+        page_title = title
+        # normalized -> redirect -> ... (renamed titles can not make a cycle, but the depth is limited anyway)
+        for _ in range(len(renamed) + 1):
+            if page_title not in renamed:
+                break
+            page_title = renamed[page_title]
+        if page_title in missing:
+            result[title] = (PageStatus.PARSED_NO_SUCH_ARTICLE.value, [])
+        else:
+            result[title] = (PageStatus.PARSED_CAN_BE_USED.value, links.get(page_title, []))
+    return result
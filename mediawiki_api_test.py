@@ -0,0 +1,102 @@
+import unittest
+from unittest import mock
+
+import requests
+
+from db_context import PageStatus
+from mediawiki_api import build_links_query, fetch_links_batch
+from wikiracing import Node, WikiRacer
+
+OK = PageStatus.PARSED_CAN_BE_USED.value
+NO_ARTICLE = PageStatus.PARSED_NO_SUCH_ARTICLE.value
+
+
+class FakeApi:
+    """
+    answers as api.php: the links of the pages are returned by 2 links per answer with 'continue'
+    """
+
+    def __init__(self, pages: dict, redirects: dict = None):
+        self.pages = pages
+        self.redirects = redirects or {}
+        self.requests = []
+
+    def __call__(self, params: dict) -> dict:
+        self.requests.append(params)
+        titles = params['titles'].split('|')
+        offset = int(params.get('plcontinue', 0))
+        query = {'redirects': [{'from': title, 'to': self.redirects[title]}
+                               for title in titles if title in self.redirects],
+                 'pages': []}
+        all_links = []
+        for title in titles:
+            title = self.redirects.get(title, title)
+            if title not in self.pages:
+                query['pages'].append({'title': title, 'missing': True})
+                continue
+            query['pages'].append({'title': title})
+            all_links += [(title, link) for link in self.pages[title]]
+        for title, link in all_links[offset:offset + 2]:
+            page = next(page for page in query['pages'] if page['title'] == title)
+            page.setdefault('links', []).append({'ns': 0, 'title': link})
+        data = {'query': query}
+        if offset + 2 < len(all_links):
+            data['continue'] = {'plcontinue': str(offset + 2), 'continue': '||'}
+        return data
+
+
+class MediaWikiApiTest(unittest.TestCase):
+
+    def test_build_links_query(self):
+        query = build_links_query(['Дружба', 'Рим'])
+        self.assertEqual(query['titles'], 'Дружба|Рим')
+        self.assertEqual((query['prop'], query['pllimit'], query['plnamespace']), ('links', 'max', '0'))
+
+    # all links are collected through the continuations
+    def test_continue(self):
+        api = FakeApi({'Дружба': ['Бароко', 'Рим', 'Якопо Понтормо'], 'Рим': ['Бароко', 'Пілястра']})
+        result = fetch_links_batch(['Дружба', 'Рим'], api, links_per_page=200)
+        self.assertEqual(result, {'Дружба': (OK, ['Бароко', 'Рим', 'Якопо Понтормо']),
+                                  'Рим': (OK, ['Бароко', 'Пілястра'])})
+        self.assertEqual(len(api.requests), 3)
+
+    def test_links_per_page_and_ignore_patterns(self):
+        api = FakeApi({'Дружба': ['Бароко', 'Категорія:Рим', 'Рим', 'Якопо Понтормо']})
+        result = fetch_links_batch(['Дружба'], api, links_per_page=2)
+        self.assertEqual(result, {'Дружба': (OK, ['Бароко', 'Рим'])})
+
+    # the continuations are not requested, when all pages have links_per_page links
+    def test_stop_when_links_per_page(self):
+        api = FakeApi({'Дружба': ['Бароко', 'Рим', 'Якопо Понтормо'], 'Рим': ['Бароко', 'Пілястра', 'Дружба', 'Фестиваль']})
+        result = fetch_links_batch(['Дружба'], api, links_per_page=2)
+        self.assertEqual(result, {'Дружба': (OK, ['Бароко', 'Рим'])})
+        self.assertEqual(len(api.requests), 1)
+        result = fetch_links_batch(['Дружба', 'Рим'], api, links_per_page=2)
+        self.assertEqual(result, {'Дружба': (OK, ['Бароко', 'Рим']), 'Рим': (OK, ['Бароко', 'Пілястра'])})
+        self.assertEqual(len(api.requests), 1 + 3)
+
+    def test_missing_and_redirect(self):
+        api = FakeApi({'Рим': ['Бароко']}, redirects={'Вічне місто': 'Рим'})
+        result = fetch_links_batch(['Вічне місто', 'Немає такої'], api, links_per_page=200)
+        self.assertEqual(result, {'Вічне місто': (OK, ['Бароко']), 'Немає такої': (NO_ARTICLE, [])})
+
+    # the pages stay not parsed if the request failed
+    def test_failed_request(self):
+        result = fetch_links_batch(['Дружба', 'Рим'], lambda params: None, links_per_page=200)
+        self.assertEqual(result, {'Дружба': None, 'Рим': None})
+
+    # an html error page instead of the json answer: the pages are not fetched, no exception in the thread
+    def test_not_json_answer(self):
+        response = requests.Response()
+        response.status_code = 404
+        response.headers['Content-Type'] = 'text/html; charset=UTF-8'
+        response._content = b'<html><body>Not Found</body></html>'
+        racer = WikiRacer()
+        racer.display_log = False
+        racer.session = mock.Mock(get=mock.Mock(return_value=response))
+        self.assertEqual(racer._fetch_pages_api([Node('Дружба'), Node('Рим')]), {'Дружба': None, 'Рим': None})
+        self.assertEqual(racer.session.get.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
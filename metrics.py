@@ -0,0 +1,146 @@
+"""
+this module keeps the metrics of the searches (counters and timers) instead of the text log:
+  - SearchStats - the metrics of one search (WikiRacer.find_path), thread-safe (the pages are fetched by threads)
+    counters: requests, pages_fetched, connection_retries, response_retries, db_statements,
+              page_cache_hits/misses, adjacency_cache_hits/misses, nodes_expanded (by generation) ...
+    timers (seconds): http_wait, parse, rate_limit_sleep, phase_snapshot, phase_validation,
+              phase_route_cache, phase_search, db_save_pages, retry_sleep, find_path
+    (http_wait, parse, rate_limit_sleep are summed over the fetching threads, so they can exceed find_path)
+  - NullStats - the same interface, does nothing (settings.py/collect_stats = False)
+  - total_stats - the sum of all searches of the process
+  - format_prometheus() - the metrics in the Prometheus text format
+use like this:
+  path, stats = racer.find_path_with_stats('Дружба', 'Рим')
+  print(stats.as_dict())
+  print(format_prometheus(total_stats))
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class SearchStats:
+    """
+    counters and timers of one search (or the sum of several searches)
+    """
+    enabled = True
+
+    def __init__(self):
+        self.counters: Dict[str, float] = {}
+        self.timers: Dict[str, float] = {}
+        self.nodes_expanded: Dict[int, int] = {}  # generation -> nodes
+        self.result: Optional[str] = None  # 'found' or the name of the exception
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def count_nodes(self, generation: int, nodes_count: int):
+        with self._lock:
+            self.nodes_expanded[generation] = self.nodes_expanded.get(generation, 0) + nodes_count
+
+    def merge(self, other: 'SearchStats'):
+        """
+        adds the metrics of other (the result is counted in the counter 'searches_<result>')
+        """
+        with other._lock:
+            counters, timers, nodes_expanded = dict(other.counters), dict(other.timers), dict(other.nodes_expanded)
+        with self._lock:
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, value in timers.items():
+                self.timers[name] = self.timers.get(name, 0.0) + value
+            for generation, value in nodes_expanded.items():
+                self.nodes_expanded[generation] = self.nodes_expanded.get(generation, 0) + value
+            if other.result is not None:
+                name = f'searches_{other.result}'
+                self.counters[name] = self.counters.get(name, 0) + 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {'result': self.result, 'counters': dict(self.counters), 'timers': dict(self.timers),
+                    'nodes_expanded': dict(self.nodes_expanded)}
+
+
+class _NullTimer:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullStats(SearchStats):
+    """
+    disabled metrics: all methods do nothing
+    """
+    enabled = False
+
+    def count(self, name: str, value: float = 1):
+        pass
+
+    def add_time(self, name: str, seconds: float):
+        pass
+
+    def timer(self, name: str):
+        return _NULL_TIMER
+
+    def count_nodes(self, generation: int, nodes_count: int):
+        pass
+
+    def merge(self, other: 'SearchStats'):
+        pass
+
+
+total_stats = SearchStats()
+
+
+def _format_name(prefix: str, name: str, suffix: str) -> str:
+    return f'{prefix}_{name}{suffix}'
+
+
+def format_prometheus(stats: SearchStats, prefix: str = 'wikiracing') -> str:
+    """
+    the metrics in the Prometheus text exposition format (all of them are counters)
+    """
+    data = stats.as_dict()
+    lines: List[str] = []
+    searches = {name[len('searches_'):]: value for name, value in data['counters'].items()
+                if name.startswith('searches_')}
+    if searches:
+        lines.append(f'# TYPE {prefix}_searches_total counter')
+        for result, value in sorted(searches.items()):
+            lines.append(f'{prefix}_searches_total{{result="{result}"}} {value}')
+    for name, value in sorted(data['counters'].items()):
+        if name.startswith('searches_'):
+            continue
+        metric = _format_name(prefix, name, '_total')
+        lines.append(f'# TYPE {metric} counter')
+        lines.append(f'{metric} {value}')
+    for name, value in sorted(data['timers'].items()):
+        metric = _format_name(prefix, name, '_seconds_total')
+        lines.append(f'# TYPE {metric} counter')
+        lines.append(f'{metric} {value:.6f}')
+    if data['nodes_expanded']:
+        lines.append(f'# TYPE {prefix}_nodes_expanded_total counter')
+        for generation, value in sorted(data['nodes_expanded'].items()):
+            lines.append(f'{prefix}_nodes_expanded_total{{generation="{generation}"}} {value}')
+    return '\n'.join(lines) + '\n'
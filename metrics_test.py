@@ -0,0 +1,54 @@
+import threading
+import unittest
+
+from metrics import NullStats, SearchStats, format_prometheus
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_counters_and_timers(self):
+        stats = SearchStats()
+        threads = [threading.Thread(target=lambda: [stats.count('requests') for _ in range(1000)])
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with stats.timer('parse'):
+            pass
+        stats.count_nodes(1, 5)
+        stats.count_nodes(1, 2)
+        data = stats.as_dict()
+        self.assertEqual(data['counters'], {'requests': 4000})
+        self.assertGreaterEqual(data['timers']['parse'], 0.0)
+        self.assertEqual(data['nodes_expanded'], {1: 7})
+
+    def test_null_stats(self):
+        stats = NullStats()
+        stats.count('requests')
+        with stats.timer('parse'):
+            stats.add_time('http_wait', 1.0)
+        stats.count_nodes(1, 5)
+        self.assertFalse(stats.enabled)
+        self.assertEqual(stats.as_dict(), {'result': None, 'counters': {}, 'timers': {}, 'nodes_expanded': {}})
+
+    def test_merge_and_prometheus(self):
+        total = SearchStats()
+        for result in ('found', 'found', 'ExceedingMaxLinksInRouteException'):
+            stats = SearchStats()
+            stats.result = result
+            stats.count('requests', 2)
+            stats.add_time('http_wait', 0.5)
+            stats.count_nodes(2, 3)
+            total.merge(stats)
+        text = format_prometheus(total)
+        self.assertIn('# TYPE wikiracing_searches_total counter\n', text)
+        self.assertIn('wikiracing_searches_total{result="found"} 2\n', text)
+        self.assertIn('wikiracing_searches_total{result="ExceedingMaxLinksInRouteException"} 1\n', text)
+        self.assertIn('wikiracing_requests_total 6\n', text)
+        self.assertIn('wikiracing_http_wait_seconds_total 1.500000\n', text)
+        self.assertIn('wikiracing_nodes_expanded_total{generation="2"} 9\n', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
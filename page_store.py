@@ -0,0 +1,267 @@
+"""
+this module keeps the fetched html pages on disk, so the links can be rebuilt without requests
+(e.g. after a change of settings.py/links_per_page or ignore_list_patterns.py):
+  - the bodies are content-addressed: the file objects/ab/abcdef....zst (or .gz) is named by sha256 of the body,
+    the same body of several titles is kept once
+  - the bodies are compressed by zstd (if the package zstandard is installed) or by gzip
+  - the index (title -> sha256, the size and the last access time of each body) is a sqlite file in the same folder
+  - the size of the compressed bodies is limited (settings.py/page_store_max_bytes, by default 0 - no store),
+    the least recently used bodies are removed; the total size is kept in the index by triggers and each put
+    is one sqlite transaction, so the limit holds also for several processes, which share the store
+WikiRacer._fetch_page() takes the page from the store before the request (and saves the fetched pages to it)
+the command reparse rebuilds the links of the stored pages in DB at CPU speed (without requests):
+  python page_store.py reparse [--titles T1 T2 ...]
+  python page_store.py stats
+"""
+import argparse
+import gzip
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import settings
+from db_context import DBSession, PageStatus, WikiPage
+from link_extractor import create_link_extractor, extract_linked_titles
+
+_INDEX_FILE = 'index.sqlite'
+
+
+def _compress(body: bytes) -> Tuple[bytes, str]:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(body), '.zst'
+    return gzip.compress(body, compresslevel=6), '.gz'
+
+
+def _decompress(data: bytes, extension: str) -> bytes:
+    if extension == '.zst':
+        if zstandard is None:
+            raise RuntimeError('the page store has zstd bodies, the package zstandard is required')
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class PageStore:
+    """
+    thread-safe store of the page bodies (the fetching threads put the pages at once)
+    use like this:
+    store = PageStore('page_store', max_bytes=1024 ** 3)
+    store.put('Дружба', body)
+    body = store.get('Дружба')
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(path, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = sqlite3.connect(os.path.join(path, _INDEX_FILE), check_same_thread=False,
+                                      isolation_level=None)
+        self._index.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS bodies (
+                digest TEXT PRIMARY KEY,
+                extension TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bodies_accessed_idx ON bodies (accessed);
+            CREATE TABLE IF NOT EXISTS titles (
+                title TEXT PRIMARY KEY,
+                digest TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS titles_digest_idx ON titles (digest);
+            CREATE TABLE IF NOT EXISTS store_size (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                size INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO store_size (id, size) SELECT 0, COALESCE(SUM(size), 0) FROM bodies;
+            CREATE TRIGGER IF NOT EXISTS bodies_size_insert AFTER INSERT ON bodies
+            BEGIN
+                UPDATE store_size SET size = size + NEW.size;
+            END;
+            CREATE TRIGGER IF NOT EXISTS bodies_size_delete AFTER DELETE ON bodies
+            BEGIN
+                UPDATE store_size SET size = size - OLD.size;
+            END;
+            """)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _object_path(self, digest: str, extension: str) -> str:
+        return os.path.join(self.path, 'objects', digest[:2], digest + extension)
+
+    def get(self, title: str) -> Optional[bytes]:
+        """
+        :return: the body of the page or None, if the page is not in the store
+        """
+        with self._lock:
+            row = self._index.execute("""
+                SELECT b.digest, b.extension FROM titles t INNER JOIN bodies b ON b.digest = t.digest
+                WHERE t.title = ?;
+                """, (title,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._index.execute("UPDATE bodies SET accessed = ? WHERE digest = ?;", (time.time(), row[0]))
+        try:
+            with open(self._object_path(*row), 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                self._remove_body(row[0])
+            return None
+        with self._lock:
+            self.hits += 1
+        return _decompress(data, row[1])
+
+    def put(self, title: str, body: bytes):
+        """
+        saves the body of the page (the previous body of the title is replaced)
+        """
+        if self.max_bytes <= 0:
+            return
+        digest = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            row = self._index.execute("SELECT extension FROM bodies WHERE digest = ?;", (digest,)).fetchone()
+        if row is None:
+            data, extension = _compress(body)
+            if len(data) > self.max_bytes:
+                return
+            object_path = self._object_path(digest, extension)
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            # the file appears at once (rename), a reader never sees a half-written body
+            file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(object_path))
+            with os.fdopen(file_descriptor, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, object_path)
+        with self._lock:
+            # the index is locked for writing by other processes until the store fits max_bytes again
+            self._index.execute("BEGIN IMMEDIATE;")
+            try:
+                now = time.time()
+                if row is None:
+                    self._index.execute("""
+                        INSERT INTO bodies (digest, extension, size, accessed) VALUES (?, ?, ?, ?)
+                        ON CONFLICT (digest) DO NOTHING;
+                        """, (digest, extension, len(data), now))
+                else:
+                    self._index.execute("UPDATE bodies SET accessed = ? WHERE digest = ?;", (now, digest))
+                previous = self._index.execute("SELECT digest FROM titles WHERE title = ?;", (title,)).fetchone()
+                self._index.execute("""
+                    INSERT INTO titles (title, digest) VALUES (?, ?)
+                    ON CONFLICT (title) DO UPDATE SET digest = excluded.digest;
+                    """, (title, digest))
+                if previous is not None and previous[0] != digest:
+                    self._remove_body_if_unused(previous[0])
+                self._evict()
+                self._index.execute("COMMIT;")
+            except BaseException:
+                self._index.execute("ROLLBACK;")
+                raise
+
+    def titles(self) -> Iterator[str]:
+        with self._lock:
+            titles = [row[0] for row in self._index.execute("SELECT title FROM titles ORDER BY title;")]
+        return iter(titles)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            bodies_count = self._index.execute("SELECT COUNT(*) FROM bodies;").fetchone()[0]
+            titles_count = self._index.execute("SELECT COUNT(*) FROM titles;").fetchone()[0]
+            return {'titles': titles_count, 'bodies': bodies_count, 'size_bytes': self._get_size_bytes(),
+                    'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def close(self):
+        self._index.close()
+
+    def _get_size_bytes(self) -> int:
+        # the size of all bodies of all processes, which share the store
+        return self._index.execute("SELECT size FROM store_size WHERE id = 0;").fetchone()[0]
+
+    def _evict(self):
+        # the least recently used bodies are removed with all their titles
+        while self._get_size_bytes() > self.max_bytes:
+            row = self._index.execute("SELECT digest FROM bodies ORDER BY accessed LIMIT 1;").fetchone()
+            if row is None:
+                break
+            self._remove_body(row[0])
+            self.evictions += 1
+
+    def _remove_body_if_unused(self, digest: str):
+        if self._index.execute("SELECT 1 FROM titles WHERE digest = ? LIMIT 1;", (digest,)).fetchone() is None:
+            self._remove_body(digest)
+
+    def _remove_body(self, digest: str):
+        row = self._index.execute("SELECT extension, size FROM bodies WHERE digest = ?;", (digest,)).fetchone()
+        if row is None:
+            return
+        self._index.execute("DELETE FROM titles WHERE digest = ?;", (digest,))
+        self._index.execute("DELETE FROM bodies WHERE digest = ?;", (digest,))
+        try:
+            os.remove(self._object_path(digest, row[0]))
+        except FileNotFoundError:
+            pass
+
+
+def create_page_store() -> Optional[PageStore]:
+    """
+    creates the store from the settings (settings.py/page_store_path, page_store_max_bytes, 0 - no store)
+    """
+    if settings.page_store_max_bytes <= 0:
+        return None
+    return PageStore(settings.page_store_path, settings.page_store_max_bytes)
+
+
+def reparse_pages(store: PageStore, titles: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    rebuilds the links of the stored pages in DB by the current settings (links_per_page, link extractor,
+    ignore_list_patterns): the links, which are not on the page by the current settings, are removed
+    only the pages, which exist in DB, are parsed again (the stored bodies are the pages with status 200)
+    :param store: PageStore
+    :param titles: List[str], the pages (None - all stored pages)
+    :return: dict with the numbers of reparsed and missing pages
+    """
+    extractor = create_link_extractor()
+    stats = {'reparsed': 0, 'not_in_store': 0, 'not_in_db': 0}
+    with DBSession():
+        for title in (titles if titles is not None else store.titles()):
+            body = store.get(title)
+            if body is None:
+                stats['not_in_store'] += 1
+                continue
+            page = WikiPage(title)
+            page.get_from_db()
+            if page.id == 0:
+                stats['not_in_db'] += 1
+                continue
+            linked_titles = extract_linked_titles(extractor, [body.decode('utf-8', errors='replace')],
+                                                  settings.links_per_page)
+            page.save_linked_pages(linked_titles, PageStatus.PARSED_CAN_BE_USED.value, replace_links=True)
+            stats['reparsed'] += 1
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='on-disk store of the fetched pages')
+    parser.add_argument('command', choices=['reparse', 'stats'])
+    parser.add_argument('--titles', nargs='+', default=None, help='the pages to reparse (all stored pages by default)')
+    args = parser.parse_args()
+    page_store = PageStore(settings.page_store_path, settings.page_store_max_bytes)
+    if args.command == 'reparse':
+        result = reparse_pages(page_store, args.titles)
+    else:
+        result = page_store.get_stats()
+    print(', '.join(f'{name}: {value}' for name, value in result.items()), file=sys.stderr)
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from page_store import PageStore
+
+
+class PageStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'store')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    # the same body of two titles is kept once, the stats survive reopening the store
+    def test_put_get(self):
+        store = PageStore(self.path, max_bytes=1024 * 1024)
+        body = ('<html>' + 'Дружба ' * 1000 + '</html>').encode('utf-8')
+        store.put('Дружба', body)
+        store.put('Дружба (значення)', body)
+        self.assertEqual(store.get('Дружба'), body)
+        self.assertIsNone(store.get('Рим'))
+        stats = store.get_stats()
+        self.assertEqual((stats['titles'], stats['bodies'], stats['hits'], stats['misses']), (2, 1, 1, 1))
+        self.assertLess(stats['size_bytes'], len(body) / 10)
+        store.close()
+        store = PageStore(self.path, max_bytes=1024 * 1024)
+        self.assertEqual(store.get('Дружба (значення)'), body)
+        self.assertEqual(store.get_stats()['size_bytes'], stats['size_bytes'])
+        store.close()
+
+    # a new body of the title replaces the old one, the least recently used bodies are evicted
+    def test_replace_and_evict(self):
+        store = PageStore(self.path, max_bytes=1024 * 1024)
+        bodies = {f'Стаття {index}': os.urandom(300 * 1024) for index in range(3)}
+        for title, body in bodies.items():
+            store.put(title, body)
+        store.put('Стаття 0', b'new body')
+        self.assertEqual(store.get('Стаття 0'), b'new body')
+        self.assertEqual(store.get_stats()['bodies'], 3)
+        store.get('Стаття 1')
+        store.put('Стаття 3', os.urandom(300 * 1024))
+        store.put('Стаття 4', os.urandom(300 * 1024))
+        self.assertIsNone(store.get('Стаття 2'))
+        self.assertEqual(store.get('Стаття 1'), bodies['Стаття 1'])
+        self.assertLessEqual(store.get_stats()['size_bytes'], 1024 * 1024)
+        self.assertGreater(store.get_stats()['evictions'], 0)
+        store.close()
+
+    # two stores on one folder (two workers): the size limit holds for the bodies of both
+    def test_shared_store(self):
+        stores = [PageStore(self.path, max_bytes=1024 * 1024) for _ in range(2)]
+        for index in range(8):
+            stores[index % 2].put(f'Стаття {index}', os.urandom(300 * 1024))
+        for store in stores:
+            self.assertLessEqual(store.get_stats()['size_bytes'], 1024 * 1024)
+            self.assertEqual(store.get_stats()['bodies'], 3)
+        self.assertIsNotNone(stores[0].get('Стаття 7'))
+        for store in stores:
+            store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
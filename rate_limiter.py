@@ -0,0 +1,147 @@
+"""
+this module limits the frequency of requests to the wiki site
+the limiter implements GCRA (generic cell rate algorithm, the same as a token bucket):
+each request reserves the next free time slot, so the function knows the exact time to wait
+and does not poll the clock
+the state of the limiter (theoretical arrival time - TAT) is stored in a backend:
+  - MemoryBackend - in the current process (shared by all threads)
+  - FileBackend - in a file with an exclusive lock (shared by all processes on the host)
+  - PostgresBackend - in a row of the table 'rate_limiters' (shared by all processes using the same DB)
+"""
+import fcntl
+import threading
+import time
+from typing import Tuple
+
+import settings
+from db_context import get_db
+
+
+def gcra_reserve(tat: float, now: float, interval: float, tolerance: float) -> Tuple[float, float]:
+    """
+    reserves the next time slot for a request
+    :param tat: float, theoretical arrival time of the next request (unix time, sec)
+    :param now: float, current time (unix time, sec)
+    :param interval: float, time between two requests (60 / requests_per_minute)
+    :param tolerance: float, how much earlier than TAT a request is allowed (burst)
+    :return: (wait in seconds, new TAT)
+    """
+    new_tat = max(tat, now) + interval
+    wait = max(0.0, new_tat - interval - tolerance - now)
+    return wait, new_tat
+
+
+class MemoryBackend:
+    """
+    keeps the TAT in memory, the limit is shared by all threads of the process
+    """
+
+    def __init__(self):
+        self._tat = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, interval: float, tolerance: float) -> float:
+        with self._lock:
+            wait, self._tat = gcra_reserve(self._tat, time.time(), interval, tolerance)
+        return wait
+
+
+class FileBackend:
+    """
+    keeps the TAT in a file, the file is locked (flock) while the TAT is updated,
+    so the limit is shared by all processes on the host that use the same file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def reserve(self, interval: float, tolerance: float) -> float:
+        with open(self.path, 'a+') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                content = file.read().strip()
+                tat = float(content) if content else 0.0
+                wait, tat = gcra_reserve(tat, time.time(), interval, tolerance)
+                file.seek(0)
+                file.truncate()
+                file.write(repr(tat))
+                file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+        return wait
+
+
+class PostgresBackend:
+    """
+    keeps the TAT in a row of the table 'rate_limiters', the row is locked while the TAT is updated
+    and the clock of the DB server is used, so the limit is shared by processes on several hosts
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        db = get_db()
+        with db.cursor() as cursor:
+            cursor.execute("INSERT INTO rate_limiters (limiter_name) VALUES (%s) ON CONFLICT DO NOTHING;",
+                           (self.name,))
+        db.commit()
+        db.close()
+
+    def reserve(self, interval: float, tolerance: float) -> float:
+        db = get_db()
+        with db.cursor() as cursor:
+            cursor.execute("""
+                WITH now AS (SELECT extract(epoch FROM clock_timestamp()) AS ts)
+                UPDATE rate_limiters
+                SET tat = GREATEST(tat, now.ts) + %s
+                FROM now
+                WHERE limiter_name = %s
+                RETURNING tat - %s - now.ts;
+                """, (interval, self.name, interval))
+            wait = cursor.fetchone()[0]
+        db.commit()
+        db.close()
+        return max(0.0, wait - tolerance)
+
+
+class RateLimiter:
+    """
+    limits the number of requests per minute
+    use like this:
+    limiter = RateLimiter(requests_per_minute=100, burst=5)
+    limiter.acquire()  # sleeps exactly as long as needed, then returns
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int = 1, backend=None):
+        self.requests_per_minute = requests_per_minute
+        self.burst = max(1, burst)
+        self.backend = backend if backend is not None else MemoryBackend()
+
+    @property
+    def interval(self) -> float:
+        return 60 / self.requests_per_minute
+
+    def acquire(self) -> float:
+        """
+        reserves a time slot for one request and waits for it
+        :return: float, seconds of delay
+        """
+        interval = self.interval
+        wait = self.backend.reserve(interval, interval * (self.burst - 1))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def create_rate_limiter() -> RateLimiter:
+    """
+    creates the limiter from the settings (requests_per_minute, requests_burst, rate_limiter_backend)
+    :return: RateLimiter
+    """
+    if settings.rate_limiter_backend == 'file':
+        backend = FileBackend(settings.rate_limiter_file)
+    elif settings.rate_limiter_backend == 'postgres':
+        backend = PostgresBackend(settings.rate_limiter_name)
+    else:
+        backend = MemoryBackend()
+    return RateLimiter(settings.requests_per_minute, settings.requests_burst, backend)
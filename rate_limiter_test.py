@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+import unittest
+
+from rate_limiter import RateLimiter, MemoryBackend, FileBackend, gcra_reserve
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    # the burst is allowed at once, the next request waits exactly one interval
+    def test_gcra_reserve(self):
+        tat = 0.0
+        waits = []
+        for _ in range(4):
+            wait, tat = gcra_reserve(tat, 100.0, 1.0, 2.0)
+            waits.append(wait)
+        self.assertEqual(waits, [0.0, 0.0, 0.0, 1.0])
+        self.assertEqual(tat, 104.0)
+
+    # after a pause the limiter does not accumulate more than the burst
+    def test_gcra_reserve_after_pause(self):
+        wait, tat = gcra_reserve(10.0, 1000.0, 1.0, 0.0)
+        self.assertEqual((wait, tat), (0.0, 1001.0))
+        wait, tat = gcra_reserve(tat, 1000.0, 1.0, 0.0)
+        self.assertEqual(wait, 1.0)
+
+    def test_memory_backend(self):
+        limiter = RateLimiter(requests_per_minute=600, burst=2, backend=MemoryBackend())
+        start = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+        duration = time.monotonic() - start
+        # 2 requests at once and 2 requests with an interval of 0.1 sec
+        self.assertGreaterEqual(duration, 0.19)
+        self.assertLess(duration, 0.5)
+
+    # two limiters with one file share one budget (as two processes on the host)
+    def test_file_backend_shared_budget(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'limiter')
+            limiter_1 = RateLimiter(requests_per_minute=600, burst=1, backend=FileBackend(path))
+            limiter_2 = RateLimiter(requests_per_minute=600, burst=1, backend=FileBackend(path))
+            start = time.monotonic()
+            for _ in range(3):
+                limiter_1.acquire()
+                limiter_2.acquire()
+            duration = time.monotonic() - start
+        self.assertGreaterEqual(duration, 0.49)
+        self.assertLess(duration, 0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
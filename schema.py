@@ -0,0 +1,711 @@
+"""
+this module keeps the schema of the database as a list of versioned migrations
+the applied versions are kept in the table 'schema_migrations', each migration is applied once
+in its own transaction (with an advisory lock, so two processes never migrate at once)
+  1 - the base tables: pages, links, routes, route_chains
+  2 - uniqueness constraints and lookup indexes (the duplicates, if any, are removed first):
+      - pages (page_title) - unique, the lookup of a page by title is an index probe
+      - links (parent_id, child_id) - primary key (one link between two pages), link_id stays unique
+      - links (child_id) - the reverse index (the links to a page: bidirectional search, queries.sql)
+      - routes (start_page_title, finish_page_title) - unique
+      - route_chains (route_id, page_order) - unique, the chain is read in order by the index,
+        route_chains (page_id) - the stored routes through a page (get_route_from_chains)
+  3 - the tables of the modules: rate_limiters, failed_routes, page_leases, page_validators,
+      landmarks, landmark_distances
+  4 - the degree counters (page_degrees, kept by the triggers on links and pages) and the materialized
+      Task 3 of queries.sql (page_descendants, the log of changes analytics_changes), see analytics.py
+  5 - the set-based functions of Task 4 of queries.sql (instead of the row-by-row functions)
+  6 - failed_routes (search_mode) - the negative cache is kept for each search mode
+  7 - landmarks (all_parsed, links_deleted) - the landmark index is exact or not (landmarks.py), a deletion
+      of links is flagged by a trigger on links
+  8 - pages (links_version) - the number of the writes of the links of a page, the key of the adjacency cache
+  9 - analytics_changes (page_id) - primary key, a changed page is logged once until the refresh
+  10 - Task 4: the start pages are sampled (TABLESAMPLE SYSTEM), then all parsed pages are tried
+  11 - Task 4: the start pages are sampled uniformly (TABLESAMPLE BERNOULLI, row by row)
+  12 - Task 4: all children of the first two generations by default (as the original query)
+the connection pool checks the version on startup (db_context.py/get_pool(), settings.py/check_schema_on_startup)
+and fails fast, if the database is not migrated
+use like this:
+  python schema.py migrate
+  python schema.py status
+"""
+import argparse
+import sys
+from typing import List, Tuple
+
+import psycopg2
+
+import settings
+
+# (version, name, sql)
+MIGRATIONS: List[Tuple[int, str, str]] = [
+    (1, 'base tables', """
+        CREATE TABLE IF NOT EXISTS pages (
+            page_id bigserial PRIMARY KEY,
+            page_title varchar NOT NULL,
+            created_on timestamp NOT NULL DEFAULT now(),
+            page_status integer NOT NULL DEFAULT 1
+        );
+        CREATE TABLE IF NOT EXISTS links (
+            link_id bigserial PRIMARY KEY,
+            parent_id bigint NOT NULL REFERENCES pages(page_id),
+            child_id bigint NOT NULL REFERENCES pages(page_id)
+        );
+        CREATE TABLE IF NOT EXISTS routes (
+            route_id bigserial PRIMARY KEY,
+            start_page_title varchar NOT NULL,
+            finish_page_title varchar NOT NULL,
+            created_on timestamp NOT NULL DEFAULT now()
+        );
+        CREATE TABLE IF NOT EXISTS route_chains (
+            chain_id bigserial PRIMARY KEY,
+            route_id bigint NOT NULL REFERENCES routes(route_id),
+            page_id bigint NOT NULL REFERENCES pages(page_id),
+            page_order integer NOT NULL
+        );
+        """),
+    (2, 'uniqueness constraints and lookup indexes', """
+        -- duplicates of a page title: the links and the chains go to one page
+        -- (a parsed page is kept before a not parsed one, page_status 1 = NOT_PARSED)
+        CREATE TEMP TABLE page_duplicates ON COMMIT DROP AS
+        SELECT page_id, keep_id FROM (
+            SELECT page_id,
+                   FIRST_VALUE(page_id) OVER (PARTITION BY page_title
+                                              ORDER BY page_status = 1, page_id) AS keep_id
+            FROM pages) p
+        WHERE page_id <> keep_id;
+        UPDATE links l SET parent_id = d.keep_id FROM page_duplicates d WHERE l.parent_id = d.page_id;
+        UPDATE links l SET child_id = d.keep_id FROM page_duplicates d WHERE l.child_id = d.page_id;
+        UPDATE route_chains rc SET page_id = d.keep_id FROM page_duplicates d WHERE rc.page_id = d.page_id;
+        DELETE FROM pages p USING page_duplicates d WHERE p.page_id = d.page_id;
+        CREATE UNIQUE INDEX pages_page_title_key ON pages (page_title);
+
+        -- one link between two pages
+        DELETE FROM links l USING links l2
+        WHERE l2.parent_id = l.parent_id AND l2.child_id = l.child_id AND l2.link_id < l.link_id;
+        DO $$
+        DECLARE
+            primary_key varchar;
+        BEGIN
+            SELECT conname INTO primary_key FROM pg_constraint WHERE conrelid = 'links'::regclass AND contype = 'p';
+            IF primary_key IS NOT NULL THEN
+                EXECUTE format('ALTER TABLE links DROP CONSTRAINT %I', primary_key);
+            END IF;
+        END $$;
+        ALTER TABLE links ADD CONSTRAINT links_pkey PRIMARY KEY (parent_id, child_id);
+        CREATE UNIQUE INDEX links_link_id_key ON links (link_id);
+        CREATE INDEX links_child_id_idx ON links (child_id);
+
+        -- one route between two pages, one page on each position of a chain
+        DELETE FROM route_chains rc USING routes r, routes r2
+        WHERE rc.route_id = r.route_id AND r2.start_page_title = r.start_page_title
+            AND r2.finish_page_title = r.finish_page_title AND r2.route_id < r.route_id;
+        DELETE FROM routes r USING routes r2
+        WHERE r2.start_page_title = r.start_page_title AND r2.finish_page_title = r.finish_page_title
+            AND r2.route_id < r.route_id;
+        CREATE UNIQUE INDEX routes_start_finish_key ON routes (start_page_title, finish_page_title);
+        DELETE FROM route_chains rc USING route_chains rc2
+        WHERE rc2.route_id = rc.route_id AND rc2.page_order = rc.page_order AND rc2.chain_id < rc.chain_id;
+        CREATE UNIQUE INDEX route_chains_route_id_page_order_key ON route_chains (route_id, page_order);
+        CREATE INDEX route_chains_page_id_idx ON route_chains (page_id);
+        ANALYZE pages;
+        ANALYZE links;
+        """),
+    (3, 'tables of the modules', """
+        -- rate_limiter.py (rate_limiter_backend = 'postgres')
+        CREATE TABLE IF NOT EXISTS rate_limiters (
+            limiter_name varchar PRIMARY KEY,
+            tat double precision NOT NULL DEFAULT 0
+        );
+        -- the negative cache of find_path
+        CREATE TABLE IF NOT EXISTS failed_routes (
+            start_page_title varchar NOT NULL,
+            finish_page_title varchar NOT NULL,
+            max_links_in_route integer NOT NULL,
+            links_per_page integer NOT NULL,
+            failure varchar NOT NULL,
+            created_on timestamp NOT NULL DEFAULT now(),
+            PRIMARY KEY (start_page_title, finish_page_title, max_links_in_route, links_per_page)
+        );
+        -- crawler_worker.py
+        CREATE TABLE IF NOT EXISTS page_leases (
+            page_id bigint PRIMARY KEY REFERENCES pages(page_id) ON DELETE CASCADE,
+            worker_id varchar NOT NULL,
+            leased_until timestamp NOT NULL
+        );
+        -- conditional requests (http_client.py)
+        CREATE TABLE IF NOT EXISTS page_validators (
+            page_id bigint PRIMARY KEY REFERENCES pages(page_id) ON DELETE CASCADE,
+            etag varchar,
+            last_modified varchar,
+            checked_on timestamp NOT NULL DEFAULT now()
+        );
+        -- landmarks.py
+        CREATE TABLE IF NOT EXISTS landmarks (
+            landmark_id bigint PRIMARY KEY REFERENCES pages(page_id) ON DELETE CASCADE,
+            last_link_id bigint NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS landmark_distances (
+            landmark_id bigint NOT NULL REFERENCES landmarks(landmark_id) ON DELETE CASCADE,
+            page_id bigint NOT NULL REFERENCES pages(page_id) ON DELETE CASCADE,
+            forward_distance smallint,
+            backward_distance smallint,
+            PRIMARY KEY (landmark_id, page_id)
+        );
+        CREATE INDEX IF NOT EXISTS landmark_distances_page_id_idx ON landmark_distances (page_id);
+        """),
+    (4, 'degree counters and materialized analytics', """
+        -- the number of links to/from each page with the status of the page (Task 1, Task 2 in queries.sql),
+        -- kept by the triggers on 'links' and 'pages', the top of a parsed page is a scan of a partial index
+        CREATE TABLE page_degrees (
+            page_id bigint PRIMARY KEY REFERENCES pages(page_id) ON DELETE CASCADE,
+            page_status integer NOT NULL,
+            in_degree integer NOT NULL DEFAULT 0,
+            out_degree integer NOT NULL DEFAULT 0
+        );
+        INSERT INTO page_degrees (page_id, page_status, in_degree, out_degree)
+        SELECT p.page_id, p.page_status, COALESCE(i.in_degree, 0), COALESCE(o.out_degree, 0)
+        FROM pages p
+            LEFT JOIN (SELECT child_id, COUNT(*) AS in_degree FROM links GROUP BY child_id) i
+                ON i.child_id = p.page_id
+            LEFT JOIN (SELECT parent_id, COUNT(*) AS out_degree FROM links GROUP BY parent_id) o
+                ON o.parent_id = p.page_id;
+        CREATE INDEX page_degrees_in_degree_idx ON page_degrees (in_degree DESC) WHERE page_status = 2;
+        CREATE INDEX page_degrees_out_degree_idx ON page_degrees (out_degree DESC) WHERE page_status = 2;
+
+        -- Task 3 in queries.sql: the average number of descendants of the second level of each parsed page,
+        -- the pages, whose links or status were changed, are logged in 'analytics_changes',
+        -- only their parents and the parents of the parents are computed again (analytics.py refresh)
+        CREATE TABLE page_descendants (
+            page_id bigint PRIMARY KEY REFERENCES pages(page_id) ON DELETE CASCADE,
+            avg_descendants_n2 numeric NOT NULL
+        );
+        CREATE TABLE analytics_changes (
+            change_id bigserial PRIMARY KEY,
+            page_id bigint NOT NULL
+        );
+        INSERT INTO analytics_changes (page_id) SELECT DISTINCT parent_id FROM links;
+
+        -- the triggers are statement-level: one set-based statement for all links of a statement,
+        -- the rows of page_degrees are locked in the order of page_id (no deadlocks between the crawlers)
+        CREATE FUNCTION page_degrees_after_links_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO page_degrees AS d (page_id, page_status, in_degree, out_degree)
+            SELECT c.page_id, p.page_status, c.in_degree, c.out_degree
+            FROM (SELECT page_id, SUM(in_degree) AS in_degree, SUM(out_degree) AS out_degree
+                  FROM (SELECT child_id AS page_id, 1 AS in_degree, 0 AS out_degree FROM new_links
+                        UNION ALL
+                        SELECT parent_id, 0, 1 FROM new_links) n
+                  GROUP BY page_id) c
+                INNER JOIN pages p ON p.page_id = c.page_id
+            ORDER BY c.page_id
+            ON CONFLICT (page_id) DO UPDATE SET in_degree = d.in_degree + EXCLUDED.in_degree,
+                                                out_degree = d.out_degree + EXCLUDED.out_degree;
+            INSERT INTO analytics_changes (page_id) SELECT DISTINCT parent_id FROM new_links;
+            RETURN NULL;
+        END $$;
+        CREATE FUNCTION page_degrees_after_links_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE page_degrees d
+            SET in_degree = d.in_degree - c.in_degree, out_degree = d.out_degree - c.out_degree
+            FROM (SELECT page_id, SUM(in_degree) AS in_degree, SUM(out_degree) AS out_degree
+                  FROM (SELECT child_id AS page_id, 1 AS in_degree, 0 AS out_degree FROM old_links
+                        UNION ALL
+                        SELECT parent_id, 0, 1 FROM old_links) o
+                  GROUP BY page_id) c
+            WHERE d.page_id = c.page_id;
+            INSERT INTO analytics_changes (page_id) SELECT DISTINCT parent_id FROM old_links;
+            RETURN NULL;
+        END $$;
+        -- the status is upserted: the row of a page can be inserted by the links of another transaction
+        CREATE FUNCTION page_degrees_after_pages_update() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            WITH changed AS (
+                SELECT n.page_id, n.page_status
+                FROM new_pages n
+                    INNER JOIN old_pages o ON o.page_id = n.page_id
+                WHERE n.page_status <> o.page_status
+            ), degrees AS (
+                INSERT INTO page_degrees (page_id, page_status)
+                SELECT page_id, page_status FROM changed ORDER BY page_id
+                ON CONFLICT (page_id) DO UPDATE SET page_status = EXCLUDED.page_status
+            )
+            INSERT INTO analytics_changes (page_id) SELECT page_id FROM changed;
+            RETURN NULL;
+        END $$;
+        CREATE TRIGGER links_page_degrees_insert AFTER INSERT ON links
+            REFERENCING NEW TABLE AS new_links
+            FOR EACH STATEMENT EXECUTE FUNCTION page_degrees_after_links_insert();
+        CREATE TRIGGER links_page_degrees_delete AFTER DELETE ON links
+            REFERENCING OLD TABLE AS old_links
+            FOR EACH STATEMENT EXECUTE FUNCTION page_degrees_after_links_delete();
+        CREATE TRIGGER pages_page_degrees_update AFTER UPDATE ON pages
+            REFERENCING OLD TABLE AS old_pages NEW TABLE AS new_pages
+            FOR EACH STATEMENT EXECUTE FUNCTION page_degrees_after_pages_update();
+        """),
+    (5, 'set-based sampler of Task 4', """
+        -- Task 4 in queries.sql: the row-by-row functions are replaced by a recursive query
+        DROP FUNCTION IF EXISTS get_routes_with_n_depth_limit_count(integer, integer);
+        DROP FUNCTION IF EXISTS get_routes_with_n_depth_by_start_page_limit_count(bigint, integer, integer);
+        DROP FUNCTION IF EXISTS get_next_generation_chains(bigint, bigint, character varying[], integer);
+        DROP FUNCTION IF EXISTS get_all_valid_pages_order_random();
+
+        -- up to in_route_count_limit routes of in_route_depth links from the start page (the pages are parsed
+        -- and not repeated): all children of the first two generations (not more than in_max_children
+        -- random children of a page), then one random child of each route on each generation.
+        -- The recursion is lazy, it stops as soon as in_route_count_limit routes are found,
+        -- the routes are returned only if there are enough of them
+        CREATE FUNCTION get_routes_with_n_depth_by_start_page_limit_count(
+            in_start_page_id bigint,
+            in_route_depth integer,
+            in_route_count_limit integer,
+            in_max_children integer DEFAULT 200)
+            RETURNS TABLE(start_page_id bigint, end_page_id bigint, route_arr character varying[],
+                          route_depth integer)
+            LANGUAGE sql VOLATILE AS $$
+            WITH RECURSIVE routes(r_end_page_id, r_route_arr, r_route_depth) AS (
+                SELECT p0.page_id, ARRAY[p0.page_title]::character varying[], 0
+                FROM pages p0
+                WHERE p0.page_id = in_start_page_id
+              UNION ALL
+                SELECT c.page_id, r.r_route_arr || c.page_title, r.r_route_depth + 1
+                FROM routes r
+                    CROSS JOIN LATERAL (
+                        SELECT p1.page_id, p1.page_title
+                        FROM links l1
+                            INNER JOIN pages p1 ON p1.page_id = l1.child_id
+                        WHERE l1.parent_id = r.r_end_page_id
+                            AND p1.page_status = 2
+                            AND NOT (p1.page_title = ANY(r.r_route_arr))
+                        ORDER BY random()
+                        LIMIT CASE WHEN r.r_route_depth < 2 THEN in_max_children ELSE 1 END) c
+                WHERE r.r_route_depth < in_route_depth
+            ), found AS (
+                SELECT r_end_page_id, r_route_arr, r_route_depth
+                FROM routes
+                WHERE r_route_depth = in_route_depth
+                LIMIT in_route_count_limit
+            )
+            SELECT in_start_page_id, f.r_end_page_id, f.r_route_arr, f.r_route_depth
+            FROM found f
+            WHERE (SELECT COUNT(*) FROM found) >= in_route_count_limit
+            ORDER BY f.r_end_page_id;
+        $$;
+
+        -- in_route_count_limit routes of in_route_depth links from one random parsed page
+        -- (the start pages are taken at random by the index of page_degrees, not more than in_max_start_pages)
+        CREATE FUNCTION get_routes_with_n_depth_limit_count(
+            in_route_depth integer,
+            in_route_count_limit integer,
+            in_max_start_pages integer DEFAULT 100,
+            in_max_children integer DEFAULT 200)
+            RETURNS TABLE(out_start_page_id bigint, out_end_page_id bigint, out_route_arr character varying[],
+                          out_route_depth integer)
+            LANGUAGE plpgsql VOLATILE AS $$
+        DECLARE
+            min_page_id bigint;
+            max_page_id bigint;
+            cur_start_page_id bigint;
+        BEGIN
+            SELECT MIN(d.page_id), MAX(d.page_id) INTO min_page_id, max_page_id
+            FROM page_degrees d
+            WHERE d.page_status = 2 AND d.out_degree > 0;
+            IF min_page_id IS NULL THEN
+                RETURN;
+            END IF;
+            FOR attempt IN 1..in_max_start_pages LOOP
+                SELECT d.page_id INTO cur_start_page_id
+                FROM page_degrees d
+                WHERE d.page_status = 2 AND d.out_degree > 0
+                    AND d.page_id >= min_page_id + floor(random() * (max_page_id - min_page_id + 1))::bigint
+                ORDER BY d.page_id
+                LIMIT 1;
+                RETURN QUERY
+                SELECT * FROM get_routes_with_n_depth_by_start_page_limit_count(
+                    cur_start_page_id, in_route_depth, in_route_count_limit, in_max_children);
+                IF FOUND THEN
+                    RETURN;
+                END IF;
+            END LOOP;
+        END $$;
+        """),
+    (6, 'search mode of the failed routes', """
+        -- the failures of the modes can differ, the failures saved without the mode are removed
+        DELETE FROM failed_routes;
+        ALTER TABLE failed_routes ADD COLUMN search_mode varchar NOT NULL;
+        ALTER TABLE failed_routes DROP CONSTRAINT failed_routes_pkey;
+        ALTER TABLE failed_routes
+            ADD PRIMARY KEY (start_page_title, finish_page_title, max_links_in_route, links_per_page, search_mode);
+        """),
+    (7, 'exactness of the landmark index', """
+        -- the bounds of landmarks.py are lower bounds only on the graph, on which the index was built:
+        -- all_parsed - there were no NOT_PARSED pages at the build/refresh (their links are unknown),
+        -- links_deleted - some links were deleted after the build (the distances can become longer,
+        -- the incremental refresh can not fix it, the index is built again)
+        ALTER TABLE landmarks ADD COLUMN all_parsed boolean NOT NULL DEFAULT false;
+        ALTER TABLE landmarks ADD COLUMN links_deleted boolean NOT NULL DEFAULT false;
+        CREATE FUNCTION landmarks_after_links_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM old_links) THEN
+                UPDATE landmarks SET links_deleted = true WHERE NOT links_deleted;
+            END IF;
+            RETURN NULL;
+        END $$;
+        CREATE TRIGGER links_landmarks_delete AFTER DELETE ON links
+            REFERENCING OLD TABLE AS old_links
+            FOR EACH STATEMENT EXECUTE FUNCTION landmarks_after_links_delete();
+        """),
+    (8, 'version of the links of a page', """
+        -- the links of a parsed page are replaced by the recrawl (also by another process),
+        -- the adjacency cache of graph_cache.py keeps the children of a page by (page_id, links_version)
+        ALTER TABLE pages ADD COLUMN links_version integer NOT NULL DEFAULT 0;
+        """),
+    (9, 'one row of a page in the log of changes', """
+        -- analytics_changes kept a row for each write of the links, until the refresh of analytics.py
+        -- (the log grew without a limit, if the refresh was not run), now a page is logged once
+        DELETE FROM analytics_changes a USING analytics_changes b
+        WHERE a.page_id = b.page_id AND a.change_id > b.change_id;
+        ALTER TABLE analytics_changes DROP COLUMN change_id;
+        ALTER TABLE analytics_changes ADD PRIMARY KEY (page_id);
+        -- the pages are logged in the order of page_id (no deadlocks between the crawlers)
+        CREATE OR REPLACE FUNCTION page_degrees_after_links_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO page_degrees AS d (page_id, page_status, in_degree, out_degree)
+            SELECT c.page_id, p.page_status, c.in_degree, c.out_degree
+            FROM (SELECT page_id, SUM(in_degree) AS in_degree, SUM(out_degree) AS out_degree
+                  FROM (SELECT child_id AS page_id, 1 AS in_degree, 0 AS out_degree FROM new_links
+                        UNION ALL
+                        SELECT parent_id, 0, 1 FROM new_links) n
+                  GROUP BY page_id) c
+                INNER JOIN pages p ON p.page_id = c.page_id
+            ORDER BY c.page_id
+            ON CONFLICT (page_id) DO UPDATE SET in_degree = d.in_degree + EXCLUDED.in_degree,
+                                                out_degree = d.out_degree + EXCLUDED.out_degree;
+            INSERT INTO analytics_changes (page_id)
+            SELECT DISTINCT parent_id FROM new_links ORDER BY parent_id
+            ON CONFLICT (page_id) DO NOTHING;
+            RETURN NULL;
+        END $$;
+        CREATE OR REPLACE FUNCTION page_degrees_after_links_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE page_degrees d
+            SET in_degree = d.in_degree - c.in_degree, out_degree = d.out_degree - c.out_degree
+            FROM (SELECT page_id, SUM(in_degree) AS in_degree, SUM(out_degree) AS out_degree
+                  FROM (SELECT child_id AS page_id, 1 AS in_degree, 0 AS out_degree FROM old_links
+                        UNION ALL
+                        SELECT parent_id, 0, 1 FROM old_links) o
+                  GROUP BY page_id) c
+            WHERE d.page_id = c.page_id;
+            INSERT INTO analytics_changes (page_id)
+            SELECT DISTINCT parent_id FROM old_links ORDER BY parent_id
+            ON CONFLICT (page_id) DO NOTHING;
+            RETURN NULL;
+        END $$;
+        CREATE OR REPLACE FUNCTION page_degrees_after_pages_update() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            WITH changed AS (
+                SELECT n.page_id, n.page_status
+                FROM new_pages n
+                    INNER JOIN old_pages o ON o.page_id = n.page_id
+                WHERE n.page_status <> o.page_status
+            ), degrees AS (
+                INSERT INTO page_degrees (page_id, page_status)
+                SELECT page_id, page_status FROM changed ORDER BY page_id
+                ON CONFLICT (page_id) DO UPDATE SET page_status = EXCLUDED.page_status
+            )
+            INSERT INTO analytics_changes (page_id)
+            SELECT page_id FROM changed ORDER BY page_id
+            ON CONFLICT (page_id) DO NOTHING;
+            RETURN NULL;
+        END $$;
+        """),
+    (10, 'start pages of Task 4 by TABLESAMPLE', """
+        -- the start pages were probed by a random page_id in the range of ids (the pages after a gap of ids
+        -- were taken more often), and the search stopped after in_max_start_pages pages:
+        -- now in_max_start_pages start pages are sampled by TABLESAMPLE SYSTEM (whole blocks of page_degrees
+        -- are sampled, the rows of a block are taken together, see version 11), and if they have no routes,
+        -- all other parsed pages are tried in random order (as the original row-by-row functions),
+        -- so the result is empty only if no parsed page has enough routes
+        CREATE OR REPLACE FUNCTION get_routes_with_n_depth_limit_count(
+            in_route_depth integer,
+            in_route_count_limit integer,
+            in_max_start_pages integer DEFAULT 100,
+            in_max_children integer DEFAULT 200)
+            RETURNS TABLE(out_start_page_id bigint, out_end_page_id bigint, out_route_arr character varying[],
+                          out_route_depth integer)
+            LANGUAGE plpgsql VOLATILE AS $$
+        DECLARE
+            sample_percent double precision;
+            tried_page_ids bigint[] := '{}';
+            cur_start_page_id bigint;
+        BEGIN
+            -- about 10 * in_max_start_pages rows by the estimated size of the table (all rows, if not analyzed)
+            SELECT LEAST(100, 100.0 * in_max_start_pages * 10 / GREATEST(c.reltuples, 1)) INTO sample_percent
+            FROM pg_class c
+            WHERE c.oid = 'page_degrees'::regclass;
+            FOR cur_start_page_id IN
+                SELECT d.page_id
+                FROM page_degrees d TABLESAMPLE SYSTEM (sample_percent)
+                WHERE d.page_status = 2 AND d.out_degree > 0
+                ORDER BY random()
+                LIMIT in_max_start_pages
+            LOOP
+                tried_page_ids := tried_page_ids || cur_start_page_id;
+                RETURN QUERY
+                SELECT * FROM get_routes_with_n_depth_by_start_page_limit_count(
+                    cur_start_page_id, in_route_depth, in_route_count_limit, in_max_children);
+                IF FOUND THEN
+                    RETURN;
+                END IF;
+            END LOOP;
+            -- the full scan: the other parsed pages with links
+            FOR cur_start_page_id IN
+                SELECT d.page_id
+                FROM page_degrees d
+                WHERE d.page_status = 2 AND d.out_degree > 0 AND NOT (d.page_id = ANY(tried_page_ids))
+                ORDER BY random()
+            LOOP
+                RETURN QUERY
+                SELECT * FROM get_routes_with_n_depth_by_start_page_limit_count(
+                    cur_start_page_id, in_route_depth, in_route_count_limit, in_max_children);
+                IF FOUND THEN
+                    RETURN;
+                END IF;
+            END LOOP;
+        END $$;
+        """),
+    (11, 'uniform start pages of Task 4', """
+        -- TABLESAMPLE SYSTEM takes whole blocks, so the pages of one block were sampled together:
+        -- TABLESAMPLE BERNOULLI takes each row of page_degrees on its own with the same probability
+        -- (all blocks are read), the rest is the same as version 10
+        CREATE OR REPLACE FUNCTION get_routes_with_n_depth_limit_count(
+            in_route_depth integer,
+            in_route_count_limit integer,
+            in_max_start_pages integer DEFAULT 100,
+            in_max_children integer DEFAULT 200)
+            RETURNS TABLE(out_start_page_id bigint, out_end_page_id bigint, out_route_arr character varying[],
+                          out_route_depth integer)
+            LANGUAGE plpgsql VOLATILE AS $$
+        DECLARE
+            sample_percent double precision;
+            tried_page_ids bigint[] := '{}';
+            cur_start_page_id bigint;
+        BEGIN
+            -- about 10 * in_max_start_pages rows by the estimated size of the table (all rows, if not analyzed)
+            SELECT LEAST(100, 100.0 * in_max_start_pages * 10 / GREATEST(c.reltuples, 1)) INTO sample_percent
+            FROM pg_class c
+            WHERE c.oid = 'page_degrees'::regclass;
+            FOR cur_start_page_id IN
+                SELECT d.page_id
+                FROM page_degrees d TABLESAMPLE BERNOULLI (sample_percent)
+                WHERE d.page_status = 2 AND d.out_degree > 0
+                ORDER BY random()
+                LIMIT in_max_start_pages
+            LOOP
+                tried_page_ids := tried_page_ids || cur_start_page_id;
+                RETURN QUERY
+                SELECT * FROM get_routes_with_n_depth_by_start_page_limit_count(
+                    cur_start_page_id, in_route_depth, in_route_count_limit, in_max_children);
+                IF FOUND THEN
+                    RETURN;
+                END IF;
+            END LOOP;
+            -- the full scan: the other parsed pages with links
+            FOR cur_start_page_id IN
+                SELECT d.page_id
+                FROM page_degrees d
+                WHERE d.page_status = 2 AND d.out_degree > 0 AND NOT (d.page_id = ANY(tried_page_ids))
+                ORDER BY random()
+            LOOP
+                RETURN QUERY
+                SELECT * FROM get_routes_with_n_depth_by_start_page_limit_count(
+                    cur_start_page_id, in_route_depth, in_route_count_limit, in_max_children);
+                IF FOUND THEN
+                    RETURN;
+                END IF;
+            END LOOP;
+        END $$;
+        """),
+    (12, 'all children of the first generations of Task 4', """
+        -- the original Task 4 takes all children of the first two generations: in_max_children is not
+        -- limited by default (NULL - LIMIT ALL), a number limits the children of a page as before
+        CREATE OR REPLACE FUNCTION get_routes_with_n_depth_by_start_page_limit_count(
+            in_start_page_id bigint,
+            in_route_depth integer,
+            in_route_count_limit integer,
+            in_max_children integer DEFAULT NULL)
+            RETURNS TABLE(start_page_id bigint, end_page_id bigint, route_arr character varying[],
+                          route_depth integer)
+            LANGUAGE sql VOLATILE AS $$
+            WITH RECURSIVE routes(r_end_page_id, r_route_arr, r_route_depth) AS (
+                SELECT p0.page_id, ARRAY[p0.page_title]::character varying[], 0
+                FROM pages p0
+                WHERE p0.page_id = in_start_page_id
+              UNION ALL
+                SELECT c.page_id, r.r_route_arr || c.page_title, r.r_route_depth + 1
+                FROM routes r
+                    CROSS JOIN LATERAL (
+                        SELECT p1.page_id, p1.page_title
+                        FROM links l1
+                            INNER JOIN pages p1 ON p1.page_id = l1.child_id
+                        WHERE l1.parent_id = r.r_end_page_id
+                            AND p1.page_status = 2
+                            AND NOT (p1.page_title = ANY(r.r_route_arr))
+                        ORDER BY random()
+                        LIMIT CASE WHEN r.r_route_depth < 2 THEN in_max_children ELSE 1 END) c
+                WHERE r.r_route_depth < in_route_depth
+            ), found AS (
+                SELECT r_end_page_id, r_route_arr, r_route_depth
+                FROM routes
+                WHERE r_route_depth = in_route_depth
+                LIMIT in_route_count_limit
+            )
+            SELECT in_start_page_id, f.r_end_page_id, f.r_route_arr, f.r_route_depth
+            FROM found f
+            WHERE (SELECT COUNT(*) FROM found) >= in_route_count_limit
+            ORDER BY f.r_end_page_id;
+        $$;
+
+        CREATE OR REPLACE FUNCTION get_routes_with_n_depth_limit_count(
+            in_route_depth integer,
+            in_route_count_limit integer,
+            in_max_start_pages integer DEFAULT 100,
+            in_max_children integer DEFAULT NULL)
+            RETURNS TABLE(out_start_page_id bigint, out_end_page_id bigint, out_route_arr character varying[],
+                          out_route_depth integer)
+            LANGUAGE plpgsql VOLATILE AS $$
+        DECLARE
+            sample_percent double precision;
+            tried_page_ids bigint[] := '{}';
+            cur_start_page_id bigint;
+        BEGIN
+            -- about 10 * in_max_start_pages rows by the estimated size of the table (all rows, if not analyzed)
+            SELECT LEAST(100, 100.0 * in_max_start_pages * 10 / GREATEST(c.reltuples, 1)) INTO sample_percent
+            FROM pg_class c
+            WHERE c.oid = 'page_degrees'::regclass;
+            FOR cur_start_page_id IN
+                SELECT d.page_id
+                FROM page_degrees d TABLESAMPLE BERNOULLI (sample_percent)
+                WHERE d.page_status = 2 AND d.out_degree > 0
+                ORDER BY random()
+                LIMIT in_max_start_pages
+            LOOP
+                tried_page_ids := tried_page_ids || cur_start_page_id;
+                RETURN QUERY
+                SELECT * FROM get_routes_with_n_depth_by_start_page_limit_count(
+                    cur_start_page_id, in_route_depth, in_route_count_limit, in_max_children);
+                IF FOUND THEN
+                    RETURN;
+                END IF;
+            END LOOP;
+            -- the full scan: the other parsed pages with links
+            FOR cur_start_page_id IN
+                SELECT d.page_id
+                FROM page_degrees d
+                WHERE d.page_status = 2 AND d.out_degree > 0 AND NOT (d.page_id = ANY(tried_page_ids))
+                ORDER BY random()
+            LOOP
+                RETURN QUERY
+                SELECT * FROM get_routes_with_n_depth_by_start_page_limit_count(
+                    cur_start_page_id, in_route_depth, in_route_count_limit, in_max_children);
+                IF FOUND THEN
+                    RETURN;
+                END IF;
+            END LOOP;
+        END $$;
+        """),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# the key of the advisory lock of the migrations
+_LOCK_KEY = 7_101_042
+
+
+class SchemaNotMigratedException(Exception):
+    """
+    Raised when the version of the database schema is older than the version of the code
+    Attributes: version, latest_version
+    """
+
+    def __init__(self, version: int, latest_version: int):
+        self.version = version
+        self.latest_version = latest_version
+        self.message = (f"The database schema has version {version}, the code needs version {latest_version}! "
+                        f"Run: python schema.py migrate")
+        super().__init__(self.message)
+
+
+def connect():
+    return psycopg2.connect(dbname=settings.POSTGRES_DB, user=settings.POSTGRES_USER,
+                            password=settings.POSTGRES_PASSWORD, host=settings.POSTGRES_HOST,
+                            port=settings.POSTGRES_PORT)
+
+
+def get_schema_version(conn) -> int:
+    """
+    :return: int, the last applied version (0 - the database is not migrated)
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL;")
+        if not cursor.fetchone()[0]:
+            version = 0
+        else:
+            cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations;")
+            version = cursor.fetchone()[0]
+    conn.rollback()
+    return version
+
+
+def check_schema(conn):
+    """
+    raises SchemaNotMigratedException, if the database is not migrated to LATEST_VERSION
+    """
+    version = get_schema_version(conn)
+    if version < LATEST_VERSION:
+        raise SchemaNotMigratedException(version, LATEST_VERSION)
+
+
+def migrate() -> List[int]:
+    """
+    applies all migrations, which are not applied yet
+    :return: List[int], the applied versions
+    """
+    applied = []
+    conn = connect()
+    try:
+        for version, name, sql in MIGRATIONS:
+            with conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s);", (_LOCK_KEY,))
+                    cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS schema_migrations (
+                            version integer PRIMARY KEY,
+                            name varchar NOT NULL,
+                            applied_on timestamp NOT NULL DEFAULT now()
+                        );
+                        """)
+                    cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s;", (version,))
+                    if cursor.fetchone() is not None:
+                        continue
+                    cursor.execute(sql)
+                    cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s);", (version, name))
+                    applied.append(version)
+    finally:
+        conn.close()
+    return applied
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='schema of the database')
+    parser.add_argument('command', choices=['migrate', 'status'])
+    args = parser.parse_args()
+    if args.command == 'migrate':
+        versions = migrate()
+        print(f"applied: {versions or 'nothing'}, version: {LATEST_VERSION}", file=sys.stderr)
+    else:
+        connection = connect()
+        try:
+            print(f'version: {get_schema_version(connection)}, latest: {LATEST_VERSION}', file=sys.stderr)
+        finally:
+            connection.close()
@@ -1,5 +1,6 @@
 import os
 from os.path import join, dirname
+from tempfile import gettempdir
 from dotenv import load_dotenv
 
 dotenv_path = join(dirname(__file__), '.env')
@@ -12,14 +13,62 @@ POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
 POSTGRES_HOST = os.getenv('POSTGRES_HOST')
 POSTGRES_PORT = os.getenv('POSTGRES_PORT', '5432')
 
+# connection pool size (connections are reused by all queries of the process)
+db_pool_min_connections = 1
+db_pool_max_connections = 10
+# check the version of the DB schema, when the connection pool is created (run: python schema.py migrate)
+check_schema_on_startup = True
+# number of rows taken from a server-side cursor at once
+db_fetch_size = 10000
+
+# in-process cache of parsed pages and their links (size in bytes, 0 - cache is disabled)
+page_cache_max_bytes = 64 * 1024 * 1024
+adjacency_cache_max_bytes = 256 * 1024 * 1024
+
 # PARSER SETTINGS
 source_link = 'https://uk.wikipedia.org/wiki/'
+# the header User-Agent of all requests (the Wikimedia policy asks for a name and a contact of the client)
+user_agent = 'WikiRacer/1.0 (wikiracing crawler; python-requests)'
 requests_per_minute = 100
 links_per_page = 200
+# the rest of a page, which is read after links_per_page links are found (http_client.py/drain_response),
+# if the rest is not longer, the keep-alive connection is reused, otherwise it is closed
+stream_drain_max_bytes = 64 * 1024
+
+# rate limiter (token bucket): how many requests can be made at once after a pause
+requests_burst = 5
+# where the limiter keeps its state:
+# 'memory' - one process, 'file' - all processes on the host, 'postgres' - all processes using the DB
+rate_limiter_backend = 'memory'
+rate_limiter_file = join(gettempdir(), 'wikiracing_rate_limiter')
+rate_limiter_name = 'wikiracing'
+
+# fetch backend: 'html' - download the rendered html of each page (source_link),
+# 'api' - take the links of many pages at once by the MediaWiki API (api_link)
+fetch_backend = 'html'
+api_link = 'https://uk.wikipedia.org/w/api.php'
+api_titles_per_request = 50
+
+# link extractor: 'streaming' - fast tokenizer, 'beautifulsoup' - full BeautifulSoup tree (slow)
+link_extractor = 'streaming'
+
+# number of pages of one generation fetched at once (1 - pages are fetched one by one)
+fetch_concurrency = 8
 
 # maximum route depth (number of links - N)
 max_links_in_route = 4
 
+# search mode: 'forward' - generation by generation from the start page,
+# 'bidirectional' - also from the finish page backward by the known links to it (table 'links'),
+# 'landmarks' - forward, the pages of each generation are ordered by the lower bound of the distance
+# to the finish page (landmarks.py), the pages, which can not reach the finish page in time, are not parsed
+# (only if the landmark index is exact, see landmarks.py)
+search_mode = 'forward'
+
+# landmark index (landmarks.py): number of landmarks, maximum stored distance
+landmark_count = 16
+landmark_max_distance = 10
+
 # if connection error
 connection_retries = 20  # number of retries
 connection_delay_if_error = 60  # delay in seconds
@@ -28,8 +77,35 @@ connection_delay_if_error = 60  # delay in seconds
 response_retries = 10  # number of retries
 response_delay_if_error = 30  # delay in seconds
 
+# on-disk store of the fetched pages (page_store.py): folder and the maximum size of the compressed pages
+# (0 - the pages are not stored, then the pages are read only until links_per_page links are found;
+# with the store every page is downloaded to the end, e.g. 1024 * 1024 * 1024 keeps up to 1 GB of pages)
+page_store_path = join(dirname(__file__), 'page_store')
+page_store_max_bytes = 0
+
+# graph snapshot (graph_snapshot.py), if the file exists, find_path first searches the route in it
+graph_snapshot_path = join(dirname(__file__), 'graph_snapshot.bin')
+
+# crawler worker (crawler_worker.py): pages taken at once, lease of the taken pages in seconds,
+# delay in seconds, when there are no pages to parse
+crawler_batch_size = 50
+crawler_lease_seconds = 600
+crawler_idle_sleep = 5
+# crawler worker with --refresh: a parsed page is fetched again (by a conditional request),
+# if it was not checked during refresh_after_seconds
+refresh_after_seconds = 7 * 24 * 60 * 60
+
 # display log in console, when find path is running
 display_log = True
 
+# metrics of each search (metrics.py): counters and timers in WikiRacer.last_search_stats
+# (False - the metrics are not collected and the SQL statements are not counted, find_path_with_stats()
+# and benchmark.py collect them anyway)
+collect_stats = False
+
 # return the route if it was found earlier
 return_route_if_it_exists_in_db = True
+
+# negative cache: a failed search (no such article or no route within max_links_in_route links)
+# is not repeated during failed_route_ttl_seconds (0 - failed searches are not saved)
+failed_route_ttl_seconds = 24 * 60 * 60
@@ -0,0 +1,244 @@
+"""
+this module makes a synthetic wiki for benchmarks and tests (benchmark.py):
+  - generate_graph() - a random graph of pages with a realistic degree distribution:
+    the number of links on a page is log-normal, the linked pages are chosen by a Zipf law
+    (a few pages have very many links to themselves, as the popular articles), some links are red links
+  - SyntheticWikiServer - a local HTTP server, which serves the graph as MediaWiki:
+    /wiki/<title> - the html page (links in div#mw-content-text, navigation, categories, red links),
+    /w/api.php - action=query&prop=links with continuation (for fetch_backend = 'api')
+    the pages have an ETag (If-None-Match -> 304 Not Modified), the answers are compressed by gzip,
+    if the client accepts it
+    the server counts the requests and the sent bytes and can add a latency to each request
+use like this:
+  graph = generate_graph(pages_count=1000, seed=1)
+  with SyntheticWikiServer(graph) as server:
+      requests.get(server.source_link + 'Стаття_1')
+"""
+import bisect
+import gzip
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+RED_LINK_SUFFIX = ' (ще не написана)'
+
+
+def page_title(index: int) -> str:
+    return f'Стаття {index}'
+
+
+def generate_graph(pages_count: int, mean_links: float = 40, seed: int = 1, zipf_exponent: float = 1.0,
+                   red_links_share: float = 0.02, max_links: int = 1000) -> Dict[str, List[str]]:
+    """
+    :param pages_count: int
+    :param mean_links: float, the mean number of links on a page (log-normal distribution)
+    :param seed: int, the same seed gives the same graph
+    :param zipf_exponent: float, the popularity of the k-th most popular page is proportional to 1 / k ** exponent
+    :param red_links_share: float, the share of links to pages, which do not exist
+    :param max_links: int, the maximum number of links on a page
+    :return: title -> linked titles (in the order on the page)
+    """
+    rng = random.Random(seed)
+    titles = [page_title(index) for index in range(pages_count)]
+    # the popular pages are spread over the whole graph
+    by_popularity = titles[:]
+    rng.shuffle(by_popularity)
+    cum_weights = []
+    total = 0.0
+    for rank in range(pages_count):
+        total += 1 / (rank + 1) ** zipf_exponent
+        cum_weights.append(total)
+
+    sigma = 1.0
+    mu = math.log(mean_links) - sigma ** 2 / 2
+    graph: Dict[str, List[str]] = {}
+    red_links_count = 0
+    for title in titles:
+        links_count = min(max_links, int(rng.lognormvariate(mu, sigma)))
+        links: List[str] = []
+        for _ in range(links_count):
+            if rng.random() < red_links_share:
+                red_links_count += 1
+                links.append(f'Відсутня стаття {red_links_count}')
+            else:
+                linked_title = by_popularity[bisect.bisect_left(cum_weights, rng.random() * total)]
+                if linked_title != title:
+                    links.append(linked_title)
+        graph[title] = list(dict.fromkeys(links))
+    return graph
+
+
+def render_page(title: str, links: List[str], graph: Dict[str, List[str]], filler_words: int = 30) -> str:
+    """
+    the html of the page in the structure of MediaWiki (only the parts which matter for the parser)
+    """
+    parts = [f'<!DOCTYPE html><html lang="uk"><head><meta charset="UTF-8"><title>{escape(title)} — Вікіпедія</title>',
+             '<script>var wgPageName = "<a href=\\"/wiki/X\\" title=\\"X\\">";</script>',
+             '<style>.mw-parser-output a > b {color: red}</style></head><body>',
+             '<div id="mw-navigation"><a href="/wiki/%D0%93%D0%BE%D0%BB%D0%BE%D0%B2%D0%BD%D0%B0" '
+             'title="Головна сторінка">Головна</a></div>',
+             f'<div id="content"><h1 id="firstHeading">{escape(title)}</h1><div id="bodyContent">',
+             '<div id="mw-content-text" class="mw-body-content"><div class="mw-parser-output">',
+             '<div class="hatnote"><a href="/wiki/%D0%94%D0%BE%D0%B2%D1%96%D0%B4%D0%BA%D0%B0:X" '
+             'title="Довідка:Неоднозначність">?</a></div><p>']
+    filler = ' '.join(['текст'] * filler_words)
+    for index, link in enumerate(links):
+        if link in graph:
+            parts.append(f'{filler} <a href="/wiki/{quote(link.replace(" ", "_"))}" '
+                         f'title="{escape(link)}">{escape(link)}</a>')
+        else:
+            parts.append(f'{filler} <a href="/w/index.php?title={quote(link.replace(" ", "_"))}'
+                         f'&amp;action=edit&amp;redlink=1" class="new" '
+                         f'title="{escape(link + RED_LINK_SUFFIX)}">{escape(link)}</a>')
+        if index % 10 == 9:
+            parts.append('</p><p>')
+    parts.append('</p><div class="navbox"><a href="/wiki/%D0%A8%D0%B0%D0%B1%D0%BB%D0%BE%D0%BD:X" '
+                 'title="Шаблон:Навігація">т</a></div></div></div>')
+    parts.append('<div id="catlinks"><a href="/wiki/%D0%9A%D0%B0%D1%82%D0%B5%D0%B3%D0%BE%D1%80%D1%96%D1%8F:X" '
+                 'title="Категорія:Статті">Статті</a></div></div></div></body></html>')
+    return ''.join(parts)
+
+
+def render_api_links(titles: List[str], graph: Dict[str, List[str]], offset: int, limit: int) -> dict:
+    """
+    the answer of api.php?action=query&prop=links&formatversion=2, not more than limit links in one answer
+    (the links of all titles are counted together, as in MediaWiki), the rest is given by 'continue'
+    """
+    pages = []
+    all_links = []
+    for title in titles:
+        if title in graph:
+            pages.append({'ns': 0, 'title': title})
+            all_links += [(title, link) for link in sorted(graph[title])]
+        else:
+            pages.append({'ns': 0, 'title': title, 'missing': True})
+    pages_by_title = {page['title']: page for page in pages}
+    for title, link in all_links[offset:offset + limit]:
+        pages_by_title[title].setdefault('links', []).append({'ns': 0, 'title': link})
+    answer: dict = {'batchcomplete': True, 'query': {'pages': pages}}
+    if offset + limit < len(all_links):
+        answer = {'continue': {'plcontinue': str(offset + limit), 'continue': '||'}, 'query': {'pages': pages}}
+    return answer
+
+
+class SyntheticWikiServer:
+    """
+    local HTTP server of the synthetic wiki (in a background thread)
+    """
+
+    def __init__(self, graph: Dict[str, List[str]], latency: float = 0.0, api_links_limit: int = 500,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.graph = graph
+        self.latency = latency
+        self.api_links_limit = api_links_limit
+        self.requests_count = 0
+        self.api_requests_count = 0
+        self.not_modified_count = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def source_link(self) -> str:
+        return f'{self.base_url}/wiki/'
+
+    @property
+    def api_link(self) -> str:
+        return f'{self.base_url}/w/api.php'
+
+    def start(self) -> 'SyntheticWikiServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'SyntheticWikiServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'requests': self.requests_count, 'api_requests': self.api_requests_count,
+                    'not_modified': self.not_modified_count, 'bytes_sent': self.bytes_sent}
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests_count = 0
+            self.api_requests_count = 0
+            self.not_modified_count = 0
+            self.bytes_sent = 0
+
+    def _count(self, body_size: int, api: bool, not_modified: bool = False):
+        with self._lock:
+            self.requests_count += 1
+            self.api_requests_count += int(api)
+            self.not_modified_count += int(not_modified)
+            self.bytes_sent += body_size
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                url = urlparse(self.path)
+                if url.path == '/w/api.php':
+                    query = parse_qs(url.query)
+                    titles = query.get('titles', [''])[0].split('|')
+                    offset = int(query.get('plcontinue', ['0'])[0])
+                    answer = render_api_links(titles, server.graph, offset, server.api_links_limit)
+                    self._send(200, 'application/json; charset=utf-8', json.dumps(answer).encode('utf-8'), True)
+                    return
+                title = unquote(url.path[len('/wiki/'):]).replace('_', ' ') if url.path.startswith('/wiki/') else ''
+                if title not in server.graph:
+                    self._send(404, 'text/html; charset=utf-8', b'<html><body>Not found</body></html>', False)
+                    return
+                body = render_page(title, server.graph[title], server.graph).encode('utf-8')
+                etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    server._count(0, False, True)
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self._send(200, 'text/html; charset=utf-8', body, False, {'ETag': etag})
+
+            def _send(self, status: int, content_type: str, body: bytes, api: bool, headers: dict = None):
+                response_headers = dict(headers or {})
+                if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body)
+                    response_headers['Content-Encoding'] = 'gzip'
+                server._count(len(body), api)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in response_headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
@@ -0,0 +1,65 @@
+import unittest
+
+import requests
+
+from http_client import create_session, get_conditional_headers, get_validators
+from ignore_list_patterns import check_pattern_in_title
+from link_extractor import StreamingExtractor
+from mediawiki_api import fetch_links_batch
+from synthetic_wiki import RED_LINK_SUFFIX, SyntheticWikiServer, generate_graph
+
+
+class SyntheticWikiTest(unittest.TestCase):
+
+    def test_generate_graph_is_reproducible(self):
+        self.assertEqual(generate_graph(200, seed=3), generate_graph(200, seed=3))
+        self.assertNotEqual(generate_graph(200, seed=3), generate_graph(200, seed=4))
+
+    # a few pages have many more links to themselves than the average page
+    def test_degree_distribution(self):
+        graph = generate_graph(2000, mean_links=20, seed=1)
+        in_degree = {}
+        for links in graph.values():
+            for link in links:
+                in_degree[link] = in_degree.get(link, 0) + 1
+        links_count = sum(len(links) for links in graph.values())
+        self.assertGreater(max(in_degree.values()), 50 * links_count / len(graph))
+        self.assertTrue(any(not title.startswith('Стаття') for title in in_degree))
+
+    def test_server_pages_and_api(self):
+        graph = generate_graph(50, mean_links=30, seed=2, red_links_share=0.2)
+        title = max(graph, key=lambda page: len(graph[page]))
+        expected = [link if link in graph else link + RED_LINK_SUFFIX for link in graph[title]]
+        with SyntheticWikiServer(graph, api_links_limit=7) as server:
+            with requests.get(server.source_link + title.replace(' ', '_'), stream=True) as response:
+                chunks = response.iter_content(chunk_size=1000, decode_unicode=True)
+                titles = [link for link in StreamingExtractor().iter_titles(chunks)
+                          if not check_pattern_in_title(link)]
+            self.assertEqual(titles, expected)
+            self.assertEqual(requests.get(server.source_link + 'Немає').status_code, 404)
+
+            result = fetch_links_batch([title, 'Немає'],
+                                       lambda params: requests.get(server.api_link, params=params).json(), 200)
+            self.assertEqual(sorted(result[title][1]), sorted(graph[title]))
+            self.assertEqual(result['Немає'][1], [])
+            self.assertGreater(server.get_stats()['api_requests'], 1)
+
+    # the second request with the validators of the first response gets 304 without a body
+    def test_conditional_request(self):
+        graph = generate_graph(20, seed=5)
+        url_title = 'Стаття_1'
+        with SyntheticWikiServer(graph) as server, create_session() as session:
+            response = session.get(server.source_link + url_title)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            self.assertIn('Стаття 1', response.text)
+            etag, last_modified = get_validators(response)
+            self.assertIsNotNone(etag)
+            response = session.get(server.source_link + url_title,
+                                   headers=get_conditional_headers(etag, last_modified))
+            self.assertEqual((response.status_code, response.content), (304, b''))
+            self.assertEqual(server.get_stats()['not_modified'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,28 @@
 import datetime
-from time import sleep
-from typing import List
+import threading
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from time import perf_counter, sleep
+from typing import Callable, List, Dict, Optional, Set, Tuple, TypeVar, Union
 import requests
 from requests.exceptions import HTTPError, ConnectionError
-from bs4 import BeautifulSoup
 
 import settings
-from db_context import PageStatus, WikiPage, Route
-from db_context import (get_links_by_parent_page, clear_all_tables)
-from ignore_list_patterns import check_pattern_in_title
+from db_context import PageStatus, WikiPage, Route, DBSession
+from db_context import (get_child_ids_by_parent_ids, get_backlinks_by_child_ids, get_parent_ids_linking_to,
+                        get_route_from_chains, get_failed_route, save_failed_route, clear_all_tables,
+                        count_statements, get_statements_count, get_page_titles, touch_page_validators)
+from link_extractor import LinkExtractor, create_link_extractor, extract_linked_titles
+from graph_cache import get_cache_stats
+from graph_snapshot import GraphSnapshot, load_snapshot_if_exists
+from http_client import create_session, drain_response, get_conditional_headers, get_validators
+from landmarks import get_lower_bounds, is_landmark_index_exact
+from mediawiki_api import fetch_links_batch
+from metrics import NullStats, SearchStats, total_stats
+from page_store import PageStore, create_page_store
+from rate_limiter import RateLimiter, create_rate_limiter
+
+T = TypeVar('T')
 
 
 # define Python user-defined exceptions
@@ -33,6 +47,7 @@ class StartPageTitleException(Exception):
 
     def __init__(self, start: str, pars_status: int):
         self.start = start
+        self.pars_status = pars_status
         self.message = f"Start page: {self.start} has problems! ParsCode: {PageStatus(pars_status).name}."
         super().__init__(self.message)
 
@@ -45,6 +60,7 @@ class FinishPageTitleException(Exception):
 
     def __init__(self, finish: str, pars_status: int):
         self.finish = finish
+        self.pars_status = pars_status
         self.message = f"Finish page: {self.finish} has problems! ParsCode: {PageStatus(pars_status).name}."
         super().__init__(self.message)
 
@@ -61,24 +77,47 @@ class ExceedingMaxLinksInRouteException(Exception):
         super().__init__(self.message)
 
 
+# a page of the search frontier: (page_id, parent_id, page_status), without the title
+ChildLink = Tuple[int, int, int]
+
+
 class Node(WikiPage):
     """
     the class inherits all available properties and methods from the base class WikiPage,
     and also has additional properties and methods for use in the WikiRacer class
+    the nodes live only in the current generation of the search, the parent pointers of all viewed pages
+    are kept by CurrentRoute as page ids (the path is not kept in each node)
+    the frontier of the search is a list of links (page_id, parent_id, page_status) (see ChildLink),
+    a node with the title is made only for a page, which is fetched (the titles are read by one query)
     """
-    is_start: bool = False
-    is_finish: bool = False
-    is_dead_end: bool = False
+    __slots__ = ('is_start', 'is_finish', 'is_dead_end', 'generation', 'parent_id', 'validators', 'not_modified',
+                 'fetch_tried')
+
+    is_start: bool
+    is_finish: bool
+    is_dead_end: bool
     generation: int
-    parent_node_title: str
-    path_to_start: List[str] = []  # от старта до cur_node (включительно)
+    parent_id: int  # the id of the parent page (0 - no parent, the start page)
+    validators: Optional[Tuple[Optional[str], Optional[str]]]  # (ETag, Last-Modified) of the page
+    not_modified: bool  # the answer to the conditional request is 304
+    fetch_tried: bool  # the page was fetched in this pass (also if the retries are over), it is not fetched again
+
+    def __init__(self, page_title: str):
+        super().__init__(page_title)
+        self.is_start = False
+        self.is_finish = False
+        self.is_dead_end = False
+        self.generation = 0
+        self.parent_id = 0
+        self.validators = None
+        self.not_modified = False
+        self.fetch_tried = False
 
     def get_current_info(self) -> str:
         msg = f"""Info about Current Node:
         title: {self.title }, id: {self.id}, status: {PageStatus(self.status).name}, generation: {self.generation},
         is_start: {self.is_start}, is_dead_end: {self.is_dead_end}, is_finish: {self.is_finish},
-        parent_node_title: {self.parent_node_title},
-        path_to_start: {self.path_to_start},
+        parent_id: {self.parent_id},
         has_linked_pages_in_db: {self.has_linked_pages_in_db()}
         """
         return msg
@@ -88,146 +127,295 @@ class CurrentRoute(Route):
     """
     the class inherits all available properties and methods from the base class Route,
     and also has additional properties and methods for use in the WikiRacer class
+    the search state (all viewed nodes) is kept in the indexes of the instance by page ids, so it lives only
+    during one search and takes tens of bytes per viewed page (the titles are taken from DB only for the found route):
+      - parents: page id -> id of the parent page (the first viewed node with this id, 0 - the start page)
+      - visited: ids of all valid nodes
+      - valid_ids_by_generation: generation -> ids of valid nodes
     """
-    success: bool = False
+    success: bool
     cur_generation: int
     cur_node: Node
-    all_nodes: List[Node] = []
-    cur_path_to_start: List[str] = []
+    cur_path_to_start: List[int]  # the ids of the pages from the start to the current node (inclusive)
+    finish_page_id: int
+    parents: Dict[int, int]
+    visited: Set[int]
+    valid_ids_by_generation: Dict[int, List[int]]
+    nodes_count: int
+
+    def __init__(self, start: str, finish: str):
+        super().__init__(start, finish)
+        self.success = False
+        self.cur_generation = 0
+        self.cur_path_to_start = []
+        self.finish_page_id = 0
+        self.parents = {}
+        self.visited = set()
+        self.valid_ids_by_generation = {}
+        self.nodes_count = 0
 
     def get_current_info(self) -> str:
         msg = f"""Info about route:
         success: {self.success}, cur_generation: {self.cur_generation}, 
-        nodes_count (valid/all): {len(self.get_all_valid_node_titles())} / {len(self.all_nodes)},
-        nodes_in_cur_generation: {self.get_all_valid_node_titles_by_generation(self.cur_generation)}
+        nodes_count (valid/all): {len(self.visited)} / {self.nodes_count},
+        nodes_in_cur_generation: {len(self.get_all_valid_node_ids_by_generation(self.cur_generation))}
         """
         return msg
 
-    def get_all_valid_node_titles(self) -> List[str]:
+    def add_node(self, node: Node):
         """
-        # получить все валидные узлы из текущей кучи маршрута (не из БД, а из CurrentRoute->all_nodes)
-        :return: List[str]
+        добавить узел в кучу текущего маршрута
+        если валидный узел с таким id уже есть в куче, узел помечается как is_dead_end
+        :param node: Node
         """
-        result_list: List[str]
-        result_list = []
-        for node in self.all_nodes:
-            if node.status == PageStatus.PARSED_CAN_BE_USED.value and not node.is_dead_end:
-                result_list.append(node.title)
-        return result_list
+        if node.id in self.visited:
+            node.is_dead_end = True
+        self.add_page(node.id, node.parent_id, node.status, node.generation)
 
-    def get_all_valid_node_titles_by_generation(self, generation: int) -> List[str]:
+    def add_page(self, page_id: int, parent_id: int, page_status: int, generation: int):
         """
-        # получить имена всех валидных узлов из кучи текущего экземпляра маршрута
-        (не из БД, а из CurrentRoute->all_nodes)
-        с номером генерации, указанной в аргументе
+        adds the page of the frontier to the route by its id (the same as add_node, without a Node object)
+        :param page_id: int
+        :param parent_id: int, 0 - the start page
+        :param page_status: int
         :param generation: int
-        :return: List[str]
         """
-        result_list: List[str]
-        result_list = []
-        for node in self.all_nodes:
-            if node.status == PageStatus.PARSED_CAN_BE_USED.value \
-                    and not node.is_dead_end \
-                    and node.generation == generation:
-                result_list.append(node.title)
-        return result_list
+        self.nodes_count += 1
+        self.parents.setdefault(page_id, parent_id)
+        if page_status == PageStatus.PARSED_CAN_BE_USED.value and page_id not in self.visited:
+            self.visited.add(page_id)
+            self.valid_ids_by_generation.setdefault(generation, []).append(page_id)
 
-    def get_node_by_title(self, node_title: str) -> Node:
+    def has_node(self, page_id: int) -> bool:
         """
-        функция находит в куче по имени и возвращает  узел
-        :param node_title:
-        :return: Node
+        :return: bool, the page was already viewed by the search (added to the route)
         """
-        for node in self.all_nodes:
-            if node.title == node_title:
-                return node
+        return page_id in self.parents
 
-    def get_path_from_start_to_me(self, node_title: str):
+    def get_all_valid_node_ids(self) -> Set[int]:
         """
-        функция определяет путь от старта до указанного имени узла
-        (на основе данных в куче, не по связям в БД)
-        :param node_title: str
-        :return: List[str]
+        # получить id всех валидных узлов из текущей кучи маршрута (не из БД, а из CurrentRoute->visited)
+        :return: Set[int]
         """
-        to_root_str_list = []
-        success: bool = False
-        cur_node: Node
-        cur_node = self.get_node_by_title(node_title)
+        return self.visited
 
-        while not success:
-            to_root_str_list.insert(0, cur_node.title)
-            if cur_node.is_start:
-                success = True
-            else:
-                parent_title = cur_node.parent_node_title
-                cur_node = self.get_node_by_title(parent_title)
-        return to_root_str_list
+    def get_all_valid_node_ids_by_generation(self, generation: int) -> List[int]:
+        """
+        # получить id всех валидных узлов из кучи текущего экземпляра маршрута
+        (не из БД, а из CurrentRoute->valid_ids_by_generation)
+        с номером генерации, указанной в аргументе
+        :param generation: int
+        :return: List[int]
+        """
+        return self.valid_ids_by_generation.get(generation, [])
 
-    def get_valid_child_nodes_by_parent_generation(self, generation: int) -> List[Node]:
+    def get_path_from_start_to_me(self, page_id: int) -> List[int]:
+        """
+        функция определяет путь от старта до указанного узла
+        (по ссылкам на родителя в куче, не по связям в БД)
+        :param page_id: int
+        :return: List[int], the ids of the pages
         """
-        # получить объекты всех ДОЧЕРНИХ валидных узлов из кучи текущего экземпляра маршрута
-        (не из БД, а из CurrentRoute->all_nodes)
+        to_root_list = []
+        while page_id:
+            to_root_list.append(page_id)
+            page_id = self.parents[page_id]
+        to_root_list.reverse()
+        return to_root_list
+
+    def get_valid_child_links_by_parent_generation(self, generation: int) -> List[ChildLink]:
+        """
+        # получить все ДОЧЕРНИЕ валидные узлы из кучи текущего экземпляра маршрута
+        (не из БД, а из CurrentRoute->valid_ids_by_generation)
         от всех узлов с номером генерации, указанной в аргументе
+        все дочерние страницы всех родителей поднимаются из БД одним запросом (get_child_ids_by_parent_ids),
+        only the ids and the statuses, the titles are not read
+        the pages, which are valid nodes of the previous generations, are skipped (they would be dead ends)
+        :param generation: int
+        :return: List[ChildLink], (page_id, parent_id, page_status)
+        """
+        return [(child_id, parent_id, child_status) for parent_id, child_id, child_status
+                in get_child_ids_by_parent_ids(self.get_all_valid_node_ids_by_generation(generation))
+                if child_id not in self.visited]
+
+    @staticmethod
+    def get_nodes_for_fetching(links: List[ChildLink], generation: int) -> Dict[Tuple[int, int], Node]:
+        """
+        the nodes of the pages, which are not parsed (they are fetched), with the titles by one query
+        :param links: List[ChildLink]
         :param generation: int
-        :return: List[Node]
-        """
-        # получаем список имен всех валидных узлов по номеру генерации из текущей кучи
-        parent_list: List[str] = self.get_all_valid_node_titles_by_generation(generation)
-        nodes_list: List[Node] = []
-        for parent_title in parent_list:
-            # по имени каждого элемента создаем объект страницы и поднимаем данные из БД
-            parent_page = WikiPage(parent_title)
-            parent_page.get_from_db()
-            # получаем из БД все дочерние страницы для данной страницы
-            for page in get_links_by_parent_page(parent_page):
-                # из каждой страницы собираем узел
-                node = Node(page.title)
-                node.get_from_db()
-                node.parent_node_title = parent_title
-                node.generation = self.cur_generation
-                if node.title == self.finish_page_title:
-                    node.is_finish = True
-                nodes_list.append(node)
-        return nodes_list
+        :return: (page_id, parent_id) -> Node
+        """
+        titles = get_page_titles([page_id for page_id, _, page_status in links
+                                  if page_status == PageStatus.NOT_PARSED.value])
+        nodes: Dict[Tuple[int, int], Node] = {}
+        for page_id, parent_id, page_status in links:
+            if page_id in titles:
+                node = Node(titles[page_id])
+                node.id = page_id
+                node.status = page_status
+                node.parent_id = parent_id
+                node.generation = generation
+                nodes[(page_id, parent_id)] = node
+        return nodes
 
     def save_chain_to_db(self):
-        for page_tittle in self.cur_path_to_start:
-            page = WikiPage(page_tittle)
-            page.get_from_db()
-            self.add_page_to_chain(page)
+        self.add_page_ids_to_chain(self.cur_path_to_start)
 
 
 class WikiRacer:
     start_time: datetime.datetime
     requests_count: int
-    requests_per_minute: int
+    rate_limiter: RateLimiter
+    session: requests.Session
+    link_extractor: LinkExtractor
+    page_store: Optional[PageStore]
+    graph_snapshot: Optional[GraphSnapshot]
     links_per_page: int
     max_links_in_route: int
+    fetch_concurrency: int
+    search_mode: str
+    fetch_backend: str
     display_log: bool
     return_route_if_it_exists_in_db: bool
+    failed_route_ttl_seconds: int
+    not_fetched_count: int  # the pages of the current search, which were not fetched (the retries are over)
+    collect_stats: bool
+    stats: SearchStats
+    last_search_stats: Optional[SearchStats]
 
     def __init__(self):
         self.start_time = datetime.datetime.now()
         self.requests_count = 0
-        self.requests_per_minute = settings.requests_per_minute
+        self.rate_limiter = create_rate_limiter()
+        self.session = create_session(max(1, settings.fetch_concurrency))
+        self.link_extractor = create_link_extractor()
+        self.page_store = create_page_store()
+        self.graph_snapshot = load_snapshot_if_exists()
         self.links_per_page = settings.links_per_page
         self.max_links_in_route = settings.max_links_in_route
+        self.fetch_concurrency = settings.fetch_concurrency
+        self.search_mode = settings.search_mode
+        self.fetch_backend = settings.fetch_backend
         self.display_log = settings.display_log
         self.return_route_if_it_exists_in_db = settings.return_route_if_it_exists_in_db
-
-    def print_log_msg(self, msg: str):
+        self.failed_route_ttl_seconds = settings.failed_route_ttl_seconds
+        self.not_fetched_count = 0
+        self.collect_stats = settings.collect_stats
+        self.stats = NullStats()
+        self.last_search_stats = None
+        self._limiter_lock = threading.Lock()
+
+    def print_log_msg(self, msg: Union[str, Callable[[], str]]):
         """
         function print message to console, if settings.display_log = true
-        :param msg:
+        :param msg: str or a function, which returns the message
+                    (it is called only if the log is displayed, e.g. node.get_current_info makes a DB query)
         """
         if self.display_log:
-            print(msg)
+            print(msg() if callable(msg) else msg)
 
     def find_path(self, start: str, finish: str) -> List[str]:
         """
         main function
+        the whole search is performed in one database session (one pooled connection)
+        the metrics of the search (metrics.py) are kept in self.last_search_stats (if collect_stats = True)
+        """
+        self.stats = SearchStats() if self.collect_stats else NullStats()
+        self.not_fetched_count = 0
+        started = perf_counter()
+        statements_before = get_statements_count()
+        cache_stats_before = get_cache_stats() if self.stats.enabled else None
+        try:
+            self._check_arguments(start, finish)
+            # the SQL statements are counted only for the metrics (the counter takes a process-wide lock)
+            with count_statements() if self.stats.enabled else nullcontext(), DBSession():
+                try:
+                    path = self._find_path(start, finish)
+                except (StartPageTitleException, FinishPageTitleException,
+                        ExceedingMaxLinksInRouteException) as exc:
+                    self._save_failed_route(start, finish, exc)
+                    raise
+            self.stats.result = 'found'
+            return path
+        except Exception as exc:
+            self.stats.result = type(exc).__name__
+            raise
+        finally:
+            if self.stats.enabled:
+                self._finish_stats(started, statements_before, cache_stats_before)
+
+    def find_path_with_stats(self, start: str, finish: str) -> Tuple[List[str], SearchStats]:
+        """
+        the same as find_path, but also returns the metrics of the search (metrics.py/SearchStats),
+        the metrics are collected even if collect_stats = False
         """
+        collect_stats = self.collect_stats
+        self.collect_stats = True
+        try:
+            path = self.find_path(start, finish)
+        finally:
+            self.collect_stats = collect_stats
+        return path, self.last_search_stats
+
+    def _finish_stats(self, started: float, statements_before: int, cache_stats_before: Dict[str, Dict[str, int]]):
+        """
+        adds the time of find_path, the SQL statements and the cache hits/misses of the search to self.stats
+        (the statements and the caches are counted by the process, so the searches in other threads
+        at the same time are also counted)
+        """
+        self.stats.add_time('find_path', perf_counter() - started)
+        self.stats.count('db_statements', get_statements_count() - statements_before)
+        for cache_name, cache_stats in get_cache_stats().items():
+            for name in ('hits', 'misses'):
+                self.stats.count(f'{cache_name}_{name}', cache_stats[name] - cache_stats_before[cache_name][name])
+        self.last_search_stats = self.stats
+        total_stats.merge(self.stats)
+
+    def _check_failed_route(self, start: str, finish: str):
+        """
+        negative cache: if the same search failed not earlier than failed_route_ttl_seconds ago
+        (with the same max_links_in_route, links_per_page and search_mode), raises the same exception without searching
+        """
+        if self.failed_route_ttl_seconds <= 0:
+            return
+        failure = get_failed_route(start, finish, self.max_links_in_route, self.links_per_page, self.search_mode,
+                                   self.failed_route_ttl_seconds)
+        if failure is None:
+            return
+        self.print_log_msg(f'The route: {start} -> {finish} failed earlier ({failure}).')
+        if failure == 'start':
+            raise StartPageTitleException(start, PageStatus.PARSED_NO_SUCH_ARTICLE.value)
+        if failure == 'finish':
+            raise FinishPageTitleException(finish, PageStatus.PARSED_NO_SUCH_ARTICLE.value)
+        raise ExceedingMaxLinksInRouteException()
+
+    def _save_failed_route(self, start: str, finish: str, exc: Exception):
+        """
+        saves the failed search to the negative cache
+        the searches, which left pages NOT_PARSED because of request errors (the start or finish page,
+        or any page of the search: self.not_fetched_count), are not saved, the next search tries them again
+        """
+        if self.failed_route_ttl_seconds <= 0:
+            return
+        if isinstance(exc, StartPageTitleException):
+            if exc.pars_status != PageStatus.PARSED_NO_SUCH_ARTICLE.value:
+                return
+            failure = 'start'
+        elif isinstance(exc, FinishPageTitleException):
+            if exc.pars_status != PageStatus.PARSED_NO_SUCH_ARTICLE.value:
+                return
+            failure = 'finish'
+        else:
+            if self.not_fetched_count > 0:
+                return
+            failure = 'max_links'
+        save_failed_route(start, finish, self.max_links_in_route, self.links_per_page, self.search_mode, failure)
 
+    def _check_arguments(self, start: str, finish: str):
+        """
+        the checks of the arguments, which do not need the database (before the session is opened)
+        """
         self.print_log_msg(f'START WikiRacer search ({start} -> {finish}) at {self.start_time}')
 
         # check equality start and finish
@@ -236,41 +424,78 @@ class WikiRacer:
         else:
             self.print_log_msg('start_node != finish_node -> OK!')
 
-        # check start page and add to db
-        start_node = Node(start)
-        self._page_parsing(start_node)
-        start_node.get_from_db()
-        if start_node.status != PageStatus.PARSED_CAN_BE_USED.value:
-            raise StartPageTitleException(start_node.title, start_node.status)
-        else:
-            start_node.is_start = True
-            start_node.generation = 0
-            start_node.path_to_start.append(start_node.title)
-            self.print_log_msg('start_node -> OK!')
-
-        # check finish page and add to db
-        finish_node = Node(finish)
-        self._page_parsing(finish_node)
-        finish_node.get_from_db()
-        if finish_node.status != PageStatus.PARSED_CAN_BE_USED.value:
-            raise FinishPageTitleException(finish_node.title, finish_node.status)
-        else:
-            finish_node.is_finish = True
-            self.print_log_msg('finish_node -> OK!')
+    def _find_path(self, start: str, finish: str) -> List[str]:
+        # first tier: search the route in the graph snapshot (without DB and requests)
+        if self.graph_snapshot is not None:
+            with self.stats.timer('phase_snapshot'):
+                path = self.graph_snapshot.find_path(start, finish, self.max_links_in_route)
+            if path:
+                self.print_log_msg(f"The route is found in the graph snapshot.")
+                self.print_log_msg(f'FINISH WikiRacer at {datetime.datetime.now()}')
+                return path
+
+        # negative cache: the same search failed earlier
+        with self.stats.timer('phase_route_cache'):
+            self._check_failed_route(start, finish)
+
+        with self.stats.timer('phase_validation'):
+            # check start page and add to db
+            start_node = Node(start)
+            self._page_parsing(start_node)
+            start_node.get_from_db()
+            if start_node.status != PageStatus.PARSED_CAN_BE_USED.value:
+                raise StartPageTitleException(start_node.title, start_node.status)
+            else:
+                start_node.is_start = True
+                start_node.generation = 0
+                self.print_log_msg('start_node -> OK!')
+
+            # check finish page and add to db
+            finish_node = Node(finish)
+            self._page_parsing(finish_node)
+            finish_node.get_from_db()
+            if finish_node.status != PageStatus.PARSED_CAN_BE_USED.value:
+                raise FinishPageTitleException(finish_node.title, finish_node.status)
+            else:
+                finish_node.is_finish = True
+                self.print_log_msg('finish_node -> OK!')
 
-        # check current route in db, if is exists -> return it
         route = CurrentRoute(start, finish)
-        if route.is_exists_in_db() and self.return_route_if_it_exists_in_db:
-            route.get_from_db()
-            self.print_log_msg(f"The route: {route.get_route_name()} already exists in the database.")
-            self.print_log_msg(f'FINISH WikiRacer at {datetime.datetime.now()}')
-            return route.get_title_list_from_chain()
+        route.finish_page_id = finish_node.id
+        with self.stats.timer('phase_route_cache'):
+            # check current route in db, if is exists -> return it
+            if route.is_exists_in_db() and self.return_route_if_it_exists_in_db:
+                route.get_from_db()
+                self.print_log_msg(f"The route: {route.get_route_name()} already exists in the database.")
+                self.print_log_msg(f'FINISH WikiRacer at {datetime.datetime.now()}')
+                return route.get_title_list_from_chain()
+
+            # check the stored routes, which contain this route as a sub-route
+            if self.return_route_if_it_exists_in_db:
+                path = get_route_from_chains(start, finish, self.max_links_in_route)
+                if path:
+                    self.print_log_msg(f"The route: {route.get_route_name()} is a part of a route in the database.")
+                    self.print_log_msg(f'FINISH WikiRacer at {datetime.datetime.now()}')
+                    return path
 
         # ============begin search route======================
         route.success = False
         route.cur_node = start_node
         route.cur_generation = 0
 
+        with self.stats.timer('phase_search'):
+            if self.search_mode == 'bidirectional':
+                return self._search_bidirectional(route, start_node)
+            return self._search_forward(route, start_node, finish_node)
+
+    def _search_forward(self, route: CurrentRoute, start_node: Node, finish_node: Node) -> List[str]:
+        """
+        the main search mode (search_mode = 'forward' or 'landmarks'): generation by generation from the start page
+        :param route: CurrentRoute
+        :param start_node: Node
+        :param finish_node: Node
+        :return: List[str]
+        """
         while not route.success:
 
             # if we have reached the maximum number of generations in the search tree
@@ -281,63 +506,93 @@ class WikiRacer:
             if route.cur_generation == 0:
 
                 # добавить стартовую страницу в кучу
-                route.all_nodes.append(start_node)
-                self.print_log_msg(route.get_current_info())
+                route.add_node(start_node)
+                self.print_log_msg(route.get_current_info)
 
                 # делаем шаг в глубь дерева и анализируем потомков
-                route.cur_path_to_start = start_node.path_to_start
+                route.cur_path_to_start = [start_node.id]
                 route.cur_generation += 1
 
             # if this is not zero generation, then
             else:
-                self.print_log_msg(route.get_current_info())
+                self.print_log_msg(route.get_current_info)
 
-                # take all valid child nodes (all children) from node(s) with generation -1 (all parents)
-                # (page_status = PARSED_CAN_BE_USED, not dead end, generation =-1)
-                valid_child_nodes = route.get_valid_child_nodes_by_parent_generation(route.cur_generation - 1)
-                child_nodes_for_parsing = []
+                # take all valid child links (all children) from node(s) with generation -1 (all parents)
+                # (page_status = PARSED_CAN_BE_USED, not dead end, generation =-1), without the titles
+                valid_child_links = route.get_valid_child_links_by_parent_generation(route.cur_generation - 1)
 
-                # check if the selected list has page with status is_finish
-                # if true -> return the list with one element (finish node)
+                # check if the selected list has the finish page
+                # if true -> return the list with one element (finish page)
                 # if not -> return full list of valid childs
-                for node in valid_child_nodes:
-                    if node.is_finish and node.title == route.finish_page_title:
-                        child_nodes_for_parsing.append(node)
-                if not child_nodes_for_parsing:
-                    child_nodes_for_parsing = valid_child_nodes
+                child_links_for_parsing = [link for link in valid_child_links if link[0] == finish_node.id]
+                if not child_links_for_parsing:
+                    child_links_for_parsing = valid_child_links
+                    # goal-directed search: order by the distance to the finish page, skip unreachable pages
+                    if self.search_mode == 'landmarks':
+                        child_links_for_parsing = self._order_by_landmarks(child_links_for_parsing, finish_node,
+                                                                           route.cur_generation)
+
+                self.stats.count_nodes(route.cur_generation, len(child_links_for_parsing))
+
+                # the nodes with the titles only for the pages, which are not parsed
+                nodes_by_link = route.get_nodes_for_fetching(child_links_for_parsing, route.cur_generation)
+
+                # fetch the pages of the generation concurrently (if fetch_concurrency > 1)
+                # early goal detection: the fetching stops at the first page with a link to the finish page
+                # (if the finish page in the next generation is within max_links_in_route)
+                finish_title = finish_node.title if route.cur_generation < self.max_links_in_route else None
+                parents_of_finish: Set[int] = set()
+                nodes_for_fetching = list(nodes_by_link.values())
+                if finish_title is not None and nodes_for_fetching:
+                    # the parsed pages with a link to the finish page: the pages after the first one are not fetched
+                    parents_of_finish = get_parent_ids_linking_to(
+                        finish_node.id, [page_id for page_id, _, page_status in child_links_for_parsing
+                                         if page_status == PageStatus.PARSED_CAN_BE_USED.value])
+                    for position, (page_id, _, _) in enumerate(child_links_for_parsing):
+                        if page_id in parents_of_finish:
+                            nodes_for_fetching = [nodes_by_link[link[:2]] for link in child_links_for_parsing[:position]
+                                                  if link[:2] in nodes_by_link]
+                            break
+                if self._parse_generation(nodes_for_fetching, finish_title=finish_title):
+                    self.stats.count('early_goal_hits')
+                    parents_of_finish |= get_parent_ids_linking_to(finish_node.id,
+                                                                   [node.id for node in nodes_for_fetching])
 
                 # iterate list
-                for node in child_nodes_for_parsing:
-                    # pars the page
-                    self._page_parsing(node)
-                    node.get_from_db()
-
-                    # if the stack of all previously viewed nodes has current node
-                    if node.title in route.get_all_valid_node_titles():
-                        # mark this node as dead_end
-                        node.is_dead_end = True
-
-                    # add this node to stack
-                    route.all_nodes.append(node)
-
-                    # get and save the route from start to me in this node
-                    node.path_to_start = route.get_path_from_start_to_me(node.title)
+                for page_id, parent_id, page_status in child_links_for_parsing:
+                    node = nodes_by_link.get((page_id, parent_id))
+                    if node is not None:
+                        # pars the page
+                        self._page_parsing(node)
+                        node.get_from_db()
+                        page_status = node.status
+                        self.print_log_msg(node.get_current_info)
+                    else:
+                        self.print_log_msg(lambda: f'page id: {page_id}, status: {PageStatus(page_status).name}, '
+                                                   f'parent_id: {parent_id}')
 
-                    # save the chain to current
-                    route.cur_path_to_start = node.path_to_start
+                    # add this page to stack
+                    # (if the stack of all previously viewed nodes has current page, it is a dead end)
+                    route.add_page(page_id, parent_id, page_status, route.cur_generation)
 
-                    # if the title of current node = the title of finish node
-                    if node.title == finish_node.title:
-                        node.is_finish = True
-                        self.print_log_msg(node.get_current_info())
+                    # if the current page is the finish page (the pages are compared by id)
+                    if page_id == finish_node.id:
+                        # the route from start to me by the parent pointers
+                        route.cur_path_to_start = route.get_path_from_start_to_me(page_id)
                         route.success = True
                         # save the route to DB
                         route.add_to_db()
                         # build the chain and save it to DB
                         route.save_chain_to_db()
                         break
-                    else:
-                        self.print_log_msg(node.get_current_info())
+                    elif page_id in parents_of_finish and page_id in route.visited:
+                        # the finish page is a child of the current page, the next generation is not read
+                        # (the pages after the current page are not fetched and not added)
+                        route.cur_path_to_start = route.get_path_from_start_to_me(page_id) + [finish_node.id]
+                        route.success = True
+                        route.add_to_db()
+                        route.save_chain_to_db()
+                        break
 
                 # go to generation + 1
                 route.cur_generation += 1
@@ -347,26 +602,184 @@ class WikiRacer:
             self.print_log_msg(f'FINISH WikiRacer at {datetime.datetime.now()}')
             return route.get_title_list_from_chain()
 
-    def _request_limiter(self) -> bool:
-        """
-        The function controls the actual number of requests and the total duration of the program running.
-        If the limit on the number of requests per minute (requests_per_minute in the settings) is exceeded,
-        the function returns the number of seconds of delay.
-        If the limit is not exceeded, then the function returns zero.
-        :return: True/False
-        """
-        total_duration_sec = (datetime.datetime.now() - self.start_time).total_seconds()
-        total_duration_min = round(total_duration_sec / 60, 0)
-        self.requests_count += 1
-        current_req_per_min = round(self.requests_count / total_duration_sec * 60, 1)
-        self.print_log_msg(
-            f"""Request_limiter: 
-duration, min: {total_duration_min}, requests_count: {self.requests_count}, requests_per_min: {current_req_per_min}"""
-        )
-        if current_req_per_min < self.requests_per_minute:
-            return True
+    def _search_bidirectional(self, route: CurrentRoute, start_node: Node) -> List[str]:
+        """
+        bidirectional search mode (settings.py/search_mode = 'bidirectional'):
+        the forward search goes from the start page (the pages are parsed as in the main mode,
+        but only before the expansion of their generation),
+        the backward search goes from the finish page by the known links to it (table 'links', without requests).
+        On each step the side with the smaller frontier is expanded, a meeting of the two sides gives a route.
+        The links of the pages, which are not parsed yet, are unknown, and any of them can link to the finish page,
+        so a route of L links is returned only when all pages of the forward search nearer than L - 1 links
+        to the start page are parsed (then there is no shorter route, the route has the same length as in
+        the main mode). Until then the forward search goes on, the best meeting is kept.
+        If there are no known links to the frontier of the backward search, only the forward search goes on.
+        :param route: CurrentRoute
+        :param start_node: Node
+        :return: List[str]
+        """
+        # backward search: page id -> (id of the next page on the way to the finish (0 - the finish page),
+        # number of links to the finish)
+        backward_next: Dict[int, Tuple[int, int]] = {route.finish_page_id: (0, 0)}
+        backward_frontier: List[int] = [route.finish_page_id]
+        backward_generation = 0
+
+        # forward search: the pages of route.cur_generation, which are found, but not parsed and not added yet
+        forward_frontier: Dict[int, ChildLink] = {start_node.id: (start_node.id, 0, start_node.status)}
+
+        # the shortest meeting: the ids of the pages from the start to the meeting page
+        best_path: Optional[List[int]] = None
+        best_links_count = self.max_links_in_route + 1
+
+        def add_meeting(forward_path: List[int], links_count: int):
+            nonlocal best_path, best_links_count
+            if links_count < best_links_count:
+                best_path, best_links_count = forward_path, links_count
+
+        while True:
+            # the generations of the forward search, where all pages are parsed
+            # (the generations before the frontier are parsed, the frontier can be parsed by earlier searches)
+            parsed_generation = route.cur_generation - 1
+            if forward_frontier and all(page_status != PageStatus.NOT_PARSED.value
+                                        for _, _, page_status in forward_frontier.values()):
+                parsed_generation = route.cur_generation
+            # all pages are parsed, if the forward search has no pages to expand
+            if best_path is not None and (best_links_count <= parsed_generation + 2 or not forward_frontier):
+                break
+            # a route, which is not found yet, has a page nearer than L - 1 links, which is not parsed,
+            # or is not shorter than the sum of the generations of both sides + 1
+            if not forward_frontier or min(parsed_generation + 2, route.cur_generation + backward_generation + 1) \
+                    > self.max_links_in_route:
+                raise ExceedingMaxLinksInRouteException()
+            self.print_log_msg(f"Bidirectional search: generation forward/backward: "
+                               f"{route.cur_generation}/{backward_generation}, "
+                               f"frontier forward/backward: {len(forward_frontier)}/{len(backward_frontier)}")
+
+            # with a meeting only the forward search can make it certain
+            if best_path is None and backward_frontier and len(backward_frontier) <= len(forward_frontier):
+                # expand the backward frontier: all known parents of its pages
+                backward_generation += 1
+                self.stats.count('backward_nodes_expanded', len(backward_frontier))
+                new_backward_frontier: List[int] = []
+                for child_id, parent_page in get_backlinks_by_child_ids(backward_frontier):
+                    if parent_page.id in backward_next:
+                        continue
+                    backward_next[parent_page.id] = (child_id, backward_generation)
+                    new_backward_frontier.append(parent_page.id)
+                    # meeting with a page of the forward search
+                    forward_link = forward_frontier.get(parent_page.id)
+                    if forward_link is not None:
+                        forward_path = self._get_forward_path(route, forward_link[0], forward_link[1])
+                    elif route.has_node(parent_page.id):
+                        forward_path = route.get_path_from_start_to_me(parent_page.id)
+                    else:
+                        continue
+                    add_meeting(forward_path, len(forward_path) - 1 + backward_generation)
+                backward_frontier = new_backward_frontier
+            else:
+                # parse and add the forward frontier, then take the children of its valid nodes
+                # early goal detection: the fetching stops at the first page with a link to the finish page
+                # (the route through it is the shortest: the generations before the frontier are parsed)
+                self.stats.count_nodes(route.cur_generation, len(forward_frontier))
+                # the nodes with the titles only for the pages, which are not parsed
+                nodes_by_link = route.get_nodes_for_fetching(list(forward_frontier.values()), route.cur_generation)
+                parents_of_finish: Set[int] = set()
+                if self._parse_generation(list(nodes_by_link.values()), finish_title=route.finish_page_title):
+                    self.stats.count('early_goal_hits')
+                    parents_of_finish = get_parent_ids_linking_to(route.finish_page_id, list(forward_frontier))
+                finish_parent_id = 0
+                for page_id, parent_id, page_status in forward_frontier.values():
+                    node = nodes_by_link.get((page_id, parent_id))
+                    if node is not None:
+                        self._page_parsing(node)
+                        page_status = node.status
+                    route.add_page(page_id, parent_id, page_status, route.cur_generation)
+                    if page_id in parents_of_finish and page_id in route.visited:
+                        finish_parent_id = page_id
+                        break
+                if finish_parent_id:
+                    best_path = route.get_path_from_start_to_me(finish_parent_id) + [route.finish_page_id]
+                    break
+                route.cur_generation += 1
+                forward_frontier = {}
+                for page_id, parent_id, page_status in \
+                        route.get_valid_child_links_by_parent_generation(route.cur_generation - 1):
+                    if page_id in forward_frontier or route.has_node(page_id):
+                        continue
+                    forward_frontier[page_id] = (page_id, parent_id, page_status)
+                    # meeting with a page of the backward search
+                    if page_id in backward_next:
+                        add_meeting(self._get_forward_path(route, page_id, parent_id),
+                                    route.cur_generation + backward_next[page_id][1])
+
+        # the rest of the route goes by the backward search to the finish
+        next_id = backward_next[best_path[-1]][0]
+        while next_id:
+            best_path.append(next_id)
+            next_id = backward_next[next_id][0]
+        route.cur_path_to_start = best_path
+        route.success = True
+        route.add_to_db()
+        route.save_chain_to_db()
+        self.print_log_msg(f"Route is founded!!!")
+        self.print_log_msg(f'FINISH WikiRacer at {datetime.datetime.now()}')
+        return route.get_title_list_from_chain()
+
+    def _order_by_landmarks(self, links: List[ChildLink], finish_node: Node, generation: int) -> List[ChildLink]:
+        """
+        ALT search (search_mode = 'landmarks'): the lower bound of the number of links from each page
+        to the finish page is taken from the landmark index (landmarks.py), the pages are ordered by it
+        (the pages closer to the finish page are parsed first and become the parents of the next generation)
+        the pages, which can not reach the finish page within max_links_in_route links, are not parsed
+        only if the index is exact (landmarks.py/is_landmark_index_exact()), on a partially crawled graph
+        the bound can be longer than the real route, and the pages are only ordered
+        a page, which is not the finish page, is at least 1 link away
+        :param links: List[ChildLink], the pages of the generation (without the finish page)
+        :param finish_node: Node
+        :param generation: int, the generation of the pages
+        :return: List[ChildLink]
+        """
+        remaining_links = self.max_links_in_route - generation
+        bounds = get_lower_bounds(list({link[0] for link in links}), finish_node.id)
+        links_with_bounds = sorted([(max(1, bounds.get(link[0], 1)), link) for link in links], key=lambda item: item[0])
+        if is_landmark_index_exact():
+            ordered_links = [link for bound, link in links_with_bounds if bound <= remaining_links]
         else:
-            return False
+            ordered_links = [link for _, link in links_with_bounds]
+        self.stats.count('landmark_pruned_nodes', len(links) - len(ordered_links))
+        self.print_log_msg(f'landmarks: {len(ordered_links)} of {len(links)} pages can reach the finish page')
+        return ordered_links
+
+    @staticmethod
+    def _get_forward_path(route: CurrentRoute, page_id: int, parent_id: int) -> List[int]:
+        """
+        the ids of the pages from the start to the page (the page can be not added to the route yet)
+        :param parent_id: int, 0 - the start page
+        """
+        if not parent_id:
+            return [page_id]
+        return route.get_path_from_start_to_me(parent_id) + [page_id]
+
+    def _request_limiter(self):
+        """
+        The function controls the frequency of requests (requests_per_minute and requests_burst in the settings).
+        It reserves a time slot for the next request in the rate limiter (rate_limiter.py)
+        and sleeps exactly until this slot, so no polling is needed.
+        The limiter is thread-safe, and with a shared backend (settings.py/rate_limiter_backend)
+        all processes together stay under one requests budget.
+        """
+        delay_sec = self.rate_limiter.acquire()
+        self.stats.count('requests')
+        self.stats.add_time('rate_limit_sleep', delay_sec)
+        with self._limiter_lock:
+            self.requests_count += 1
+            requests_count = self.requests_count
+        if self.display_log:
+            total_duration_sec = (datetime.datetime.now() - self.start_time).total_seconds()
+            self.print_log_msg(
+                f"""Request_limiter: 
+duration, min: {round(total_duration_sec / 60, 0)}, requests_count: {requests_count}, delay, sec: {round(delay_sec, 2)}"""
+            )
 
     def _page_parsing(self, node: Node):
         """
@@ -383,62 +796,262 @@ duration, min: {total_duration_min}, requests_count: {self.requests_count}, requ
         # if page not in db -> add it
         node.add_to_db()
 
-        # begin parsing page
-        if node.status == PageStatus.NOT_PARSED.value:
-            connection_condition = True  # current connection condition
-            connection_attempt = 0  # current connection iteration
+        # begin parsing page (not again, if the fetch of the page was tried by _parse_generation())
+        if node.status == PageStatus.NOT_PARSED.value and not node.fetch_tried:
+            node.fetch_tried = True
+            if self.fetch_backend == 'api':
+                self._save_fetched_page(node, self._fetch_pages_api([node])[node.title])
+            else:
+                self._save_fetched_page(node, self._fetch_page(node))
 
-            response_condition = True  # current response condition
-            response_attempt = 0  # current response iteration
+    def _parse_generation(self, nodes: List[Node], refresh: bool = False, finish_title: Optional[str] = None) -> bool:
+        """
+        concurrent fetch mode: fetches all NOT_PARSED pages of the generation
+        in a pool of fetch_concurrency threads (settings.py/fetch_concurrency).
+        The threads only download and parse pages, the results are written to DB
+        in the calling thread (in the search session). Every request still passes through _request_limiter()
+        and has the same retry rules as in _page_parsing().
+        With the 'api' fetch backend, each thread takes the links of api_titles_per_request pages at once.
+        If fetch_concurrency <= 1 and the fetch backend is 'html',
+        the function does nothing and pages are parsed one by one in _page_parsing()
+        (with finish_title the pages are fetched one by one here).
+        early goal detection: if finish_title is given, the links of each fetched page are checked at once,
+        and when a page has a link to the finish page, the pages after it (in the order of nodes) are not fetched
+        (the fetches, which are not started yet, are cancelled), the pages before it are fetched as usual,
+        so the route is the same as without the early stop
+        :param nodes: List[Node]
+        :param refresh: bool, the parsed pages are fetched again (with conditional requests, if node.validators
+                        are known) and their links are replaced (crawler_worker.py --refresh)
+        :param finish_title: str, the title of the finish page (None - all pages are fetched)
+        :return: bool, the fetching was stopped, because a page has a link to the finish page
+        the nodes of the fetched pages (also if the retries are over) are marked by node.fetch_tried,
+        _page_parsing() does not fetch them again
+        """
+        if self.fetch_concurrency <= 1 and self.fetch_backend != 'api' and not refresh and finish_title is None:
+            return False
 
-            while connection_condition and response_condition:
-                if self._request_limiter():
-                    try:
-                        response = requests.get(node.get_url())
-                        response.raise_for_status()  # raise error if not OK
-                        # create BeautifulSoup object and pars it
-                        page_html = BeautifulSoup(response.text, 'html.parser')
-                        mw_content_text_element = page_html.find('div', {'id': 'mw-content-text'})
-                        href_list = mw_content_text_element.findAll('a', href=True)
-
-                        count: int = 0
-                        for href in href_list:
-                            try:
-                                title = href['title']
-                                if not check_pattern_in_title(title):
-                                    if count < self.links_per_page:
-                                        node.add_linked_page(title)  # add new page and link to db
-                                        count += 1
-                            except:
-                                continue
-                        node.set_page_status(PageStatus.PARSED_CAN_BE_USED.value)
-                        break
+        nodes_for_fetching: Dict[str, Node] = {}
+        nodes_by_title: Dict[str, List[Node]] = {}  # the same page can be a child of several parents
+        for node in nodes:
+            if (refresh or node.status == PageStatus.NOT_PARSED.value) and not node.fetch_tried:
+                nodes_for_fetching.setdefault(node.title, node)
+                nodes_by_title.setdefault(node.title, []).append(node)
+        if not nodes_for_fetching:
+            return False
 
-                    except ConnectionError as conn_exc:
-                        if connection_attempt <= settings.connection_retries:
-                            self.print_log_msg(f'ConnectionError!!! Attempt:{connection_attempt}.\n')
-                            connection_attempt += 1
-                            sleep(connection_attempt * settings.connection_delay_if_error)
-                        else:
-                            connection_condition = False
-                            self.print_log_msg(f'ConnectionError!!! Exit!!!\n{conn_exc.args}\n')
-
-                    except HTTPError as http_exc:
-                        code = http_exc.response.status_code
-                        if code == 404:
-                            node.set_page_status(PageStatus.PARSED_NO_SUCH_ARTICLE.value)
-                            break
+        def has_link_to_finish(fetch_result: Optional[Tuple[int, List[str]]]) -> bool:
+            return finish_title is not None and fetch_result is not None and finish_title in fetch_result[1]
+
+        def save_fetched_page(title: str, fetch_result: Optional[Tuple[int, List[str]]]):
+            for same_node in nodes_by_title[title]:
+                same_node.fetch_tried = True
+            self._save_fetched_page(nodes_for_fetching[title], fetch_result, refresh)
+
+        if self.fetch_concurrency <= 1 and self.fetch_backend != 'api':
+            fetch_nodes = list(nodes_for_fetching.values())
+            for position, node in enumerate(fetch_nodes):
+                fetch_result = self._fetch_page(node, refresh)
+                save_fetched_page(node.title, fetch_result)
+                if has_link_to_finish(fetch_result):
+                    self.stats.count('fetches_cancelled', len(fetch_nodes) - position - 1)
+                    return True
+            return False
 
-                        if code in [429, 500, 502, 503, 504]:
-                            if response_attempt <= settings.response_retries:
-                                self.print_log_msg(f'ResponseError!!! Status: {code}. Attempt:{connection_attempt}.\n')
-                                response_attempt += 1
-                                sleep(response_attempt * settings.response_delay_if_error)
-                            else:
-                                response_condition = False
-                                self.print_log_msg(f'ResponseError!!! Status: {code}. Exit!!!\n')
+        # the position of each fetch in the order of the pages (a batch of pages for the 'api' backend)
+        positions: Dict[Future, int] = {}
+        nodes_by_future: Dict[Future, Node] = {}
+        stop_position: Optional[int] = None
+        with ThreadPoolExecutor(max_workers=max(1, self.fetch_concurrency)) as executor:
+            if self.fetch_backend == 'api':
+                titles = list(nodes_for_fetching)
+                batch_size = settings.api_titles_per_request
+                for i in range(0, len(titles), batch_size):
+                    future = executor.submit(self._fetch_pages_api, [nodes_for_fetching[title]
+                                                                     for title in titles[i:i + batch_size]])
+                    positions[future] = len(positions)
+            else:
+                for node in nodes_for_fetching.values():
+                    future = executor.submit(self._fetch_page, node, refresh)
+                    positions[future] = len(positions)
+                    nodes_by_future[future] = node
+            for future in as_completed(positions):
+                if future.cancelled():
+                    continue
+                found = False
+                if self.fetch_backend == 'api':
+                    for title, fetch_result in future.result().items():
+                        save_fetched_page(title, fetch_result)
+                        found = found or has_link_to_finish(fetch_result)
+                else:
+                    fetch_result = future.result()
+                    save_fetched_page(nodes_by_future[future].title, fetch_result)
+                    found = has_link_to_finish(fetch_result)
+                if found and (stop_position is None or positions[future] < stop_position):
+                    stop_position = positions[future]
+                    cancelled = sum(1 for other, position in positions.items()
+                                    if position > stop_position and other.cancel())
+                    self.stats.count('fetches_cancelled', cancelled)
+        return stop_position is not None
+
+    def _save_fetched_page(self, node: Node, fetch_result: Optional[Tuple[int, List[str]]],
+                           refresh: bool = False):
+        """
+        saves the result of _fetch_page() to DB (pages, links, the page status and the validators
+        of the response in one transaction)
+        if the page was not fetched (retries are over), the page stays NOT_PARSED
+        if the page is not modified (304), nothing is parsed and written, only the time of the check is changed
+        :param node: Node
+        :param fetch_result: (page_status, linked_titles) or None
+        :param refresh: bool, the page is parsed again, the links, which are not on the page now, are removed
+        """
+        if fetch_result is None:
+            self.not_fetched_count += 1
+            return
+        if node.not_modified:
+            touch_page_validators(node.id)
+            self.stats.count('pages_not_modified')
+            return
+        page_status, linked_titles = fetch_result
+        with self.stats.timer('db_save_pages'):
+            node.save_linked_pages(linked_titles, page_status, replace_links=refresh,
+                                   validators=node.validators or (None, None))
+        self.stats.count('pages_fetched')
+
+    def _fetch_page(self, node: Node, refresh: bool = False) -> Optional[Tuple[int, List[str]]]:
+        """
+        downloads the wiki page and collects the titles of the linked pages
+        (not more than links_per_page, without titles from ignore_list_patterns)
+        if the page is in the page store (page_store.py), it is parsed from the store without a request,
+        the downloaded pages are saved to the store
+        the function does not use DB, so it can be called from several threads at once
+        :param node: Node
+        :param refresh: bool, the page is downloaded even if it is in the page store
+        :return: (PARSED_CAN_BE_USED, linked_titles), (PARSED_NO_SUCH_ARTICLE, []) or None if retries are over
+        """
+        if self.page_store is not None and not refresh:
+            body = self.page_store.get(node.title)
+            if body is not None:
+                self.stats.count('page_store_hits')
+                with self.stats.timer('parse'):
+                    linked_titles = extract_linked_titles(self.link_extractor, [body.decode('utf-8')],
+                                                          self.links_per_page)
+                return PageStatus.PARSED_CAN_BE_USED.value, linked_titles
+
+        def read_page(response: requests.Response) -> Tuple[int, List[str]]:
+            if response.status_code == 304:
+                node.not_modified = True
+                return node.status, []
+            node.validators = get_validators(response)
+            if response.status_code == 404:
+                return PageStatus.PARSED_NO_SUCH_ARTICLE.value, []
+            if response.encoding is None:
+                response.encoding = 'utf-8'
+            if self.page_store is not None:
+                # the whole page is read to be saved to the store
+                page_text = response.text
+                self.page_store.put(node.title, page_text.encode('utf-8'))
+                chunks = [page_text]
+            else:
+                # read the page by chunks and extract the links,
+                # stop reading when links_per_page links are collected
+                chunks = response.iter_content(chunk_size=65536, decode_unicode=True)
+            linked_titles = extract_linked_titles(self.link_extractor, chunks, self.links_per_page)
+            if self.page_store is None and not drain_response(response, settings.stream_drain_max_bytes):
+                self.stats.count('connections_closed_early')
+            return PageStatus.PARSED_CAN_BE_USED.value, linked_titles
+
+        headers = get_conditional_headers(*node.validators) if node.validators else None
+        return self._request(node.get_url(), read_page, headers=headers, stream=True)
+
+    def _fetch_pages_api(self, nodes: List[Node]) -> Dict[str, Optional[Tuple[int, List[str]]]]:
+        """
+        takes the links of several pages by the MediaWiki API (mediawiki_api.py),
+        every request (also every continuation) passes through _request_limiter() and the retry rules,
+        an answer, which is not json, is a failed request (the pages are not fetched)
+        the function does not use DB, so it can be called from several threads at once
+        :param nodes: List[Node]
+        :return: title -> (page_status, linked_titles) or None if retries are over
+        """
+        def read_json(response: requests.Response) -> Optional[dict]:
+            try:
+                return response.json()
+            except ValueError:
+                # an error page (e.g. the html page of 404) instead of the answer of the API:
+                # the request is failed, the pages stay NOT_PARSED
+                self.stats.count('failed_requests')
+                self.print_log_msg(f'The answer of the API is not json! Status: {response.status_code}.\n')
+                return None
+
+        def get_json(params: dict) -> Optional[dict]:
+            return self._request(settings.api_link, read_json, params=params)
+
+        return fetch_links_batch([node.title for node in nodes], get_json, self.links_per_page)
+
+    def _request(self, url: str, read_response: Callable[[requests.Response], T], params: Optional[dict] = None,
+                 headers: Optional[dict] = None, stream: bool = False) -> Optional[T]:
+        """
+        GET request by the session of the racer (http_client.py) with the rate limiter and the retry rules:
+          - ConnectionError -> connection_retries attempts with increments delay connection_delay_if_error
+          - status in [429, 500, 502, 503, 504] -> response_retries attempts with increments delay
+            response_delay_if_error
+          - status 404 or 304 (conditional request) -> the response is passed to read_response()
+          - other error statuses -> no retries
+        :param url: str
+        :param read_response: function, which reads the response (it is called inside the retries,
+                              so a connection error while reading the body is also retried)
+        :return: the result of read_response() or None if retries are over
+        """
+        connection_condition = True  # current connection condition
+        connection_attempt = 0  # current connection iteration
+
+        response_condition = True  # current response condition
+        response_attempt = 0  # current response iteration
+
+        while connection_condition and response_condition:
+            self._request_limiter()
+            try:
+                request_started = perf_counter()
+                with self.session.get(url, params=params, headers=headers, stream=stream) as response:
+                    # http_wait - until the headers are received, parse - reading and parsing the body
+                    parse_started = perf_counter()
+                    self.stats.add_time('http_wait', parse_started - request_started)
+                    if response.status_code != 404:
+                        response.raise_for_status()  # raise error if not OK
+                    result = read_response(response)
+                    self.stats.add_time('parse', perf_counter() - parse_started)
+                    self.stats.count(f'responses_{response.status_code}')
+                    return result
+
+            except ConnectionError as conn_exc:
+                if connection_attempt <= settings.connection_retries:
+                    self.stats.count('connection_retries')
+                    self.print_log_msg(f'ConnectionError!!! Attempt:{connection_attempt}.\n')
+                    connection_attempt += 1
+                    self.stats.add_time('retry_sleep', connection_attempt * settings.connection_delay_if_error)
+                    sleep(connection_attempt * settings.connection_delay_if_error)
+                else:
+                    connection_condition = False
+                    self.stats.count('failed_requests')
+                    self.print_log_msg(f'ConnectionError!!! Exit!!!\n{conn_exc.args}\n')
+
+            except HTTPError as http_exc:
+                code = http_exc.response.status_code
+                if code in [429, 500, 502, 503, 504]:
+                    if response_attempt <= settings.response_retries:
+                        self.stats.count('response_retries')
+                        self.print_log_msg(f'ResponseError!!! Status: {code}. Attempt:{response_attempt}.\n')
+                        response_attempt += 1
+                        self.stats.add_time('retry_sleep', response_attempt * settings.response_delay_if_error)
+                        sleep(response_attempt * settings.response_delay_if_error)
+                    else:
+                        response_condition = False
+                        self.stats.count('failed_requests')
+                        self.print_log_msg(f'ResponseError!!! Status: {code}. Exit!!!\n')
                 else:
-                    sleep(1)
+                    response_condition = False
+                    self.stats.count('failed_requests')
+                    self.print_log_msg(f'ResponseError!!! Status: {code}. Exit!!!\n')
+        return None
 
 
 # racer = WikiRacer()
@@ -0,0 +1,192 @@
+import unittest
+from typing import Dict, List, Optional
+from unittest import mock
+
+from db_context import PageStatus, WikiPage
+from wikiracing import CurrentRoute, ExceedingMaxLinksInRouteException, Node, WikiRacer
+
+
+class FakeWiki:
+    """
+    the search modes without the network and DB: the links of the wiki pages and the pages parsed in DB,
+    only the links of the parsed pages are known to the search (as in the table 'links')
+    """
+
+    def __init__(self, links: Dict[str, List[str]], parsed: List[str]):
+        self.links = links
+        self.titles = sorted({title for title in links} | {child for children in links.values() for child in children})
+        self.ids = {title: page_id for page_id, title in enumerate(self.titles, start=1)}
+        self.parsed = set(parsed)
+        self.fetched: List[str] = []
+        self.titles_read: List[int] = []
+
+    def page(self, title: str) -> WikiPage:
+        page = WikiPage(title)
+        page.id = self.ids[title]
+        page.created = None
+        page.status = PageStatus.PARSED_CAN_BE_USED.value if title in self.parsed else PageStatus.NOT_PARSED.value
+        return page
+
+    def node(self, title: str) -> Node:
+        node = Node(title)
+        page = self.page(title)
+        node.id, node.status = page.id, page.status
+        return node
+
+    def known_children(self, page_id: int) -> List[str]:
+        title = self.titles[page_id - 1]
+        return sorted(self.links.get(title, [])) if title in self.parsed else []
+
+    def get_child_ids_by_parent_ids(self, parent_ids: List[int]):
+        for parent_id in parent_ids:
+            for title in self.known_children(parent_id):
+                yield parent_id, self.ids[title], self.page(title).status
+
+    def get_page_titles(self, page_ids: List[int]) -> Dict[int, str]:
+        self.titles_read.extend(page_ids)
+        return {page_id: self.titles[page_id - 1] for page_id in page_ids}
+
+    def get_backlinks_by_child_ids(self, child_ids: List[int]):
+        for child_id in child_ids:
+            for title in self.titles:
+                if self.titles[child_id - 1] in self.known_children(self.ids[title]):
+                    yield child_id, self.page(title)
+
+    def get_parent_ids_linking_to(self, child_id: int, parent_ids: List[int]):
+        return {parent_id for parent_id in parent_ids if self.titles[child_id - 1] in self.known_children(parent_id)}
+
+    def parse(self, node: Node):
+        if node.status == PageStatus.NOT_PARSED.value:
+            self.fetched.append(node.title)
+            self.parsed.add(node.title)
+            node.status = PageStatus.PARSED_CAN_BE_USED.value
+
+    def parse_generation(self, nodes: List[Node], refresh: bool = False, finish_title: Optional[str] = None) -> bool:
+        for node in nodes:
+            if node.status == PageStatus.NOT_PARSED.value:
+                self.parse(node)
+                if finish_title in self.links.get(node.title, []):
+                    return True
+        return False
+
+
+class SearchModesTest(unittest.TestCase):
+
+    def search(self, wiki: FakeWiki, start: str, finish: str, search_mode: str, max_links_in_route: int = 4,
+               bounds: Optional[Dict[str, int]] = None, index_exact: bool = False):
+        racer = WikiRacer()
+        racer.display_log = False
+        racer.search_mode = search_mode
+        racer.max_links_in_route = max_links_in_route
+        racer._page_parsing = wiki.parse
+        racer._parse_generation = wiki.parse_generation
+        route = CurrentRoute(start, finish)
+        route.finish_page_id = wiki.ids[finish]
+        start_node, finish_node = wiki.node(start), wiki.node(finish)
+        start_node.is_start = True
+        finish_node.is_finish = True
+        with mock.patch('wikiracing.get_child_ids_by_parent_ids', wiki.get_child_ids_by_parent_ids), \
+                mock.patch('wikiracing.get_page_titles', wiki.get_page_titles), \
+                mock.patch('wikiracing.get_backlinks_by_child_ids', wiki.get_backlinks_by_child_ids), \
+                mock.patch('wikiracing.get_parent_ids_linking_to', wiki.get_parent_ids_linking_to), \
+                mock.patch('wikiracing.get_lower_bounds',
+                           lambda page_ids, finish_id: {wiki.ids[title]: bound for title, bound in (bounds or {}).items()
+                                                        if wiki.ids[title] in page_ids}), \
+                mock.patch('wikiracing.is_landmark_index_exact', lambda: index_exact), \
+                mock.patch.object(Node, 'get_from_db', lambda node: None), \
+                mock.patch.object(CurrentRoute, 'add_to_db', lambda route: None), \
+                mock.patch.object(CurrentRoute, 'save_chain_to_db', lambda route: None), \
+                mock.patch.object(CurrentRoute, 'get_title_list_from_chain',
+                                  lambda route: [wiki.titles[page_id - 1] for page_id in route.cur_path_to_start]):
+            if search_mode == 'bidirectional':
+                return racer._search_bidirectional(route, start_node)
+            return racer._search_forward(route, start_node, finish_node)
+
+    # a known route of 3 links meets the backward search first, but the page A, which is not parsed,
+    # links to the finish page: the shorter route is returned, as in the forward search
+    def test_bidirectional_does_not_return_longer_route(self):
+        links = {'S': ['A', 'B'], 'A': ['F'], 'B': ['C'], 'C': ['F']}
+        for search_mode in ('forward', 'bidirectional'):
+            with self.subTest(search_mode=search_mode):
+                wiki = FakeWiki(links, parsed=['S', 'B', 'C'])
+                self.assertEqual(self.search(wiki, 'S', 'F', search_mode), ['S', 'A', 'F'])
+
+    # all pages are parsed: the route is found by the known links without fetching
+    def test_bidirectional_known_links(self):
+        links = {'S': ['A', 'B'], 'A': ['D'], 'B': ['C'], 'C': ['F'], 'D': ['E'], 'E': ['F']}
+        wiki = FakeWiki(links, parsed=list(links))
+        self.assertEqual(self.search(wiki, 'S', 'F', 'bidirectional'), ['S', 'B', 'C', 'F'])
+        self.assertEqual(wiki.fetched, [])
+
+    # the titles are read only for the pages, which are not parsed (they are fetched)
+    def test_titles_only_for_fetched_pages(self):
+        links = {'S': ['A', 'B'], 'A': ['D'], 'B': ['C'], 'C': ['F'], 'D': ['E'], 'E': ['F']}
+        for search_mode in ('forward', 'bidirectional'):
+            with self.subTest(search_mode=search_mode):
+                wiki = FakeWiki(links, parsed=['S', 'A', 'B', 'D'])
+                self.assertEqual(self.search(wiki, 'S', 'F', search_mode), ['S', 'B', 'C', 'F'])
+                self.assertEqual({wiki.titles[page_id - 1] for page_id in wiki.titles_read}, {'C'})
+
+    def test_bidirectional_max_links(self):
+        links = {'S': ['A'], 'A': ['B'], 'B': ['C'], 'C': ['F']}
+        for parsed in ([], list(links)):
+            with self.subTest(parsed=parsed):
+                wiki = FakeWiki(links, parsed=['S'] + parsed)
+                with self.assertRaises(ExceedingMaxLinksInRouteException):
+                    self.search(wiki, 'S', 'F', 'bidirectional', max_links_in_route=3)
+                self.assertEqual(self.search(FakeWiki(links, parsed=['S'] + parsed), 'S', 'F', 'bidirectional'),
+                                 ['S', 'A', 'B', 'C', 'F'])
+
+    # the page A is not parsed, so the index does not know its link to the finish page, and its bound is too long:
+    # the pages are only ordered by the bounds, a page is skipped only if the index is exact
+    def test_landmarks_prune_only_exact_index(self):
+        links = {'S': ['A', 'B'], 'A': ['F'], 'B': ['C'], 'C': ['F']}
+        bounds = {'A': 5, 'B': 2}
+        wiki = FakeWiki(links, parsed=['S', 'B', 'C'])
+        self.assertEqual(self.search(wiki, 'S', 'F', 'landmarks', bounds=bounds), ['S', 'A', 'F'])
+        wiki = FakeWiki(links, parsed=['S', 'B', 'C'])
+        self.assertEqual(self.search(wiki, 'S', 'F', 'landmarks', bounds=bounds, index_exact=True),
+                         ['S', 'B', 'C', 'F'])
+        self.assertNotIn('A', wiki.fetched)
+
+
+class FetchPassTest(unittest.TestCase):
+
+    # a page, which was not fetched by _parse_generation (the retries are over), is not fetched again
+    # by _page_parsing in the same pass (also the same page of another parent)
+    def test_failed_fetch_is_not_repeated(self):
+        for fetch_concurrency in (1, 4):
+            with self.subTest(fetch_concurrency=fetch_concurrency):
+                racer = WikiRacer()
+                racer.display_log = False
+                racer.fetch_concurrency = fetch_concurrency
+                fetched = []
+                racer._fetch_page = lambda node, refresh=False: fetched.append(node.title)
+                nodes = [Node('A'), Node('B'), Node('A')]
+                with mock.patch.object(Node, 'add_to_db', lambda node: None):
+                    racer._parse_generation(nodes, finish_title='F')
+                    for node in nodes:
+                        racer._page_parsing(node)
+                self.assertEqual(sorted(fetched), ['A', 'B'])
+                self.assertTrue(all(node.status == PageStatus.NOT_PARSED.value for node in nodes))
+
+
+class FailedRouteCacheTest(unittest.TestCase):
+
+    # the failure is saved for the search mode, and not saved, if a page was not fetched (the retries are over)
+    def test_save_failed_route(self):
+        racer = WikiRacer()
+        racer.search_mode = 'bidirectional'
+        with mock.patch('wikiracing.save_failed_route') as save_failed_route:
+            racer._save_failed_route('S', 'F', ExceedingMaxLinksInRouteException())
+            save_failed_route.assert_called_once_with('S', 'F', racer.max_links_in_route, racer.links_per_page,
+                                                      'bidirectional', 'max_links')
+            save_failed_route.reset_mock()
+            racer._save_fetched_page(Node('A'), None)
+            self.assertEqual(racer.not_fetched_count, 1)
+            racer._save_failed_route('S', 'F', ExceedingMaxLinksInRouteException())
+            save_failed_route.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()